@@ -1,11 +1,14 @@
 
 from django.contrib import admin
 
-from .models import Listings, Comments, Bids, User, ListingOwners
+from .models import Category, Listings, Comments, Bids, ProxyBids, User, ListingOwners, SellerStats
 
 # Register your models here.
+admin.site.register(Category)
 admin.site.register(Listings)
 admin.site.register(Comments)
 admin.site.register(Bids)
+admin.site.register(ProxyBids)
 admin.site.register(User)
 admin.site.register(ListingOwners)
+admin.site.register(SellerStats)
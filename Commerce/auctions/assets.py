@@ -0,0 +1,101 @@
+import gzip
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+
+try:
+    import brotli
+except ImportError: # without it, only gzip copies are made
+    brotli = None
+
+# The static file pipeline for production. collectstatic copies every file under a name that includes a hash of its
+# contents (so a changed file gets a new URL) and writes gzip and brotli copies of the text files next to it, once
+# at build time. serve_asset serves them with the best encoding the browser accepts, and lets browsers keep hashed
+# files for a year since their contents never change.
+
+COMPRESSED_TYPES = (".css", ".js", ".svg", ".json", ".txt", ".html", ".map")
+
+# files smaller than this aren't worth compressing
+MIN_COMPRESS_BYTES = 256
+
+# the precompressed copies, best first
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+FOREVER = "public, max-age=31536000, immutable"
+
+# unhashed files (e.g. referenced without {% static %}) may change under the same name
+SHORT = "public, max-age=300"
+
+
+def compress(data):
+    copies = {".gz": gzip.compress(data, compresslevel = 9, mtime = 0)}
+    if brotli is not None:
+        copies[".br"] = brotli.compress(data, quality = 11)
+    return copies
+
+
+# ManifestStaticFilesStorage that also writes a compressed copy of each text file it stores, when that is smaller
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run = False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name, hashed_name in self.hashed_files.items():
+            for stored in {name, hashed_name}:
+                if stored.endswith(COMPRESSED_TYPES):
+                    self.write_compressed(self.path(stored))
+
+    def write_compressed(self, path):
+        with open(path, "rb") as file:
+            data = file.read()
+        if len(data) < MIN_COMPRESS_BYTES:
+            return
+        for suffix, compressed in compress(data).items():
+            if len(compressed) < len(data):
+                with open(path + suffix, "wb") as file:
+                    file.write(compressed)
+
+
+# the encodings the request accepts, from its Accept-Encoding header
+def accepted_encodings(request):
+    accepted = set()
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        encoding, _, parameters = part.partition(";")
+        try:
+            quality = float(parameters.strip().partition("q=")[2] or 1)
+        except ValueError:
+            quality = 1
+        if quality > 0:
+            accepted.add(encoding.strip().lower())
+    return accepted
+
+
+# Serves a collected static file from STATIC_ROOT, precompressed if the browser accepts it. Mounted at STATIC_URL
+# by commerce/urls.py when SERVE_STATIC is set, for deployments without a web server in front to serve them.
+def serve_asset(request, path):
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation: # outside STATIC_ROOT
+        raise Http404("No such file.")
+    if not os.path.isfile(full_path):
+        raise Http404("No such file.")
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    encoding = None
+    accepted = accepted_encodings(request)
+    for name, suffix in ENCODINGS:
+        if name in accepted and os.path.isfile(full_path + suffix):
+            encoding, full_path = name, full_path + suffix
+            break
+    response = FileResponse(open(full_path, "rb"), content_type = content_type, filename = os.path.basename(path))
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["Vary"] = "Accept-Encoding"
+    hashed = getattr(staticfiles_storage, "hashed_files", {})
+    response["Cache-Control"] = FOREVER if path in hashed.values() else SHORT
+    return response
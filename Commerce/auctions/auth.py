@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+# Every request from a signed in user loads the user named in their session. With the cached session modes (see
+# SESSION_MODE in settings.py) the session is read without a query, and the user is kept in the cache for
+# USER_CACHE_TIMEOUT seconds so a warm page view does no auth queries at all. Saving or deleting a user drops their
+# cached copy. Other writes (e.g. queryset updates) and other processes' local caches catch up within the timeout.
+
+
+def user_key(user_id):
+    return f"user:{user_id}"
+
+
+# ModelBackend that loads the users of sessions through the cache
+class CachedModelBackend(ModelBackend):
+
+    def get_user(self, user_id):
+        if not settings.USER_CACHE_TIMEOUT:
+            return super().get_user(user_id)
+        user = cache.get(user_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None: # inactive or deleted users aren't cached, so they stay signed out
+                cache.set(user_key(user_id), user, settings.USER_CACHE_TIMEOUT)
+        return user
+
+
+# Drops a user's cached copy now, so the rest of this request sees the change, and again once the transaction
+# commits, in case another request cached the old row in between
+def forget_user(user_id):
+    cache.delete(user_key(user_id))
+    transaction.on_commit(lambda: cache.delete(user_key(user_id)))
@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .live import publish_bid
+from .models import Listings, Bids, ProxyBids, SellerStats
+
+
+# raised when a bid can't be placed; the message is shown to the bidder
+class BidRejected(Exception):
+    pass
+
+
+# Places a bid of amount on a listing for user, or raises BidRejected.
+# The check that the bid beats the current price and the update of the listing's price happen in one
+# conditional UPDATE, so two bidders racing on the same listing can never both win with stale prices.
+def place_bid(listing_id, user, amount):
+    beats_current_price = Q(bid_count = 0, starting_bid__lte = amount) | Q(bid_count__gt = 0, current_price__lt = amount)
+    not_ended = Q(ends_at__isnull = True) | Q(ends_at__gt = timezone.now()) # it may not have been closed yet
+    with transaction.atomic():
+        updated = Listings.objects.filter(beats_current_price, not_ended, pk = listing_id, active = True).update(
+            current_price = amount,
+            high_bidder = user,
+            bid_count = F("bid_count") + 1,
+            version = F("version") + 1,
+            last_modified = timezone.now(),
+        )
+        if not updated:
+            listing = Listings.objects.get(pk = listing_id)
+            if not listing.active or (listing.ends_at and listing.ends_at <= timezone.now()):
+                raise BidRejected("This listing is closed.")
+            raise BidRejected("Please put in a bid greater than the current bid.")
+        # bulk_create skips Bids.save, which would update the listing's stats a second time
+        bid, = Bids.objects.bulk_create([Bids(amount = amount, listing_id = listing_id, bidders = user)])
+        SellerStats.objects.record_bids(listing_id, 1)
+        bid_count = Listings.objects.values_list("bid_count", flat = True).get(pk = listing_id) # the row is locked by the update
+        transaction.on_commit(lambda: publish_bid(int(listing_id), amount, user, bid_count))
+        # the bid may be below someone else's maximum, who then outbids it straight away
+        if ProxyBids.objects.filter(listing_id = listing_id, max_amount__gt = amount).exclude(user = user).exists():
+            resolve_proxy_bids(Listings.objects.select_for_update().get(pk = listing_id))
+    return bid
+
+
+# Sets user's private maximum on a listing, replacing any earlier one, and bids for them up to it (raises BidRejected
+# if the maximum wouldn't lead). Returns the new price of the listing.
+# Writing the maximum first takes the database's write lock (on SQLite) before anything is read, and the listing row
+# is locked before the maximums are ranked, so concurrent proxies on a listing are resolved one after the other.
+def set_proxy_bid(listing_id, user, max_amount):
+    with transaction.atomic():
+        updated = ProxyBids.objects.filter(listing_id = listing_id, user = user).update(max_amount = max_amount, time_set = timezone.now())
+        if not updated:
+            ProxyBids.objects.create(listing_id = listing_id, user = user, max_amount = max_amount)
+        listing = Listings.objects.select_for_update().get(pk = listing_id)
+        if not listing.active or (listing.ends_at and listing.ends_at <= timezone.now()):
+            raise BidRejected("This listing is closed.")
+        if max_amount < (listing.current_price if listing.high_bidder_id == user.id else listing.max_bid + 1):
+            raise BidRejected("Please put in a maximum greater than the current bid.")
+        return resolve_proxy_bids(listing) or listing.current_price
+
+
+# Brings a locked listing up to date with its proxy bids, like an auctioneer: the highest maximum leads at one
+# increment above the second highest (or the current bid), and the second highest is recorded as a bid at its own
+# maximum. So however many proxies compete, at most two bids are written. Of two equal maximums, the one set first
+# wins at that amount. Returns the new price, or None if it didn't change.
+def resolve_proxy_bids(listing):
+    proxies = list(ProxyBids.objects.filter(listing = listing).select_related("user").order_by("-max_amount", "time_set", "id")[:2])
+    if not proxies:
+        return None
+    leader, runner = proxies[0], proxies[1] if len(proxies) > 1 else None
+    leading = leader.user_id == listing.high_bidder_id
+    # the leader only has to hold the current bid, or beat it if someone else holds it
+    price = listing.current_price if leading else listing.max_bid + 1
+    if leader.max_amount < price:
+        return None
+    bids = []
+    if runner and runner.max_amount > listing.max_bid:
+        price = max(price, min(leader.max_amount, runner.max_amount + 1))
+        if runner.max_amount < price:
+            bids.append(Bids(amount = runner.max_amount, listing_id = listing.pk, bidders_id = runner.user_id))
+    if leading and price == listing.current_price:
+        return None
+    bids.append(Bids(amount = price, listing_id = listing.pk, bidders_id = leader.user_id))
+
+    Bids.objects.bulk_create(bids)
+    SellerStats.objects.record_bids(listing.pk, len(bids))
+    Listings.objects.filter(pk = listing.pk).update(
+        current_price = price,
+        high_bidder = leader.user,
+        bid_count = F("bid_count") + len(bids),
+        version = F("version") + 1,
+        last_modified = timezone.now(),
+    )
+    bid_count = listing.bid_count + len(bids)
+    transaction.on_commit(lambda: publish_bid(listing.pk, price, leader.user, bid_count))
+    return price
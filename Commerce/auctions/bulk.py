@@ -0,0 +1,138 @@
+import csv
+import json
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .forms import ImportListingForm
+from .models import Category, Listings, ListingOwners, SellerStats
+
+# Bulk import and export of listings as CSV or JSON Lines. Both stream: an import reads one row at a time and writes
+# the valid ones in chunks, each in its own transaction, and an export yields one line per listing, so neither ever
+# holds a whole catalog in memory.
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+# how many valid rows are written per transaction
+CHUNK_SIZE = 500
+
+# at most this many rejected rows are reported, so a broken file can't fill memory with errors
+MAX_ERRORS = 100
+
+EXPORT_FIELDS = ["id", "title", "description", "category", "starting_bid", "current_price", "bid_count", "active", "time_created", "ends_at", "owner"]
+
+
+# the format of a file from its name, or ValueError
+def file_format(name):
+    for extension, format in FORMATS.items():
+        if name.lower().endswith(extension):
+            return format
+    raise ValueError(f"Can't tell the format of {name}; use a .csv or .jsonl file.")
+
+
+# (line number, row dict, error) for each row of an iterable of text lines; error is None unless the line can't be parsed
+def read_rows(lines, format):
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row, None
+    else:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield number, None, f"not valid JSON: {error}"
+                continue
+            if isinstance(row, dict):
+                yield number, row, None
+            else:
+                yield number, None, "not a JSON object"
+
+
+# Validates each row with the rules of NewListingForm and saves the valid ones as listings owned by owner, chunk_size
+# rows per transaction. Invalid rows are skipped. Returns the number of rows read, imported and rejected, the first
+# MAX_ERRORS errors (with their line numbers), the elapsed seconds and rows per second.
+def import_rows(rows, owner, chunk_size = CHUNK_SIZE):
+    categories = {}
+    for category_id, name, slug in Category.objects.values_list("id", "name", "slug"):
+        categories[name] = categories[name.lower()] = categories[slug] = category_id
+
+    report = {"rows": 0, "imported": 0, "rejected": 0, "errors": []}
+    start = time.perf_counter()
+    chunk = []
+    for line, row, error in rows:
+        report["rows"] += 1
+        if error is None:
+            form = ImportListingForm(row, categories = categories)
+            if form.is_valid():
+                chunk.append(new_listing(form.cleaned_data))
+            else:
+                error = "; ".join(f"{field}: {' '.join(messages)}" for field, messages in form.errors.items())
+        if error is not None:
+            report["rejected"] += 1
+            if len(report["errors"]) < MAX_ERRORS:
+                report["errors"].append({"line": line, "error": error})
+        if len(chunk) >= chunk_size:
+            report["imported"] += save_listings(chunk, owner)
+            chunk = []
+    if chunk:
+        report["imported"] += save_listings(chunk, owner)
+    report["seconds"] = time.perf_counter() - start
+    report["rows_per_second"] = report["rows"] / report["seconds"] if report["seconds"] else None
+    return report
+
+
+def new_listing(data):
+    return Listings(
+        title = data["title"],
+        description = data["description"],
+        starting_bid = data["starting_bid"],
+        current_price = data["starting_bid"], # Listings.save isn't called, so the price is set here
+        image = data["image"],
+        category_id = data["category"],
+        ends_at = timezone.now() + timedelta(days = data["duration"]) if data["duration"] else None,
+    )
+
+
+# Writes one chunk of listings and their owner rows. bulk_create skips Listings.save and the post_save signals, so the
+# category counts and the seller's totals are moved here; new listings have no cached fragments to invalidate, and the
+# search index picks them up through its triggers or their last_modified.
+def save_listings(listings, owner):
+    with transaction.atomic():
+        last_id = Listings.objects.order_by("-id").values_list("id", flat = True).first() or 0
+        Listings.objects.bulk_create(listings)
+        if listings[0].pk is None: # the database didn't return the new ids
+            ids = list(Listings.objects.filter(pk__gt = last_id).order_by("id").values_list("id", flat = True))
+        else:
+            ids = [listing.pk for listing in listings]
+        ListingOwners.objects.bulk_create([ListingOwners(listing_id = listing_id, user = owner) for listing_id in ids])
+        Category.objects.adjust_counts(Counter(listing.counted_category() for listing in listings))
+        SellerStats.objects.adjust({owner.id: {"active_listings": len(listings)}})
+    return len(listings)
+
+
+# writes to nothing and hands back what it was given, so csv.writer can format one line at a time
+class Echo:
+    def write(self, value):
+        return value
+
+
+# the lines of an export of listings (a queryset) with their current prices, one listing at a time
+def export_lines(listings, format):
+    rows = listings.order_by("id").values_list(
+        "id", "title", "description", "category__name", "starting_bid", "current_price", "bid_count", "active",
+        "time_created", "ends_at", "owner__user__username",
+    ).iterator(chunk_size = 2000)
+    if format == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(EXPORT_FIELDS, row)), default = lambda value: value.isoformat()) + "\n"
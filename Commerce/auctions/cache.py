@@ -0,0 +1,59 @@
+import threading
+
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+# the parts of a listing page that look the same to every visitor, and the template each is rendered from
+FRAGMENTS = {
+    "detail": "auctions/listing_detail.html",
+    "comments": "auctions/listing_comments.html",
+}
+
+# hit and miss counts for this process, per fragment
+_stats = {name: {"hits": 0, "misses": 0} for name in FRAGMENTS}
+_stats_lock = threading.Lock()
+
+
+# the cache backend for listing fragments, configured as the "listings" alias in settings.CACHES
+def listing_cache():
+    return caches["listings"]
+
+
+# Fragments are keyed by the listing's version, which every change to the listing, its bids or its comments bumps,
+# so a fragment of an older version is never looked up again (it just expires) and no process, whatever the cache
+# backend, can serve one.
+def fragment_key(name, listing_id, version):
+    return f"listing:{listing_id}:{version}:{name}"
+
+
+# Returns the rendered HTML of one fragment of a listing page at the given version, rendering and storing it on a
+# miss. context is only evaluated on a miss, so it should hold lazy querysets or be a function returning the context.
+def listing_fragment(name, listing_id, version, context):
+    key = fragment_key(name, listing_id, version)
+    html = listing_cache().get(key)
+    with _stats_lock:
+        _stats[name]["hits" if html is not None else "misses"] += 1
+    if html is None:
+        html = render_to_string(FRAGMENTS[name], context() if callable(context) else context)
+        listing_cache().set(key, html)
+    return mark_safe(html)
+
+
+# hit and miss counts for this process, with the hit rate per fragment and overall
+def cache_stats():
+    with _stats_lock:
+        stats = {name: dict(counts) for name, counts in _stats.items()}
+    hits = sum(counts["hits"] for counts in stats.values())
+    misses = sum(counts["misses"] for counts in stats.values())
+    for counts in stats.values():
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = counts["hits"] / lookups if lookups else None
+    stats["total"] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else None}
+    return stats
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        for counts in _stats.values():
+            counts["hits"] = counts["misses"] = 0
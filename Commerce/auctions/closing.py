@@ -0,0 +1,52 @@
+from collections import Counter, defaultdict
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .live import publish_closed
+from .models import User, Category, Listings, Bids, SellerStats
+from .watchlist import bump_watch_versions
+
+
+# Closes the listings with the given ids: they stop being active, their highest bid is marked as the winning one
+# and they are removed from every watchlist. Each step is a set-based statement and they all run in one transaction,
+# however many listings or watchers there are. Closing a listing twice changes nothing, and the number of listings
+# that were actually closed by this call is returned.
+def close_listings(listing_ids):
+    listing_ids = list(listing_ids)
+    with transaction.atomic():
+        # the listings still open are locked first, so the category counts and seller totals move by exactly the rows
+        # this call closed even if another closer got to some of them first
+        closing = list(Listings.objects.select_for_update(of = ("self",)).filter(pk__in = listing_ids, active = True)
+                       .values_list("id", "category_id", "owner__user", "current_price", "bid_count"))
+        closed = Listings.objects.filter(pk__in = [row[0] for row in closing], active = True).update(
+            active = False, version = F("version") + 1, last_modified = timezone.now())
+        categories, sellers = Counter(), defaultdict(Counter)
+        for _, category_id, seller_id, price, bid_count in closing:
+            categories[category_id] -= 1
+            sellers[seller_id].update(active_listings = -1, closed_listings = 1, revenue = price if bid_count else 0)
+        Category.objects.adjust_counts(categories)
+        SellerStats.objects.adjust(sellers)
+        Bids.objects.filter(listing_id__in = listing_ids, listing__bid_count__gt = 0, amount = F("listing__current_price")).update(winning = True)
+        watches = User.watchlist.through.objects.filter(listings_id__in = listing_ids)
+        bump_watch_versions(set(watches.values_list("user_id", flat = True)))
+        watches.delete()
+        transaction.on_commit(lambda: publish_closed(listing_ids))
+    return closed
+
+
+# Closes up to batch_size listings whose end time has passed and returns how many were closed.
+# Several closers can run at once: where the database supports it the batch is claimed with SKIP LOCKED so each
+# closer gets different listings, and otherwise a listing two closers both picked is only closed by one of them.
+# SQLite can't turn a transaction that has read into a writing one once another connection has committed since (it
+# fails at once, whatever the busy timeout), so there the transaction writes first, which waits for the write lock
+# like any other write, and the due listings are read under it.
+def close_due_listings(batch_size = 500, now = None):
+    with transaction.atomic():
+        if connection.vendor == "sqlite":
+            Listings.objects.filter(pk = 0).update(version = F("version")) # no such row; only takes the lock
+        due = Listings.objects.due(now)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked = True)
+        return close_listings(list(due.values_list("id", flat = True)[:batch_size]))
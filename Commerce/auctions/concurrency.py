@@ -0,0 +1,40 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+
+# Helpers for the async views: the ORM is blocking, so each read runs in a thread and independent reads of one page
+# run at the same time. Each worker thread keeps its own database connection, which is closed the same way a
+# request's is, according to CONN_MAX_AGE.
+
+
+def _in_transaction():
+    return connection.in_atomic_block
+
+
+def _worker(func):
+    def run():
+        try:
+            return func()
+        finally:
+            connection.close_if_unusable_or_obsolete()
+    return run
+
+
+# Runs the blocking functions concurrently and returns their results in order. Inside a transaction (ATOMIC_REQUESTS,
+# or a TestCase) other connections can't see its writes, so the functions run one after another on the request's
+# own connection instead.
+async def gather_reads(*funcs):
+    if await sync_to_async(_in_transaction)():
+        return [await sync_to_async(func)() for func in funcs]
+    return await asyncio.gather(*(sync_to_async(_worker(func), thread_sensitive = False)() for func in funcs))
+
+
+def _load_user(request):
+    request.user.is_authenticated # request.user is lazy; this loads it
+    return request.user
+
+
+# the request's user, loaded from the session in a thread if it hasn't been yet
+async def get_user(request):
+    return await sync_to_async(_load_user)(request)
@@ -0,0 +1,105 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db.models import Max, Subquery
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+
+from .models import Listings, FeedVersion
+from .watchlist import watch_version, watch_version_subquery
+
+# ETag and Last-Modified values for the listing and feed pages, used with async_condition (below)
+# so that an unchanged page gets a 304 without its view running. Pages differ per user (the navigation, the
+# watch and bid parts), so the user and their watchlist are part of every ETag; SessionMiddleware adds
+# "Vary: Cookie" for the same reason. The version of the user's watchlist is read by the same query as the page's
+# state and kept on request.user, where the watchlist (see auctions/watchlist.py) reads it too.
+
+
+def user_key(request):
+    if not request.user.is_authenticated:
+        return "anon"
+    return f"u{request.user.pk}w{watch_version(request.user)}"
+
+
+# runs the values_list query of a page's state with the user's watchlist version as an extra last column, which is
+# taken off the row and kept on the user
+def state_with_watch_version(request, queryset, *fields):
+    if not request.user.is_authenticated:
+        return queryset.values_list(*fields).first()
+    row = queryset.values_list(*fields, watch_version_subquery(request.user.pk)).first()
+    if row is None:
+        return None
+    request.user._watch_version = row[-1] or 0
+    return row[:-1]
+
+
+# (version, last_modified) of a listing, looked up once per request since condition asks for both
+def listing_state(request, listing_id):
+    if not hasattr(request, "_listing_state"):
+        request._listing_state = state_with_watch_version(request, Listings.objects.filter(pk = listing_id), "version", "last_modified")
+    return request._listing_state
+
+
+def listing_etag(request, listing_id):
+    state = listing_state(request, listing_id)
+    if state is None:
+        return None
+    version, last_modified = state
+    return f"listing-{listing_id}-{version}-{last_modified.timestamp():.6f}-{user_key(request)}"
+
+
+def listing_last_modified(request, listing_id):
+    state = listing_state(request, listing_id)
+    return state[1] if state else None
+
+
+# The feeds change whenever any listing does: a bid changes a price and a close removes a listing from the index,
+# its category and every watchlist, so one version covers every feed. It is the newest last_modified, read from its
+# index, together with the FeedVersion row for the changes no remaining listing records (deleted listings, renamed
+# categories), both in one query. Returns (version, last_modified), or None if there are no listings.
+def feed_state(request):
+    if not hasattr(request, "_feed_state"):
+        newest = Subquery(Listings.objects.order_by("-last_modified").values("last_modified")[:1])
+        state = state_with_watch_version(request, FeedVersion.objects.filter(pk = 1), "version", "last_modified", newest)
+        if state is None: # no FeedVersion row yet
+            state = (0, None, Listings.objects.aggregate(Max("last_modified"))["last_modified__max"])
+        version, feed_modified, listing_modified = state
+        if listing_modified is None:
+            request._feed_state = None
+        else:
+            request._feed_state = (version, max(listing_modified, feed_modified or listing_modified))
+    return request._feed_state
+
+
+def feed_last_modified(request, *args, **kwargs):
+    state = feed_state(request)
+    return state[1] if state else None
+
+
+def feed_etag(request, *args, **kwargs):
+    state = feed_state(request)
+    if state is None:
+        return None
+    version, last_modified = state
+    return f"feed-{version}-{last_modified.timestamp():.6f}-{user_key(request)}"
+
+
+# django.views.decorators.http.condition for async views, which it can't wrap itself. The validators are checked by
+# condition in a thread, so 304 and 412 responses are the same, and its ETag and Last-Modified headers are copied
+# onto the view's response.
+def async_condition(etag_func = None, last_modified_func = None):
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            validated = HttpResponse()
+            check = condition(etag_func = etag_func, last_modified_func = last_modified_func)(lambda request, *args, **kwargs: validated)
+            response = await sync_to_async(check)(request, *args, **kwargs)
+            if response is not validated:
+                return response
+            response = await view(request, *args, **kwargs)
+            for header in ("ETag", "Last-Modified"):
+                if validated.has_header(header) and not response.has_header(header):
+                    response[header] = validated[header]
+            return response
+        return inner
+    return decorator
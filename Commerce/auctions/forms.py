@@ -0,0 +1,55 @@
+from django import forms
+
+from .models import Category
+
+# The forms' widgets are declared once with the class, and styled by the form-field classes in styles.css.
+# Django copies the fields for each form, so only what differs between forms (the bid placeholder) is set per form.
+
+# Django form for new listings
+class NewListingForm(forms.Form):
+    title = forms.CharField(label=False, widget=forms.TextInput(attrs={'class':"form-field", 'placeholder':"Title"}))
+    description = forms.CharField(label=False, widget=forms.Textarea(attrs={'class':"form-field form-field-wide", 'placeholder':"Description"}))
+    starting_bid = forms.IntegerField(label=False, widget=forms.NumberInput(attrs={'class':"form-field", 'placeholder':"Starting Bid ($)"}), min_value=0)
+    image = forms.URLField(required=False, label=False, widget=forms.URLInput(attrs={'class':"form-field", 'placeholder':"URL for image of listing"}))
+    category = forms.ModelChoiceField(required=False, label=False, widget=forms.Select(attrs={'class':"form-field"}), queryset=Category.objects.all(), empty_label="Choose Category")
+    duration = forms.IntegerField(required=False, label=False, widget=forms.NumberInput(attrs={'class':"form-field", 'placeholder':"Auction length in days (optional)"}), min_value=1, max_value=365)
+
+
+# Django form for a new bid
+class NewBidForm(forms.Form):
+    
+    bid = forms.IntegerField(label=False, widget=forms.NumberInput(attrs={'class':"form-field form-field-bid"}))
+    # a proxy bid: the amount is kept private as the bidder's maximum and bid up to one step at a time
+    automatic = forms.BooleanField(required=False, label="Bid for me automatically, up to this amount")
+
+    # allowing the max bid to be specified for each instance of the form so that the placeholder text can be modified
+    def __init__(self, *args, **kwargs):
+        self.max_bid = kwargs.pop('max_bid', -1)
+        super().__init__(*args, **kwargs)
+        if self.max_bid:
+            self.fields['bid'].widget.attrs['placeholder'] = f'Bid Amount (Current Bid is {self.max_bid})'
+        else:
+            self.fields['bid'].widget.attrs['placeholder'] = 'There are no bids'
+
+# Django form for a new comment
+class NewCommentForm(forms.Form):
+    comment = forms.CharField(label=False, widget=forms.Textarea(attrs={'class':"form-field form-field-wide", 'placeholder':"Put your comment here."}))
+
+# NewListingForm for one row of a bulk import (see auctions/bulk.py): the same fields and rules, but the category is
+# given by name or slug and looked up in categories, a {name or slug: id} dict loaded once per import, rather than
+# queried for every row
+class ImportListingForm(NewListingForm):
+    category = forms.CharField(required=False)
+
+    def __init__(self, *args, categories, **kwargs):
+        self.categories = categories
+        super().__init__(*args, **kwargs)
+
+    def clean_category(self):
+        name = self.cleaned_data["category"].strip()
+        if not name:
+            return None
+        category_id = self.categories.get(name, self.categories.get(name.lower()))
+        if category_id is None:
+            raise forms.ValidationError(f"There is no category \"{name}\".")
+        return category_id
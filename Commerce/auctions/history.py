@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Bids, ListingPriceHour, CategoryPriceHour
+
+# Hourly price history of listings and categories. rollup_bids (run by the rollup_bids command, e.g. from cron) turns
+# the bids of each finished hour into one ListingPriceHour row per listing and one CategoryPriceHour row per
+# category. Hours are appended in order and never revisited, and the charts are drawn from those rows alone.
+# The grouping and the chart series are computed on NumPy arrays.
+
+HOUR = 3600
+
+# an hour is rolled up once it has been over for this long, so bids still being committed at its end are included
+SETTLE = timedelta(minutes = 5)
+
+# at most this many hours of bids are loaded into memory at a time
+WINDOW_HOURS = 24
+
+# the longest chart served
+MAX_CHART_HOURS = 24 * 90
+
+
+def hour_number(moment):
+    return int(moment.timestamp()) // HOUR
+
+
+def hour_start(number):
+    return datetime.fromtimestamp(int(number) * HOUR, tz = dt_timezone.utc)
+
+
+# the first hour not rolled up yet, or None if nothing has been rolled up and there are no bids
+def next_hour():
+    last = ListingPriceHour.objects.aggregate(last = Max("hour"))["last"]
+    if last is not None:
+        return hour_number(last) + 1
+    first = Bids.objects.aggregate(first = Min("time_placed"))["first"]
+    return hour_number(first) if first is not None else None
+
+
+# Rolls up every finished hour since the last one rolled up and returns the number of hours covered.
+def rollup_bids(now = None):
+    end = hour_number((now or timezone.now()) - SETTLE) # the hour in progress (or still settling) isn't rolled up
+    start = next_hour()
+    if start is None or start >= end:
+        return 0
+    for window in range(start, end, WINDOW_HOURS):
+        rollup_window(window, min(window + WINDOW_HOURS, end))
+    return end - start
+
+
+# rolls up the bids placed in hours [start, end) in one transaction
+def rollup_window(start, end):
+    rows = list(Bids.objects.filter(time_placed__gte = hour_start(start), time_placed__lt = hour_start(end))
+                .values_list("listing_id", "listing__category_id", "time_placed", "amount", "id"))
+    if not rows:
+        return
+    listing_ids, category_ids, times, amounts, bid_ids = zip(*rows)
+    listings = np.array(listing_ids, dtype = np.int64)
+    categories = np.array([-1 if category is None else category for category in category_ids], dtype = np.int64)
+    seconds = np.fromiter((moment.timestamp() for moment in times), dtype = np.float64, count = len(times))
+    hours = (seconds // HOUR).astype(np.int64)
+    amounts = np.array(amounts, dtype = np.int64)
+
+    # listings: in bid order within each (listing, hour), so the first and last bids give the open and close
+    order = np.lexsort((np.array(bid_ids), seconds, hours, listings))
+    grouped_listings, grouped_hours, ordered = listings[order], hours[order], amounts[order]
+    starts, ends = group_bounds(grouped_listings, grouped_hours)
+    listing_rows = [
+        ListingPriceHour(listing_id = listing, hour = hour_start(hour), bids = count, open = first, high = high, low = low, close = last)
+        for listing, hour, count, first, high, low, last in zip(
+            grouped_listings[starts].tolist(), grouped_hours[starts].tolist(), (ends - starts).tolist(),
+            ordered[starts].tolist(), np.maximum.reduceat(ordered, starts).tolist(),
+            np.minimum.reduceat(ordered, starts).tolist(), ordered[ends - 1].tolist(),
+        )
+    ]
+
+    # categories: listings without one are left out
+    filed = categories >= 0
+    order = np.lexsort((hours[filed], categories[filed]))
+    category_rows = []
+    if order.size:
+        grouped_categories, grouped_hours, ordered = categories[filed][order], hours[filed][order], amounts[filed][order]
+        starts, ends = group_bounds(grouped_categories, grouped_hours)
+        category_rows = [
+            CategoryPriceHour(category_id = category, hour = hour_start(hour), bids = count, volume = volume, high = high, low = low)
+            for category, hour, count, volume, high, low in zip(
+                grouped_categories[starts].tolist(), grouped_hours[starts].tolist(), (ends - starts).tolist(),
+                np.add.reduceat(ordered, starts).tolist(), np.maximum.reduceat(ordered, starts).tolist(),
+                np.minimum.reduceat(ordered, starts).tolist(),
+            )
+        ]
+
+    # ignore_conflicts makes a window rolled up twice (e.g. by two overlapping runs) harmless
+    with transaction.atomic():
+        ListingPriceHour.objects.bulk_create(listing_rows, ignore_conflicts = True)
+        CategoryPriceHour.objects.bulk_create(category_rows, ignore_conflicts = True)
+
+
+# (starts, ends) of the runs of equal (key, hour) pairs in sorted arrays
+def group_bounds(keys, hours):
+    changes = np.flatnonzero((np.diff(keys) != 0) | (np.diff(hours) != 0)) + 1
+    return np.concatenate(([0], changes)), np.concatenate((changes, [keys.size]))
+
+
+# the hour numbers of a chart of the given length ending with the last finished hour, and their ISO timestamps
+def chart_hours(hours, now = None):
+    end = hour_number(now or timezone.now())
+    numbers = np.arange(end - hours, end, dtype = np.int64)
+    labels = np.datetime_as_string((numbers * HOUR).astype("datetime64[s]"), unit = "s", timezone = "UTC")
+    return numbers, labels
+
+
+# places values (at the given hour numbers) into a dense series over numbers, with fill where there were no rows
+def dense(numbers, row_hours, values, fill):
+    series = np.full(numbers.size, fill, dtype = np.float64)
+    series[row_hours - numbers[0]] = values
+    return series
+
+
+def json_list(series):
+    return [None if np.isnan(value) else value for value in series.tolist()]
+
+
+# Chart data for a listing's price over the last hours: the closing price of every hour (carried forward through
+# hours without bids, from before the chart if need be), each hour's high and low, and its number of bids
+def listing_chart(listing_id, hours, now = None):
+    numbers, labels = chart_hours(hours, now)
+    first = hour_start(numbers[0])
+    rows = list(ListingPriceHour.objects.filter(listing_id = listing_id, hour__gte = first, hour__lt = hour_start(numbers[-1] + 1))
+                .order_by("hour").values_list("hour", "bids", "high", "low", "close"))
+    before = ListingPriceHour.objects.filter(listing_id = listing_id, hour__lt = first).order_by("-hour").values_list("close", flat = True).first()
+    row_hours = np.array([hour_number(row[0]) for row in rows], dtype = np.int64)
+    bids, high, low, close = (np.array([row[i] for row in rows], dtype = np.float64) for i in range(1, 5))
+
+    price = dense(numbers, row_hours, close, np.nan)
+    if before is not None and np.isnan(price[0]):
+        price[0] = before
+    # carry each price forward: every hour takes the value of the last hour at or before it that has one
+    last_known = np.maximum.accumulate(np.where(np.isnan(price), 0, np.arange(price.size)))
+    price = price[last_known]
+    return {
+        "hours": labels.tolist(),
+        "price": json_list(price),
+        "high": json_list(dense(numbers, row_hours, high, np.nan)),
+        "low": json_list(dense(numbers, row_hours, low, np.nan)),
+        "bids": dense(numbers, row_hours, bids, 0).astype(np.int64).tolist(),
+    }
+
+
+# Chart data for a category over the last hours: each hour's average, high and low bid, and its number and total
+def category_chart(category_id, hours, now = None):
+    numbers, labels = chart_hours(hours, now)
+    rows = list(CategoryPriceHour.objects.filter(category_id = category_id, hour__gte = hour_start(numbers[0]), hour__lt = hour_start(numbers[-1] + 1))
+                .order_by("hour").values_list("hour", "bids", "volume", "high", "low"))
+    row_hours = np.array([hour_number(row[0]) for row in rows], dtype = np.int64)
+    bids, volume, high, low = (np.array([row[i] for row in rows], dtype = np.float64) for i in range(1, 5))
+
+    bids = dense(numbers, row_hours, bids, 0)
+    volume = dense(numbers, row_hours, volume, 0)
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        average = np.where(bids > 0, volume / bids, np.nan)
+    return {
+        "hours": labels.tolist(),
+        "average": json_list(np.round(average, 2)),
+        "high": json_list(dense(numbers, row_hours, high, np.nan)),
+        "low": json_list(dense(numbers, row_hours, low, np.nan)),
+        "bids": bids.astype(np.int64).tolist(),
+        "volume": volume.astype(np.int64).tolist(),
+    }
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import re
+import threading
+from collections import defaultdict
+
+# Live bid updates for listing pages over WebSockets, served by commerce/asgi.py next to the Django application.
+# The pub/sub layer lives in the server process: bids placed through this process are pushed to the WebSockets it
+# holds, with no external broker. An idle subscriber is one socket waiting on a queue, so one process holds
+# thousands of them.
+
+LISTING_PATH = re.compile(r"^/ws/listings/(\d+)$")
+
+# messages queued for a subscriber that isn't reading; past this the oldest are dropped since only the latest price matters
+QUEUE_SIZE = 32
+
+
+class Broker:
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.loop = None
+        self.lock = threading.Lock()
+
+    def subscribe(self, listing_id):
+        self.loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(QUEUE_SIZE)
+        with self.lock:
+            self.subscribers[listing_id].add(queue)
+        return queue
+
+    def unsubscribe(self, listing_id, queue):
+        with self.lock:
+            self.subscribers[listing_id].discard(queue)
+            if not self.subscribers[listing_id]:
+                del self.subscribers[listing_id]
+
+    def subscriber_count(self, listing_id = None):
+        with self.lock:
+            if listing_id is not None:
+                return len(self.subscribers.get(listing_id, ()))
+            return sum(len(queues) for queues in self.subscribers.values())
+
+    # Sends message to everyone watching the listing. Safe to call from any thread (sync views run in worker
+    # threads): delivery is handed to the event loop the subscribers are waiting on.
+    def publish(self, listing_id, message):
+        loop = self.loop
+        if loop is None or loop.is_closed() or not self.subscriber_count(listing_id):
+            return
+        text = json.dumps(message) # encoded once for every subscriber
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self.deliver(listing_id, text)
+        else:
+            loop.call_soon_threadsafe(self.deliver, listing_id, text)
+
+    def deliver(self, listing_id, text):
+        with self.lock:
+            queues = list(self.subscribers.get(listing_id, ()))
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(text)
+
+
+broker = Broker()
+
+
+# ASGI application for ws/listings/<id>: accepts the connection and forwards every message published for
+# that listing until the client disconnects
+async def listing_updates(scope, receive, send):
+    match = LISTING_PATH.match(scope["path"])
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+    if not match:
+        await send({"type": "websocket.close", "code": 4404})
+        return
+    listing_id = int(match.group(1))
+    await send({"type": "websocket.accept"})
+
+    queue = broker.subscribe(listing_id)
+    forwarding = asyncio.ensure_future(forward(queue, send))
+    try:
+        while (await receive())["type"] != "websocket.disconnect":
+            pass # anything the client sends is ignored
+    finally:
+        forwarding.cancel()
+        broker.unsubscribe(listing_id, queue)
+
+
+async def forward(queue, send):
+    while True:
+        await send({"type": "websocket.send", "text": await queue.get()})
+
+
+# publishes a new bid once the transaction that placed it commits, with the listing's bid count after it (a proxy
+# bid can write two bids at once, so clients set the count rather than add one per message)
+def publish_bid(listing_id, amount, bidder, bid_count):
+    broker.publish(listing_id, {"type": "bid", "listing": listing_id, "amount": amount, "bidder": bidder.username, "bid_count": bid_count})
+
+
+def publish_closed(listing_ids):
+    for listing_id in listing_ids:
+        broker.publish(int(listing_id), {"type": "closed", "listing": int(listing_id)})
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError
+
+from auctions.closing import close_due_listings
+
+# how long to wait before retrying a batch that failed on a lock
+RETRY_SECONDS = 0.1
+
+
+# Closes timed auctions once their end time passes. It runs until stopped, closing every due listing in batches
+# and then checking again every --interval seconds; with --once it closes what is due and exits (e.g. from cron).
+# Due listings are found through a partial index on ends_at, so each check costs the same however big the table is,
+# and several closers can run at the same time. A batch that fails on a lock (e.g. "database is locked" when other
+# closers held sqlite's write lock for longer than the busy timeout) is retried, so the closer keeps running.
+class Command(BaseCommand):
+    help = "Close listings whose end time has passed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--interval", type=float, default=5, help="seconds to wait between checks")
+        parser.add_argument("--once", action="store_true", help="close the listings that are due now and exit")
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.perf_counter()
+            closed = self.close_due(options["batch_size"])
+            if closed:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"closed {closed} listings in {elapsed:.2f}s ({closed / elapsed:.0f} rows/s)")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
+
+    # closes batches until fewer than a full batch was due
+    def close_due(self, batch_size):
+        total = 0
+        while True:
+            try:
+                closed = close_due_listings(batch_size)
+            except OperationalError as error:
+                self.stderr.write(f"retrying a batch after: {error}")
+                time.sleep(RETRY_SECONDS)
+                continue
+            total += closed
+            if closed < batch_size:
+                return total
@@ -0,0 +1,184 @@
+import asyncio
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from auctions.cache import listing_cache
+from auctions.models import User, Category, Listings
+from auctions.seeding import seed_dataset
+
+
+# Compares requests per second of the read pages through the ASGI application (commerce/asgi.py) and the WSGI one
+# (commerce/wsgi.py) at the same concurrency, against a freshly seeded test database (a file on sqlite, so every
+# thread sees the same data). The applications are called directly: ASGI from concurrent tasks on one event loop and
+# WSGI from a pool of threads as a threaded server would, so the numbers compare the two request paths rather than
+# any particular server. Prints JSON.
+class Command(BaseCommand):
+    help = "Compare ASGI and WSGI throughput of the read pages at high concurrency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--listings", type=int, default=2000)
+        parser.add_argument("--requests", type=int, default=500, help="requests per page and entry point")
+        parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at once")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        test_settings = connection.settings_dict["TEST"]
+        old_test_name = test_settings.get("NAME")
+        directory = tempfile.TemporaryDirectory()
+        if connection.vendor == "sqlite":
+            test_settings["NAME"] = os.path.join(directory.name, "bench.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings["NAME"] = old_test_name
+            directory.cleanup()
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+    def run(self, options):
+        from commerce.asgi import application as asgi_application
+        from commerce.wsgi import application as wsgi_application
+
+        rng = random.Random(options["seed"])
+        user_ids, listing_ids = seed_dataset(users=options["users"], listings=options["listings"], seed=options["seed"], prefix="bench")
+        client = Client()
+        client.force_login(User.objects.get(pk=rng.choice(user_ids)))
+        cookie = f"sessionid={client.cookies['sessionid'].value}"
+        active_ids = list(Listings.objects.filter(active=True).values_list("id", flat=True))
+        slugs = list(Category.objects.values_list("slug", flat=True))
+        connection.close() # the benchmark's threads open their own connections
+
+        count = options["requests"]
+        pages = {
+            "index": ["/"] * count,
+            "listing": [f"/listings/{rng.choice(active_ids)}" for _ in range(count)],
+            "specific_category": [f"/categories/{rng.choice(slugs)}" for _ in range(count)],
+            "categories": ["/categories"] * count,
+            "view_watchlist": ["/watchlist"] * count,
+        }
+        report = {
+            "dataset": {"users": len(user_ids), "listings": len(listing_ids), "seed": options["seed"]},
+            "database": connection.vendor,
+            "concurrency": options["concurrency"],
+            "asgi": {},
+            "wsgi": {},
+        }
+        for name, paths in pages.items():
+            for entry_point, run in (("asgi", self.run_asgi), ("wsgi", self.run_wsgi)):
+                # both start from empty caches, so neither benefits from fragments the other rendered
+                cache.clear()
+                listing_cache().clear()
+                app = asgi_application if entry_point == "asgi" else wsgi_application
+                elapsed, timings = run(app, paths, cookie, options["concurrency"])
+                report[entry_point][name] = self.summary(elapsed, timings)
+        for name in pages:
+            report.setdefault("asgi_vs_wsgi", {})[name] = round(report["asgi"][name]["requests_per_second"] / report["wsgi"][name]["requests_per_second"], 2)
+        return report
+
+    def run_asgi(self, app, paths, cookie, concurrency):
+        timings = []
+
+        async def request(path):
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+                "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+                "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+                "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+            }
+            received = False
+            disconnected = asyncio.Event() # never set: the client stays connected until the response is sent
+            statuses = []
+
+            async def receive():
+                nonlocal received
+                if not received:
+                    received = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await disconnected.wait()
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            await app(scope, receive, send)
+            return statuses[0]
+
+        async def worker(queue):
+            while queue:
+                path = queue.pop()
+                start = time.perf_counter()
+                status = await request(path)
+                timings.append(time.perf_counter() - start)
+                self.check_status(path, status)
+
+        async def main():
+            queue = list(paths)
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(queue) for _ in range(concurrency)))
+            return time.perf_counter() - start
+
+        return asyncio.run(main()), timings
+
+    def run_wsgi(self, app, paths, cookie, concurrency):
+        def request(path):
+            environ = {
+                "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "", "SCRIPT_NAME": "",
+                "SERVER_NAME": "testserver", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+                "HTTP_HOST": "testserver", "HTTP_COOKIE": cookie, "REMOTE_ADDR": "127.0.0.1",
+                "wsgi.version": (1, 0), "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr,
+                "wsgi.multithread": True, "wsgi.multiprocess": False, "wsgi.run_once": False,
+            }
+            statuses = []
+            start = time.perf_counter()
+            body = app(environ, lambda status, headers, exc_info=None: statuses.append(int(status.split()[0])))
+            try:
+                for _ in body:
+                    pass
+            finally:
+                body.close()
+            elapsed = time.perf_counter() - start
+            self.check_status(path, statuses[0])
+            return elapsed
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            timings = list(pool.map(request, paths))
+        return time.perf_counter() - start, timings
+
+    def check_status(self, path, status):
+        if status >= 400:
+            raise CommandError(f"{path} returned {status}")
+
+    def summary(self, elapsed, timings):
+        percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+        return {
+            "requests": len(timings),
+            "requests_per_second": round(len(timings) / elapsed, 1),
+            "p50_ms": round(percentiles[49] * 1000, 3),
+            "p95_ms": round(percentiles[94] * 1000, 3),
+            "p99_ms": round(percentiles[98] * 1000, 3),
+        }
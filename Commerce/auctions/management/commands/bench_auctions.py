@@ -0,0 +1,121 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from auctions.cache import listing_cache
+from auctions.models import User, Category, Listings
+from auctions.seeding import seed_dataset
+
+
+# Benchmarks the main pages with the test client against a freshly seeded test database, so every run sees the
+# same data, and prints p50/p95/p99 latency and query counts per endpoint as JSON. Given --baseline (the JSON of an
+# earlier run), it fails when an endpoint makes more queries than the baseline or its p95 is more than --tolerance slower.
+class Command(BaseCommand):
+    help = "Benchmark the auction pages and report latency percentiles and query counts as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--listings", type=int, default=2000)
+        parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+        parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown against the baseline, as a fraction")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                regressions = self.compare(report, json.load(file), options["tolerance"])
+            if regressions:
+                raise CommandError("performance regressions:\n  " + "\n  ".join(regressions))
+
+    def run(self, options):
+        rng = random.Random(options["seed"])
+        user_ids, listing_ids = seed_dataset(users=options["users"], listings=options["listings"], seed=options["seed"], prefix="bench")
+        cache.clear()
+        listing_cache().clear()
+
+        client = Client()
+        client.force_login(User.objects.get(pk=rng.choice(user_ids)))
+        slugs = list(Category.objects.values_list("slug", flat=True))
+        active_ids = list(Listings.objects.filter(active=True, bid_count__gt=0).exclude(owner__user=client.session["_auth_user_id"])
+                          .values_list("id", flat=True))
+
+        def bid():
+            listing_id = rng.choice(active_ids)
+            amount = Listings.objects.values_list("current_price", flat=True).get(pk=listing_id) + 1
+            return lambda: client.post(reverse("bid", args=[listing_id]), {"bid": amount})
+
+        endpoints = [
+            ("index", lambda: lambda: client.get(reverse("index"))),
+            ("listing", lambda: (lambda listing_id: lambda: client.get(reverse("listing", args=[listing_id])))(rng.choice(listing_ids))),
+            ("bid", bid),
+            ("specific_category", lambda: (lambda name: lambda: client.get(reverse("specific_category", args=[name])))(rng.choice(slugs))),
+            ("view_watchlist", lambda: lambda: client.get(reverse("view_watchlist"))),
+        ]
+        report = {
+            "dataset": {"users": len(user_ids), "listings": len(listing_ids), "seed": options["seed"]},
+            "database": connection.vendor,
+            "endpoints": {},
+        }
+        for name, prepare in endpoints:
+            report["endpoints"][name] = self.measure(prepare, options["requests"])
+        return report
+
+    # prepare() does any untimed setup and returns the request to time
+    def measure(self, prepare, count):
+        timings, queries = [], []
+        for _ in range(count):
+            request = prepare()
+            start = time.perf_counter()
+            response = request()
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise CommandError(f"{response.request['PATH_INFO']} returned {response.status_code}")
+            # counted by the metrics middleware, which includes the queries async views run on other threads' connections
+            queries.append(len(response.wsgi_request.metrics.queries))
+        percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+        return {
+            "requests": count,
+            "p50_ms": round(percentiles[49], 3),
+            "p95_ms": round(percentiles[94], 3),
+            "p99_ms": round(percentiles[98], 3),
+            "mean_ms": round(statistics.mean(timings), 3),
+            "queries_mean": round(statistics.mean(queries), 2),
+            "queries_max": max(queries),
+        }
+
+    def compare(self, report, baseline, tolerance):
+        regressions = []
+        for name, result in report["endpoints"].items():
+            before = baseline.get("endpoints", {}).get(name)
+            if before is None:
+                continue
+            if result["queries_max"] > before["queries_max"]:
+                regressions.append(f"{name}: {result['queries_max']} queries, baseline {before['queries_max']}")
+            if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{name}: p95 {result['p95_ms']:.3f} ms, baseline {before['p95_ms']:.3f} ms")
+        return regressions
@@ -0,0 +1,67 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from auctions.management.commands.stress_bids import stress_bids
+
+# sqlite as it behaves out of the box: rollback journal, a commit waits for fsync, 5 second busy timeout
+DEFAULT_PROFILE = {"pragmas": {"journal_mode": "delete", "synchronous": "full"}, "timeout": 5}
+
+
+# Runs the stress_bids workload against a fresh sqlite database file twice, once with sqlite's defaults and once
+# with the pragmas and busy timeout from settings (see SQLITE_PRAGMAS), and compares placed bids per second and
+# "database is locked" failures. The bidders are separate processes by default, like the workers of a server.
+class Command(BaseCommand):
+    help = "Compare concurrent bid throughput with sqlite's default settings and with the tuned database profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bidders", type=int, default=16)
+        parser.add_argument("--bids", type=int, default=100, help="bids attempted by each bidder")
+        parser.add_argument("--threads-only", action="store_true", help="bid from threads of this process instead of separate processes")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("this benchmark compares sqlite settings; the default database isn't sqlite")
+        tuned = {"pragmas": settings.SQLITE_PRAGMAS, "timeout": connection.settings_dict["OPTIONS"].get("timeout", 5)}
+
+        test_settings = connection.settings_dict["TEST"]
+        old_test_name = test_settings.get("NAME")
+        old_options = dict(connection.settings_dict["OPTIONS"])
+        directory = tempfile.TemporaryDirectory()
+        test_settings["NAME"] = os.path.join(directory.name, "bench.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = {name: self.run(profile, options) for name, profile in (("default", DEFAULT_PROFILE), ("tuned", tuned))}
+        finally:
+            connection.settings_dict["OPTIONS"] = old_options
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings["NAME"] = old_test_name
+            directory.cleanup()
+
+        for name, result in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f"  {result['placed'] / result['elapsed']:.1f} bids/s, {attempts_per_second(result):.1f} attempts/s, placed {result['placed']}, "
+                              f"rejected as stale {result['rejected']}, failed on lock {result['locked']}")
+            if not result["consistent"]:
+                self.stdout.write(self.style.ERROR("  listing stats do not match the bids table"))
+        # every attempt is a read and a bid transaction; how many of them are placed rather than rejected as stale
+        # depends on how the bidders happened to interleave, so attempts are the fairer measure of throughput
+        default, tuned = (attempts_per_second(results[name]) for name in ("default", "tuned"))
+        self.stdout.write(f"tuned profile: {tuned / default:.2f}x the bid attempts per second of sqlite's defaults")
+
+    def run(self, profile, options):
+        connection.close() # the pragmas are applied as connections open
+        connection.settings_dict["OPTIONS"] = {**connection.settings_dict["OPTIONS"], "timeout": profile["timeout"]}
+        with override_settings(SQLITE_PRAGMAS=profile["pragmas"]):
+            try:
+                return stress_bids(options["bidders"], options["bids"], processes=not options["threads_only"])
+            finally:
+                connection.close()
+
+
+def attempts_per_second(result):
+    return (result["placed"] + result["rejected"] + result["locked"]) / result["elapsed"]
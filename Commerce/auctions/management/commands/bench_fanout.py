@@ -0,0 +1,74 @@
+import asyncio
+import json
+import threading
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from auctions.live import broker, listing_updates
+
+
+# Load test for live bid updates: connects --subscribers in-memory WebSocket clients to one listing through the
+# same ASGI application commerce/asgi.py serves, then publishes --messages bids from another thread (as a view
+# would) and reports how long each took to reach the clients, and how much memory the idle subscribers use.
+class Command(BaseCommand):
+    help = "Measure fan-out latency of live bid updates to many WebSocket subscribers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=5000)
+        parser.add_argument("--messages", type=int, default=20)
+        parser.add_argument("--listing", type=int, default=1)
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options["subscribers"], options["messages"], options["listing"]))
+
+    async def run(self, subscribers, messages, listing_id):
+        latencies = []
+        received = asyncio.Queue()
+        disconnect = asyncio.Event()
+
+        def client():
+            connected = False
+
+            async def receive():
+                nonlocal connected
+                if not connected:
+                    connected = True
+                    return {"type": "websocket.connect"}
+                await disconnect.wait()
+                return {"type": "websocket.disconnect", "code": 1000}
+
+            async def send(event):
+                if event["type"] == "websocket.send":
+                    latencies.append(time.perf_counter() - json.loads(event["text"])["sent_at"])
+                    received.put_nowait(None)
+
+            return listing_updates({"type": "websocket", "path": f"/ws/listings/{listing_id}"}, receive, send)
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        clients = [asyncio.ensure_future(client()) for _ in range(subscribers)]
+        while broker.subscriber_count(listing_id) < subscribers:
+            await asyncio.sleep(0.01)
+        per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / subscribers
+        tracemalloc.stop()
+        self.stdout.write(f"{subscribers} idle subscribers, about {per_subscriber / 1024:.1f} KiB each")
+
+        fan_out_times = []
+        for _ in range(messages):
+            start = time.perf_counter()
+            publisher = threading.Thread(target=broker.publish, args=(listing_id, {"type": "bid", "sent_at": time.perf_counter()}))
+            publisher.start()
+            for _ in range(subscribers):
+                await received.get()
+            publisher.join()
+            fan_out_times.append(time.perf_counter() - start)
+
+        disconnect.set()
+        await asyncio.gather(*clients)
+
+        latencies.sort()
+        percentile = lambda p: latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+        self.stdout.write(f"delivery latency: p50 {percentile(50):.2f} ms, p95 {percentile(95):.2f} ms, p99 {percentile(99):.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+        self.stdout.write(f"full fan-out of one bid to {subscribers} subscribers: {sum(fan_out_times) / messages * 1000:.2f} ms on average")
@@ -0,0 +1,83 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from auctions.models import Category, Listings
+from auctions.search import FTS5Index, InvertedIndex
+
+
+# raised to roll back the synthetic catalog
+class Rollback(Exception):
+    pass
+
+
+# Seeds a synthetic catalog inside a transaction that is rolled back at the end, then times the same random
+# one- and two-word queries against each search backend and against a plain icontains scan for comparison.
+class Command(BaseCommand):
+    help = "Benchmark listing search latency on a synthetic catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=100000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--vocabulary", type=int, default=5000, help="number of distinct words in the catalog")
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        vocabulary = list({"".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(options["vocabulary"])})
+        queries = [" ".join(rng.sample(vocabulary, rng.choice([1, 2]))) for _ in range(options["queries"])]
+
+        try:
+            with transaction.atomic():
+                self.seed(rng, vocabulary, options["listings"])
+
+                backends = []
+                if FTS5Index.available():
+                    backends.append(FTS5Index())
+                else:
+                    self.stdout.write(self.style.WARNING("FTS5 is not available on this database, skipping it"))
+                inverted = InvertedIndex()
+                start = time.perf_counter()
+                inverted.sync()
+                self.stdout.write(f"built the inverted index in {time.perf_counter() - start:.2f}s")
+                backends.append(inverted)
+
+                for backend in backends:
+                    self.report(backend.name, [self.time(backend.search, query) for query in queries])
+                self.report("icontains scan", [self.time(self.icontains, query) for query in queries[:20]])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, rng, vocabulary, count):
+        categories = list(Category.objects.all()) or [None]
+        start = time.perf_counter()
+        Listings.objects.bulk_create([
+            Listings(title=" ".join(rng.choices(vocabulary, k=4)), description=" ".join(rng.choices(vocabulary, k=40)),
+                     starting_bid=1, current_price=1, category=rng.choice(categories))
+            for _ in range(count)
+        ], batch_size=2000)
+        self.stdout.write(f"seeded {count} listings in {time.perf_counter() - start:.2f}s")
+
+    def icontains(self, query):
+        matches = Q()
+        for word in query.split():
+            matches &= Q(title__icontains=word) | Q(description__icontains=word)
+        return list(Listings.objects.filter(matches, active=True).values_list("id", flat=True)[:20])
+
+    def time(self, search, query):
+        start = time.perf_counter()
+        search(query)
+        return time.perf_counter() - start
+
+    def report(self, name, timings):
+        timings = sorted(timings)
+        percentile = lambda p: timings[min(len(timings) - 1, int(p / 100 * len(timings)))] * 1000
+        self.stdout.write(
+            f"{name:>15}: p50 {percentile(50):.2f} ms, p95 {percentile(95):.2f} ms, p99 {percentile(99):.2f} ms, "
+            f"mean {statistics.mean(timings) * 1000:.2f} ms over {len(timings)} queries"
+        )
@@ -0,0 +1,82 @@
+import itertools
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from auctions.models import Category, Listings, Bids, Comments, ListingOwners
+from auctions.pagination import COMMENTS_PAGE_SIZE
+from auctions.seeding import seed_dataset
+
+
+# raised to roll back everything the benchmark did
+class Rollback(Exception):
+    pass
+
+
+# Seeds a synthetic dataset, then prints the EXPLAIN plan and timing of each hot query with and without the
+# composite indexes from the models' Meta.indexes. The top bid lookup is served by the index behind the unique
+# (listing, amount) constraint on Bids, which stays in place. Everything runs in one transaction that is rolled back at the
+# end, so the database is left untouched (this relies on transactional DDL, which sqlite and postgres both have).
+class Command(BaseCommand):
+    help = "Compare EXPLAIN plans and timings of the hot lookup queries with and without the composite indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=20000)
+        parser.add_argument("--bids", type=int, default=10, help="average bids per listing")
+        parser.add_argument("--comments", type=int, default=3, help="average comments per listing")
+        parser.add_argument("--repeat", type=int, default=200, help="times each query is run when timing it")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                listing_ids = self.seed(options)
+                sample = random.Random(0).sample(listing_ids, min(len(listing_ids), 50))
+                queries = self.queries(sample)
+
+                after = {name: self.measure(build, options["repeat"], "with indexes") for name, build in queries}
+                with connection.cursor() as cursor:
+                    for model in (Listings, Comments):
+                        for index in model._meta.indexes:
+                            cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+                before = {name: self.measure(build, options["repeat"], "without indexes") for name, build in queries}
+
+                for name, _ in queries:
+                    self.stdout.write(self.style.MIGRATE_HEADING(name))
+                    self.stdout.write(f"  without indexes: {before[name][0] * 1000:.3f} ms/query")
+                    self.stdout.write(f"    {before[name][1]}")
+                    self.stdout.write(f"  with indexes:    {after[name][0] * 1000:.3f} ms/query")
+                    self.stdout.write(f"    {after[name][1]}")
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, options):
+        _, listing_ids = seed_dataset(users=50, listings=options["listings"], bids=options["bids"], comments=options["comments"],
+                                      watches=0, prefix="explain")
+        return listing_ids
+
+    # (name, function returning a fresh queryset) for each hot lookup
+    def queries(self, sample):
+        picks = itertools.cycle(sample)
+        books = Category.objects.get(slug="books")
+        return [
+            ("index feed page", lambda: Listings.objects.feed()[:25]),
+            ("category feed page", lambda: Listings.objects.feed().filter(category=books)[:25]),
+            ("top bid of a listing", lambda: Bids.objects.filter(listing=next(picks)).order_by("-amount")[:1]),
+            ("comments of a listing", lambda: Comments.objects.filter(listing=next(picks)).order_by("-time_created", "-id")[:COMMENTS_PAGE_SIZE]),
+            ("owner of a listing", lambda: ListingOwners.objects.filter(listing=next(picks))),
+        ]
+
+    # returns (average seconds per query, query plan)
+    def measure(self, build, repeat, label):
+        sql, params = build().query.sql_with_params()
+        with connection.cursor() as cursor:
+            # the label keeps sqlite from reusing a plan it cached before the indexes were dropped
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql} /* {label} */", params)
+            plan = "\n    ".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+        start = time.perf_counter()
+        for _ in range(repeat):
+            list(build())
+        return (time.perf_counter() - start) / repeat, plan
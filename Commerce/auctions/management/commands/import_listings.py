@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions.bulk import CHUNK_SIZE, file_format, import_rows, read_rows
+from auctions.models import User
+
+
+# Imports listings from a CSV or JSON Lines file (or stdin) with the columns of the new listing form, validating
+# each row the same way and reporting the rows rejected and the rows per second.
+class Command(BaseCommand):
+    help = "Bulk import listings from a CSV or JSON Lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="file to import, or - for stdin")
+        parser.add_argument("--owner", required=True, help="username of the user who will own the listings")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="file format (default: from the file extension)")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows written per transaction")
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options["owner"])
+        except User.DoesNotExist:
+            raise CommandError(f"There is no user {options['owner']}.")
+        if options["path"] == "-" and not options["format"]:
+            raise CommandError("--format is required when reading stdin.")
+        try:
+            format = options["format"] or file_format(options["path"])
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        lines = sys.stdin if options["path"] == "-" else open(options["path"], encoding="utf-8", newline="")
+        try:
+            report = import_rows(read_rows(lines, format), owner, options["chunk_size"])
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        if report["rejected"] > len(report["errors"]):
+            self.stderr.write(f"... and {report['rejected'] - len(report['errors'])} more rejected rows")
+        self.stdout.write(f"imported {report['imported']} of {report['rows']} rows ({report['rejected']} rejected) "
+                          f"in {report['seconds']:.2f}s, {report['rows_per_second'] or 0:.0f} rows/s")
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auctions.history import rollup_bids
+
+
+# Rolls up the bids of every finished hour into the hourly price history that the listing and category charts are
+# drawn from. Run it from cron (e.g. every few minutes, or hourly); each run appends the hours that finished since
+# the last one, and a run with nothing new to add costs a couple of queries.
+class Command(BaseCommand):
+    help = "Roll up finished hours of bids into the hourly price history"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        hours = rollup_bids()
+        self.stdout.write(f"rolled up {hours} hours of bids in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auctions.seeding import seed_dataset
+
+
+# Seeds the database with a synthetic dataset for load testing. The same --seed always produces the same data,
+# so runs against a fresh database are comparable.
+class Command(BaseCommand):
+    help = "Seed synthetic users, listings, bids, comments and watchlists"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--listings", type=int, default=1000)
+        parser.add_argument("--bids", type=int, default=5, help="average bids per listing")
+        parser.add_argument("--comments", type=int, default=3, help="average comments per listing")
+        parser.add_argument("--watches", type=int, default=10, help="listings watched by each user")
+        parser.add_argument("--closed", type=float, default=0.2, help="fraction of listings that are closed")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="synthetic", help="prefix of the generated usernames")
+        parser.add_argument("--password", help="password for every generated user (they can't log in without one)")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            user_ids, listing_ids = seed_dataset(options["users"], options["listings"], options["bids"], options["comments"],
+                                                 options["watches"], options["closed"], options["seed"], options["prefix"],
+                                                 options["password"])
+        self.stdout.write(f"seeded {len(user_ids)} users and {len(listing_ids)} listings in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from auctions.bidding import BidRejected, place_bid
+from auctions.models import User, Listings, Bids, ListingOwners
+
+
+# Has many threads bid against each other on one listing and reports how many bids per second were placed.
+# Each thread keeps bidding one more than the price it last saw, so most bids race with another thread's.
+# It runs against a throwaway test database (a file on sqlite, so separate processes share it), so the stress listing
+# and its users never reach the real one.
+class Command(BaseCommand):
+    help = "Stress test concurrent bidding on a single listing and report bids per second"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--bids", type=int, default=200, help="bids attempted by each thread")
+        parser.add_argument("--processes", action="store_true", help="bid from separate processes instead of threads")
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        attempts = options["bids"]
+        setup_test_environment()
+        test_settings = connection.settings_dict["TEST"]
+        old_test_name = test_settings.get("NAME")
+        directory = tempfile.TemporaryDirectory()
+        if connection.vendor == "sqlite":
+            test_settings["NAME"] = os.path.join(directory.name, "stress.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            result = stress_bids(threads, attempts, options["processes"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings["NAME"] = old_test_name
+            directory.cleanup()
+            teardown_test_environment()
+
+        self.stdout.write(f"{threads} {'processes' if options['processes'] else 'threads'} x {attempts} attempts in {result['elapsed']:.2f}s")
+        self.stdout.write(f"placed {result['placed']}, rejected as stale {result['rejected']}, failed on lock {result['locked']}")
+        self.stdout.write(f"{result['placed'] / result['elapsed']:.1f} bids/s, {(threads * attempts) / result['elapsed']:.1f} attempts/s")
+        if result["consistent"]:
+            self.stdout.write(self.style.SUCCESS("listing stats match the bids table: no lost updates"))
+        else:
+            self.stdout.write(self.style.ERROR("listing stats do not match the bids table"))
+
+
+# Runs the stress test on a new listing and returns the placed/rejected/locked counts, the elapsed seconds and whether
+# the listing's stats match its bids afterwards. Each bidder is a thread, or with processes=True a forked process
+# (like separate server workers, which don't share the GIL or a connection).
+def stress_bids(threads, attempts, processes=False):
+    seller, _ = User.objects.get_or_create(username="stress_seller")
+    bidders = [User.objects.get_or_create(username=f"stress_bidder_{i}")[0] for i in range(threads)]
+    listing = Listings.objects.create(title="Stress test", description="Stress test listing", starting_bid=1)
+    ListingOwners.objects.create(listing=listing, user=seller)
+
+    counts = {"placed": 0, "rejected": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def bidder(user):
+        result = bid_repeatedly(listing.id, user, attempts)
+        with lock:
+            for key, count in result.items():
+                counts[key] += count
+
+    if processes:
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        connection.close() # each process opens its own connection
+        workers = [context.Process(target=lambda user=user: results.put(bid_repeatedly(listing.id, user, attempts))) for user in bidders]
+    else:
+        workers = [threading.Thread(target=bidder, args=(user,)) for user in bidders]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    if processes:
+        for _ in workers:
+            for key, count in results.get().items():
+                counts[key] += count
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return {**counts, "elapsed": elapsed, "consistent": stats_match_bids(listing, counts["placed"])}
+
+
+# one bidder: bids one more than the price it last saw, attempts times, and returns how the bids went
+def bid_repeatedly(listing_id, user, attempts):
+    counts = {"placed": 0, "rejected": 0, "locked": 0}
+    for _ in range(attempts):
+        try:
+            price = Listings.objects.values_list("current_price", flat=True).get(pk=listing_id)
+            place_bid(listing_id, user, price + 1)
+            counts["placed"] += 1
+        except BidRejected:
+            counts["rejected"] += 1
+        except OperationalError: # sqlite reports "database is locked" when it can't get the lock in time
+            counts["locked"] += 1
+    connection.close()
+    return counts
+
+
+# whether the listing's stored bid stats agree with its bids, and placed bids were all saved
+def stats_match_bids(listing, placed):
+    listing.refresh_from_db()
+    top = Bids.objects.filter(listing=listing).order_by("-amount").first()
+    return (
+        listing.bid_count == Bids.objects.filter(listing=listing).count() == placed
+        and (top is None or (listing.current_price == top.amount and listing.high_bidder_id == top.bidders_id))
+    )
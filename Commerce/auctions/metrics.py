@@ -0,0 +1,242 @@
+import bisect
+import contextvars
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates
+
+from .cache import cache_stats
+
+# Per-view request metrics: for each URL name, the number of SQL queries and their total time, the view time and
+# the template render time, kept as in-memory histograms and served at /metrics in the Prometheus text format.
+# QueryMetricsMiddleware records them; TimedDjangoTemplates (the template backend in settings) times the renders.
+#
+# Settings:
+#   AUCTIONS_SLOW_REQUEST_SECONDS  log requests slower than this, with their slowest queries (off when unset)
+#   AUCTIONS_REPEATED_QUERY_LIMIT  a statement run this many times in one request is logged as a likely N+1 (10)
+
+logger = logging.getLogger("auctions.metrics")
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# numbers and quoted strings are replaced so that the same statement with other parameters counts as a repeat
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+class Histogram:
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {} # view -> [bucket counts..., over the last bucket, count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, view, value):
+        with self.lock:
+            series = self.series.setdefault(view, [0] * (len(self.buckets) + 3))
+            series[bisect.bisect_left(self.buckets, value)] += 1 # counts are made cumulative when exported
+            series[-2] += 1
+            series[-1] += value
+
+    def export(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {view: list(values) for view, values in sorted(self.series.items())}
+        for view, values in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{view="{view}",le="+Inf"}} {values[-2]}')
+            lines.append(f'{self.name}_count{{view="{view}"}} {values[-2]}')
+            lines.append(f'{self.name}_sum{{view="{view}"}} {values[-1]:.6f}')
+        return lines
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+
+HISTOGRAMS = {
+    "request": Histogram("auctions_request_duration_seconds", "Time spent handling the request.", SECONDS_BUCKETS),
+    "view": Histogram("auctions_view_duration_seconds", "Time spent in the view function.", SECONDS_BUCKETS),
+    "template": Histogram("auctions_template_render_seconds", "Time spent rendering templates.", SECONDS_BUCKETS),
+    "sql_count": Histogram("auctions_sql_queries", "Number of SQL queries run for the request.", QUERY_BUCKETS),
+    "sql_time": Histogram("auctions_sql_duration_seconds", "Time spent running SQL queries.", SECONDS_BUCKETS),
+}
+repeated_query_requests = Counter()
+repeated_query_lock = threading.Lock()
+
+# the measurements of the request being handled in this thread or task; sync_to_async and async_to_sync carry it
+# along, so queries an async view runs in worker threads are counted against its request too
+current_request = contextvars.ContextVar("auctions_metrics_request", default = None)
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.queries = [] # (sql, seconds)
+        self.template_seconds = 0.0
+        self.view_started = None
+        self.view_seconds = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+
+# a django.db execute_wrapper that times every query into the metrics of the request it runs for, if any
+def record_query(execute, sql, params, many, context):
+    metrics = current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+# installed on every connection as it is opened, in whichever thread that happens
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+# Works in both the WSGI and the ASGI handler, so it doesn't force async views back onto a thread. The measurements
+# are also left on request.metrics, e.g. for benchmarks to read from the test client's response.wsgi_request.
+class QueryMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = request.metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.finish(request, metrics, start)
+        return response
+
+    async def __acall__(self, request):
+        metrics = request.metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.finish(request, metrics, start)
+        return response
+
+    def finish(self, request, metrics, start):
+        elapsed = time.perf_counter() - start
+        if metrics.view_started is not None:
+            metrics.view_seconds = time.perf_counter() - metrics.view_started
+
+        match = request.resolver_match
+        if match is not None and match.url_name:
+            self.record(match.url_name, request, metrics, elapsed)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+
+    def record(self, view, request, metrics, elapsed):
+        HISTOGRAMS["request"].observe(view, elapsed)
+        HISTOGRAMS["view"].observe(view, metrics.view_seconds)
+        HISTOGRAMS["template"].observe(view, metrics.template_seconds)
+        HISTOGRAMS["sql_count"].observe(view, len(metrics.queries))
+        HISTOGRAMS["sql_time"].observe(view, sum(seconds for _, seconds in metrics.queries))
+
+        repeats = Counter(LITERALS.sub("?", sql) for sql, _ in metrics.queries)
+        statement, times = repeats.most_common(1)[0] if repeats else (None, 0)
+        if times >= getattr(settings, "AUCTIONS_REPEATED_QUERY_LIMIT", 10):
+            with repeated_query_lock:
+                repeated_query_requests[view] += 1
+            logger.warning("%s %s ran the same query %d times (likely N+1): %s", view, request.path, times, statement)
+
+        slow = getattr(settings, "AUCTIONS_SLOW_REQUEST_SECONDS", None)
+        if slow is not None and elapsed >= slow:
+            slowest = sorted(metrics.queries, key = lambda query: query[1], reverse = True)[:5]
+            logger.warning(
+                "slow request: %s %s took %.3fs (view %.3fs, templates %.3fs, %d queries in %.3fs); slowest queries:\n%s",
+                view, request.path, elapsed, metrics.view_seconds, metrics.template_seconds, len(metrics.queries),
+                sum(seconds for _, seconds in metrics.queries),
+                "\n".join(f"  {seconds * 1000:.1f} ms  {sql}" for sql, seconds in slowest),
+            )
+
+
+# A template whose renders are timed into the current request's metrics
+class TimedTemplate:
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context = None, request = None):
+        metrics = current_request.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_seconds += time.perf_counter() - start
+
+
+# The Django template backend, with every render through get_template/render/render_to_string timed.
+# Templates included from other templates are rendered inside their parent, so nothing is counted twice.
+class TimedDjangoTemplates(DjangoTemplates):
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+# all metrics in the Prometheus text exposition format
+def export_metrics():
+    lines = []
+    for histogram in HISTOGRAMS.values():
+        lines += histogram.export()
+    lines += ["# HELP auctions_repeated_query_requests_total Requests that ran one statement many times (likely N+1).",
+              "# TYPE auctions_repeated_query_requests_total counter"]
+    with repeated_query_lock:
+        lines += [f'auctions_repeated_query_requests_total{{view="{view}"}} {count}' for view, count in sorted(repeated_query_requests.items())]
+    lines += ["# HELP auctions_listing_cache_lookups_total Lookups of cached listing page fragments.",
+              "# TYPE auctions_listing_cache_lookups_total counter"]
+    for fragment, counts in cache_stats().items():
+        if fragment != "total":
+            lines.append(f'auctions_listing_cache_lookups_total{{fragment="{fragment}",result="hit"}} {counts["hits"]}')
+            lines.append(f'auctions_listing_cache_lookups_total{{fragment="{fragment}",result="miss"}} {counts["misses"]}')
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS.values():
+        histogram.reset()
+    with repeated_query_lock:
+        repeated_query_requests.clear()
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0008_auto_20201220_1941'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listings',
+            name='bid_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listings',
+            name='current_price',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listings',
+            name='high_bidder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leading_listings', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='listings',
+            name='category',
+            field=models.CharField(choices=[(None, 'Choose Category'), ('Toys', 'Toys'), ('Electronics', 'Electronics'), ('Fashion', 'Fashion'), ('Home', 'Home'), ('Arts and Crafts', 'Arts and Crafts'), ('Books', 'Books'), ('Vehicles', 'Vehicles')], default=None, max_length=64),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+# fills in current_price, bid_count and high_bidder for listings that existed before those columns did
+def backfill_bid_stats(apps, schema_editor):
+    Listings = apps.get_model('auctions', 'Listings')
+    Bids = apps.get_model('auctions', 'Bids')
+
+    stats = {row['listing']: row for row in Bids.objects.values('listing').annotate(count=Count('id'), top=Max('amount'))}
+    # the first bid placed at the top amount is the winning one
+    leaders = {}
+    for listing_id, bidder_id in Bids.objects.order_by('listing', '-amount', 'id').values_list('listing', 'bidders'):
+        leaders.setdefault(listing_id, bidder_id)
+
+    listings = list(Listings.objects.all())
+    for listing in listings:
+        row = stats.get(listing.id)
+        if row:
+            listing.bid_count = row['count']
+            listing.current_price = row['top']
+            listing.high_bidder_id = leaders[listing.id]
+        else:
+            listing.bid_count = 0
+            listing.current_price = listing.starting_bid
+            listing.high_bidder_id = None
+    Listings.objects.bulk_update(listings, ['bid_count', 'current_price', 'high_bidder'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0009_listings_bid_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_bid_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:54
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# Bids placed by racing bidders before bids were placed atomically can share an amount on the same listing.
+# The earliest of them is the one that won, so the later copies are removed and the bid counts corrected
+# before the unique constraint is added.
+def remove_duplicate_bids(apps, schema_editor):
+    Listings = apps.get_model('auctions', 'Listings')
+    Bids = apps.get_model('auctions', 'Bids')
+
+    duplicates = Bids.objects.values('listing', 'amount').annotate(count=Count('id')).filter(count__gt=1)
+    affected = set()
+    for row in duplicates:
+        ids = list(Bids.objects.filter(listing=row['listing'], amount=row['amount']).order_by('id').values_list('id', flat=True))
+        Bids.objects.filter(id__in=ids[1:]).delete()
+        affected.add(row['listing'])
+    for listing_id in affected:
+        Listings.objects.filter(pk=listing_id).update(bid_count=Bids.objects.filter(listing=listing_id).count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0010_backfill_listing_bid_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_bids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='bids',
+            constraint=models.UniqueConstraint(fields=('listing', 'amount'), name='unique_bid_amount_per_listing'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:56
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+# A listing can have been given more than one owner row. The first one is the listing's creator, so the later ones
+# are removed before the listing becomes unique.
+def remove_duplicate_owners(apps, schema_editor):
+    ListingOwners = apps.get_model('auctions', 'ListingOwners')
+
+    duplicates = ListingOwners.objects.values('listing').annotate(count=Count('id')).filter(count__gt=1)
+    for row in duplicates:
+        ids = list(ListingOwners.objects.filter(listing=row['listing']).order_by('id').values_list('id', flat=True))
+        ListingOwners.objects.filter(id__in=ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0011_unique_bid_amount_per_listing'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_owners, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='listingowners',
+            name='listing',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='owner', to='auctions.listings'),
+        ),
+        migrations.AddIndex(
+            model_name='comments',
+            index=models.Index(fields=['listing', 'id'], name='comment_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listings',
+            index=models.Index(condition=models.Q(('active', True)), fields=['-time_created', '-id'], name='listing_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listings',
+            index=models.Index(condition=models.Q(('active', True)), fields=['category', '-time_created', '-id'], name='listing_category_feed_idx'),
+        ),
+    ]
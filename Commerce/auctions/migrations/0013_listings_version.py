@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:00
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+# existing listings are treated as last modified when they were created
+def set_last_modified(apps, schema_editor):
+    Listings = apps.get_model('auctions', 'Listings')
+    Listings.objects.update(last_modified=F('time_created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0012_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listings',
+            name='last_modified',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='listings',
+            name='version',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(set_last_modified, migrations.RunPython.noop),
+    ]
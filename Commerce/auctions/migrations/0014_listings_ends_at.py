@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:02
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+# marks the highest bid of every listing that was closed before bids could win
+def settle_closed_listings(apps, schema_editor):
+    Bids = apps.get_model('auctions', 'Bids')
+    Bids.objects.filter(listing__active=False, listing__bid_count__gt=0, amount=F('listing__current_price')).update(winning=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0013_listings_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bids',
+            name='winning',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='listings',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='listings',
+            index=models.Index(condition=models.Q(('active', True), ('ends_at__isnull', False)), fields=['ends_at'], name='listing_due_idx'),
+        ),
+        migrations.RunPython(settle_closed_listings, migrations.RunPython.noop),
+    ]
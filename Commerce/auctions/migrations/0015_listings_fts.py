@@ -0,0 +1,59 @@
+from django.db import migrations, OperationalError
+
+# An FTS5 index over listing titles and descriptions, kept up to date by triggers on the listings table.
+# Only created on sqlite builds that have FTS5; elsewhere search falls back to the in-process index in auctions/search.py.
+CREATE_FTS = [
+    """CREATE VIRTUAL TABLE auctions_listings_fts USING fts5(
+        title, description, content='auctions_listings', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER auctions_listings_fts_insert AFTER INSERT ON auctions_listings BEGIN
+        INSERT INTO auctions_listings_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER auctions_listings_fts_delete AFTER DELETE ON auctions_listings BEGIN
+        INSERT INTO auctions_listings_fts(auctions_listings_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER auctions_listings_fts_update AFTER UPDATE OF title, description ON auctions_listings BEGIN
+        INSERT INTO auctions_listings_fts(auctions_listings_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO auctions_listings_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    "INSERT INTO auctions_listings_fts(auctions_listings_fts) VALUES ('rebuild')",
+]
+
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS auctions_listings_fts_insert",
+    "DROP TRIGGER IF EXISTS auctions_listings_fts_delete",
+    "DROP TRIGGER IF EXISTS auctions_listings_fts_update",
+    "DROP TABLE IF EXISTS auctions_listings_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_check USING fts5(text)")
+        except OperationalError:
+            return # this sqlite was built without FTS5
+        cursor.execute("DROP TABLE temp.fts5_check")
+        for statement in CREATE_FTS:
+            cursor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in DROP_FTS:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0014_listings_ends_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
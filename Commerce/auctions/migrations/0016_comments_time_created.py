@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0015_listings_fts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comments',
+            name='comment_listing_idx',
+        ),
+        # existing comments all get the migration time; their ids still keep them in order
+        migrations.AddField(
+            model_name='comments',
+            name='time_created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='comments',
+            index=models.Index(fields=['listing', '-time_created', '-id'], name='comment_thread_idx'),
+        ),
+    ]
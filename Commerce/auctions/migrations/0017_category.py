@@ -0,0 +1,102 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:05
+
+import importlib
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+from django.utils.text import slugify
+
+fts = importlib.import_module('auctions.migrations.0015_listings_fts')
+
+# the categories that used to be hard-coded as choices on Listings.category
+CATEGORIES = ['Toys', 'Electronics', 'Fashion', 'Home', 'Arts and Crafts', 'Books', 'Vehicles']
+
+
+# creates the catalog from the old choices plus any other names in use, and points each listing at its category.
+# "Choose Category" was written into closed listings and never was a category, so those are left without one.
+def create_categories(apps, schema_editor):
+    Category = apps.get_model('auctions', 'Category')
+    Listings = apps.get_model('auctions', 'Listings')
+    names = set(CATEGORIES) | set(Listings.objects.exclude(old_category__isnull=True).values_list('old_category', flat=True))
+    names -= {'', 'Choose Category'}
+    for name in sorted(names):
+        category, _ = Category.objects.get_or_create(name=name, defaults={'slug': slugify(name)})
+        Listings.objects.filter(old_category=name).update(category=category)
+
+
+def restore_old_categories(apps, schema_editor):
+    Category = apps.get_model('auctions', 'Category')
+    Listings = apps.get_model('auctions', 'Listings')
+    for category in Category.objects.all():
+        Listings.objects.filter(category=category).update(old_category=category.name)
+
+
+# the only aggregate over the listings the counts ever need; from here on they are kept up to date incrementally
+def count_active_listings(apps, schema_editor):
+    Category = apps.get_model('auctions', 'Category')
+    Listings = apps.get_model('auctions', 'Listings')
+    counts = Listings.objects.filter(active=True, category__isnull=False).values('category').annotate(count=Count('id'))
+    for row in counts:
+        Category.objects.filter(pk=row['category']).update(active_listings=row['count'])
+
+
+# removing the old column rebuilds the listings table on sqlite versions without DROP COLUMN, which drops the
+# search index's triggers along with it, so they are put back (and the index rebuilt) if the index exists
+def restore_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM sqlite_master WHERE name = 'auctions_listings_fts'")
+        if not cursor.fetchone()[0]:
+            return
+        for statement in fts.CREATE_FTS[1:]:
+            cursor.execute(statement.replace('CREATE TRIGGER', 'CREATE TRIGGER IF NOT EXISTS'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0016_comments_time_created'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('slug', models.SlugField(max_length=64, unique=True)),
+                ('active_listings', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Categories',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='listings',
+            name='listing_category_feed_idx',
+        ),
+        migrations.RenameField(
+            model_name='listings',
+            old_name='category',
+            new_name='old_category',
+        ),
+        migrations.AddField(
+            model_name='listings',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='listings', to='auctions.category'),
+        ),
+        migrations.RunPython(create_categories, restore_old_categories),
+        migrations.RemoveField(
+            model_name='listings',
+            name='old_category',
+        ),
+        migrations.AddIndex(
+            model_name='listings',
+            index=models.Index(condition=models.Q(('active', True)), fields=['category', '-time_created', '-id'], name='listing_category_feed_idx'),
+        ),
+        migrations.RunPython(count_active_listings, migrations.RunPython.noop),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+    ]
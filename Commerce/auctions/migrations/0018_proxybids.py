@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0017_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProxyBids',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_amount', models.IntegerField()),
+                ('time_set', models.DateTimeField(default=django.utils.timezone.now)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proxy_bids', to='auctions.listings')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proxy_bids', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Proxy Bids',
+                'indexes': [models.Index(fields=['listing', '-max_amount', 'time_set'], name='proxy_bid_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='proxybids',
+            constraint=models.UniqueConstraint(fields=('listing', 'user'), name='one_proxy_bid_per_user'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+import django.db.models.deletion
+
+
+# the only aggregate over the listings the totals ever need; from here on they are kept up to date incrementally
+def count_seller_totals(apps, schema_editor):
+    SellerStats = apps.get_model('auctions', 'SellerStats')
+    Listings = apps.get_model('auctions', 'Listings')
+    totals = Listings.objects.filter(owner__isnull=False).values('owner__user').annotate(
+        active_count=Count('id', filter=Q(active=True)),
+        closed_count=Count('id', filter=Q(active=False)),
+        bid_total=Sum('bid_count'),
+        revenue_total=Sum('current_price', filter=Q(active=False, bid_count__gt=0)),
+    )
+    SellerStats.objects.bulk_create([SellerStats(user_id=row['owner__user'], active_listings=row['active_count'], closed_listings=row['closed_count'],
+                                                 bids_received=row['bid_total'] or 0, revenue=row['revenue_total'] or 0) for row in totals])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0018_proxybids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='seller_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active_listings', models.IntegerField(default=0)),
+                ('closed_listings', models.IntegerField(default=0)),
+                ('bids_received', models.IntegerField(default=0)),
+                ('revenue', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Seller Stats',
+            },
+        ),
+        migrations.RunPython(count_seller_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+import django.utils.timezone
+
+
+# bids placed before this migration weren't timed; they are dated to their listing's creation rather than all
+# landing in the hour the migration ran
+def date_old_bids(apps, schema_editor):
+    Bids = apps.get_model('auctions', 'Bids')
+    Listings = apps.get_model('auctions', 'Listings')
+    Bids.objects.update(time_placed=Subquery(Listings.objects.filter(pk=OuterRef('listing_id')).values('time_created')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0019_sellerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bids',
+            name='time_placed',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(date_old_bids, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='ListingPriceHour',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('bids', models.IntegerField()),
+                ('open', models.IntegerField()),
+                ('high', models.IntegerField()),
+                ('low', models.IntegerField()),
+                ('close', models.IntegerField()),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_hours', to='auctions.listings')),
+            ],
+            options={
+                'verbose_name_plural': 'Listing Price Hours',
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoryPriceHour',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('bids', models.IntegerField()),
+                ('volume', models.BigIntegerField()),
+                ('high', models.IntegerField()),
+                ('low', models.IntegerField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_hours', to='auctions.category')),
+            ],
+            options={
+                'verbose_name_plural': 'Category Price Hours',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='listingpricehour',
+            constraint=models.UniqueConstraint(fields=('listing', 'hour'), name='one_price_hour_per_listing'),
+        ),
+        migrations.AddConstraint(
+            model_name='categorypricehour',
+            constraint=models.UniqueConstraint(fields=('category', 'hour'), name='one_price_hour_per_category'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:15
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# the feeds' validators read the row on every request, so it is there from the start
+def create_feed_version(apps, schema_editor):
+    apps.get_model('auctions', 'FeedVersion').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0020_bid_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.IntegerField(default=0)),
+                ('last_modified', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_feed_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0021_feedversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WatchlistVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='watchlist_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,22 +1,150 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .thumbnails import thumbnail_url
+    
+# Queries and updates on the category catalog
+class CategoryQuerySet(models.QuerySet):
+
+    # adds each change in changes ({category id: change}) to that category's count of active listings.
+    # The counts are only ever moved by the listings that change, so showing them never needs an aggregate query.
+    def adjust_counts(self, changes):
+        for category_id, change in changes.items():
+            if category_id is not None and change:
+                self.filter(pk = category_id).update(active_listings = F("active_listings") + change)
+
+# Category model; listings are filed under one of these (or none), and each category's page is found by its slug
+class Category(models.Model):
+    name = models.CharField(max_length = 64, unique = True)
+    slug = models.SlugField(max_length = 64, unique = True)
+    # number of active listings in the category, kept up to date by Listings.save, close_listings and the listing delete signal
+    active_listings = models.IntegerField(default = 0)
+    
+    objects = CategoryQuerySet.as_manager()
     
+    def __str__(self):
+        return self.name
+    
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = slugify(self.name)
+        super().save(*args, **kwargs)
+    
+    class Meta: 
+        verbose_name_plural = 'Categories'
+        ordering = ["name"]
+    
+# Queries shared by the pages that show lists of listings
+class ListingsQuerySet(models.QuerySet):
+
+    # active listings, newest first, with the owner's username and category name joined in so a feed page is a single query
+    def feed(self):
+        return self.filter(active = True).annotate(owner_username = F("owner__user__username"), category_name = F("category__name")).order_by("-time_created", "-id")
+    
+    # open listings whose end time has passed, soonest first
+    def due(self, now = None):
+        return self.filter(active = True, ends_at__isnull = False, ends_at__lte = now or timezone.now()).order_by("ends_at")
+    
+    # marks the listings as changed without saving them, for changes written with UPDATE or to related rows
+    def touch(self):
+        return self.update(version = F("version") + 1, last_modified = timezone.now())
+
 # Listings model
 class Listings(models.Model):
-    choices = [(None, "Choose Category"), ("Toys", "Toys"), ("Electronics", "Electronics"), ("Fashion", "Fashion"), ("Home", "Home"), ("Arts and Crafts", "Arts and Crafts"), ("Books", "Books"), ("Vehicles", "Vehicles")] # change choose category to no category ... add more categories...
     title = models.CharField(max_length = 64)
     description = models.TextField()
     starting_bid = models.IntegerField()
     image = models.URLField(blank=True)
-    category = models.CharField(max_length = 64, default = None, choices = choices)
+    category = models.ForeignKey(Category, on_delete = models.SET_NULL, null = True, blank = True, related_name = "listings")
     time_created = models.DateTimeField(auto_now_add = True)
     active = models.BooleanField(default = True)
+    # bid stats kept on the listing so feeds don't have to aggregate the bids table (updated by Bids.save)
+    current_price = models.IntegerField(default = 0)
+    bid_count = models.IntegerField(default = 0)
+    high_bidder = models.ForeignKey("User", on_delete = models.SET_NULL, null = True, blank = True, related_name = "leading_listings")
+    # bumped on every change to the listing, its bids or its comments; used for the pages' ETag and Last-Modified headers
+    version = models.IntegerField(default = 0)
+    last_modified = models.DateTimeField(auto_now = True, db_index = True)
+    # when the auction closes on its own; listings without one stay open until the owner closes them
+    ends_at = models.DateTimeField(null = True, blank = True)
+    
+    objects = ListingsQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.title.capitalize()} (Starting Bid: {self.starting_bid})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        listing = super().from_db(db, field_names, values)
+        if "active" in listing.__dict__ and "category_id" in listing.__dict__:
+            listing._counted_category = listing.counted_category()
+        return listing
+    
+    # the category whose active count includes this listing, if any
+    def counted_category(self):
+        return self.category_id if self.active else None
+    
+    def save(self, *args, **kwargs):
+        # a listing with no bids is priced at its starting bid
+        if self.bid_count == 0:
+            self.current_price = self.starting_bid
+        update_fields = kwargs.get("update_fields")
+        if not self._state.adding:
+            self.version += 1
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "version", "last_modified"}
+        # the category counts move with the listing, in the same transaction as the save
+        if update_fields is not None and not {"category", "active"} & set(update_fields):
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            if self._state.adding:
+                before = None
+            elif hasattr(self, "_counted_category"):
+                before = self._counted_category
+            else: # loaded without the fields the count depends on
+                category_id, active = Listings.objects.values_list("category_id", "active").get(pk = self.pk)
+                before = category_id if active else None
+            super().save(*args, **kwargs)
+            after = self.counted_category()
+            if before != after:
+                Category.objects.adjust_counts({before: -1, after: 1})
+        self._counted_category = after
+    
+    # where feeds load the listing's image from (see auctions/thumbnails.py)
+    @property
+    def thumbnail_url(self):
+        return thumbnail_url(self.id, self.image) if self.image else None
+
+    # the highest bid so far, or the starting bid minus 1 if there are no bids (so the starting bid itself can be bid)
+    @property
+    def max_bid(self):
+        return self.current_price if self.bid_count else self.starting_bid - 1
+    
     class Meta: 
         verbose_name_plural = 'Listings'
+        indexes = [
+            # the index feed and the category feeds, newest first; only active listings are ever shown in a feed
+            # so the indexes are partial, which keeps closed listings out of them
+            models.Index(fields = ["-time_created", "-id"], condition = Q(active = True), name = "listing_feed_idx"),
+            models.Index(fields = ["category", "-time_created", "-id"], condition = Q(active = True), name = "listing_category_feed_idx"),
+            # the auction closer's lookup of open listings whose end time has passed
+            models.Index(fields = ["ends_at"], condition = Q(active = True, ends_at__isnull = False), name = "listing_due_idx"),
+        ]
+
+# Changes to the feeds that no remaining listing's last_modified records, i.e. listings being deleted and categories
+# being renamed or deleted. A single row, bumped by the signals in signals.py; the feeds' ETag and Last-Modified
+# headers include it (see auctions/conditional.py).
+class FeedVersion(models.Model):
+    version = models.IntegerField(default = 0)
+    last_modified = models.DateTimeField(default = timezone.now)
+
+    @classmethod
+    def bump(cls):
+        if not cls.objects.filter(pk = 1).update(version = F("version") + 1, last_modified = timezone.now()):
+            cls.objects.get_or_create(pk = 1, defaults = {"version": 1})
 
 # Users model
 class User(AbstractUser):
@@ -25,9 +153,15 @@ class User(AbstractUser):
     class Meta: 
         verbose_name_plural = 'Users'
         
+# A counter per user that is bumped whenever their watchlist changes (see auctions/watchlist.py); watched ids are
+# cached under it. It has its own table so that saving a User (e.g. a stale cached copy) can never move it back.
+class WatchlistVersion(models.Model):
+    user = models.OneToOneField(User, on_delete = models.CASCADE, primary_key = True, related_name = "watchlist_version")
+    version = models.IntegerField(default = 0)
+
 # Model that tells the owner of each listing       
 class ListingOwners(models.Model):
-    listing = models.ForeignKey(Listings, on_delete = models.CASCADE, related_name = "owner")
+    listing = models.OneToOneField(Listings, on_delete = models.CASCADE, related_name = "owner")
     user = models.ForeignKey(User, on_delete = models.CASCADE, related_name = "listings")
     
     class Meta: 
@@ -38,18 +172,149 @@ class Bids(models.Model):
     amount = models.IntegerField()
     listing = models.ForeignKey(Listings, on_delete=models.CASCADE, related_name="bids")
     bidders = models.ForeignKey(User, on_delete=models.CASCADE, related_name="bids_made")
+    # set on the highest bid when its listing closes
+    winning = models.BooleanField(default=False)
+    # when the bid was placed; the hourly price history is rolled up from it (see auctions/history.py)
+    time_placed = models.DateTimeField(default=timezone.now, db_index=True)
     
     class Meta: 
         verbose_name_plural = 'Bids'
+        constraints = [
+            # bids on a listing must keep going up, so two bids can't share the top amount
+            models.UniqueConstraint(fields = ["listing", "amount"], name = "unique_bid_amount_per_listing"),
+        ]
         
     def __str__(self):
         return f"${self.amount} Bid on {self.listing} by {self.bidders}"
     
+    # saving a new bid also updates the listing's price, bid count and high bidder in the same transaction
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                SellerStats.objects.record_bids(self.listing_id, 1)
+                leading = Q(bid_count = 0) | Q(current_price__lt = self.amount)
+                Listings.objects.filter(pk = self.listing_id).update(
+                    current_price = Case(When(leading, then = Value(self.amount)), default = F("current_price")),
+                    high_bidder = Case(When(leading, then = Value(self.bidders_id)), default = F("high_bidder"), output_field = models.IntegerField()),
+                    bid_count = F("bid_count") + 1,
+                    version = F("version") + 1,
+                    last_modified = timezone.now(),
+                )
+    
+# One hour of a listing's bidding, rolled up from its bids once the hour is over (see auctions/history.py).
+# Rows are only ever appended, so charts read a handful of rows instead of every bid.
+class ListingPriceHour(models.Model):
+    listing = models.ForeignKey(Listings, on_delete = models.CASCADE, related_name = "price_hours")
+    hour = models.DateTimeField()
+    bids = models.IntegerField()
+    open = models.IntegerField()
+    high = models.IntegerField()
+    low = models.IntegerField()
+    close = models.IntegerField()
+
+    class Meta:
+        verbose_name_plural = 'Listing Price Hours'
+        constraints = [
+            models.UniqueConstraint(fields = ["listing", "hour"], name = "one_price_hour_per_listing"),
+        ]
+
+# One hour of bidding across a category's listings: the number and total of the bids and the highest and lowest
+class CategoryPriceHour(models.Model):
+    category = models.ForeignKey(Category, on_delete = models.CASCADE, related_name = "price_hours")
+    hour = models.DateTimeField()
+    bids = models.IntegerField()
+    volume = models.BigIntegerField()
+    high = models.IntegerField()
+    low = models.IntegerField()
+
+    class Meta:
+        verbose_name_plural = 'Category Price Hours'
+        constraints = [
+            models.UniqueConstraint(fields = ["category", "hour"], name = "one_price_hour_per_category"),
+        ]
+
+# Updates to the per-seller dashboard totals
+class SellerStatsQuerySet(models.QuerySet):
+
+    # adds each change in changes ({seller id: {field: change}}) to that seller's totals, creating the row the first time
+    def adjust(self, changes):
+        for seller_id, fields in changes.items():
+            updates = {field: F(field) + change for field, change in fields.items() if change}
+            if seller_id is None or not updates:
+                continue
+            if not self.filter(user_id = seller_id).update(**updates):
+                self.bulk_create([SellerStats(user_id = seller_id)], ignore_conflicts = True)
+                self.filter(user_id = seller_id).update(**updates)
+
+    # counts count new bids on a listing towards its seller's totals, in one UPDATE
+    def record_bids(self, listing_id, count):
+        self.filter(user__listings__listing_id = listing_id).update(bids_received = F("bids_received") + count)
+
+    # recomputes the totals of the given sellers from their listings, for listings written in bulk (e.g. by the seeder)
+    def recount(self, seller_ids):
+        totals = Listings.objects.filter(owner__user__in = seller_ids).values("owner__user").annotate(
+            active_count = Count("id", filter = Q(active = True)),
+            closed_count = Count("id", filter = Q(active = False)),
+            bid_total = Sum("bid_count"),
+            revenue_total = Sum("current_price", filter = Q(active = False, bid_count__gt = 0)),
+        )
+        self.filter(user__in = seller_ids).delete()
+        self.bulk_create([SellerStats(user_id = row["owner__user"], active_listings = row["active_count"], closed_listings = row["closed_count"],
+                                      bids_received = row["bid_total"] or 0, revenue = row["revenue_total"] or 0) for row in totals])
+
+# Running totals behind a seller's dashboard. They are moved by the writes that change them (new listings, bids and
+# closed auctions) rather than aggregated over the seller's listings on every page view.
+class SellerStats(models.Model):
+    user = models.OneToOneField(User, on_delete = models.CASCADE, primary_key = True, related_name = "seller_stats")
+    active_listings = models.IntegerField(default = 0)
+    closed_listings = models.IntegerField(default = 0)
+    # bids received on all of the seller's listings
+    bids_received = models.IntegerField(default = 0)
+    # the final prices of the seller's closed listings that had bids
+    revenue = models.IntegerField(default = 0)
+
+    objects = SellerStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = 'Seller Stats'
+
+    def __str__(self):
+        return f"Totals for {self.user}"
+
+# A bidder's private maximum for a listing. The bidding engine bids on their behalf, one increment above the next
+# highest maximum, so the bidder doesn't have to keep coming back to outbid others (see auctions/bidding.py).
+class ProxyBids(models.Model):
+    listing = models.ForeignKey(Listings, on_delete = models.CASCADE, related_name = "proxy_bids")
+    user = models.ForeignKey(User, on_delete = models.CASCADE, related_name = "proxy_bids")
+    max_amount = models.IntegerField()
+    # when the maximum was last set; of two equal maximums the one set first wins
+    time_set = models.DateTimeField(default = timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'Proxy Bids'
+        constraints = [
+            models.UniqueConstraint(fields = ["listing", "user"], name = "one_proxy_bid_per_user"),
+        ]
+        indexes = [
+            # the highest maximums on a listing, earliest first, as the engine reads them
+            models.Index(fields = ["listing", "-max_amount", "time_set"], name = "proxy_bid_rank_idx"),
+        ]
+
+    def __str__(self):
+        return f"Up to ${self.max_amount} on {self.listing} by {self.user}"
+
 # Comments model   
 class Comments(models.Model):
     comment = models.TextField()
     listing = models.ForeignKey(Listings, on_delete=models.CASCADE, related_name="comments")
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="comments")
+    time_created = models.DateTimeField(auto_now_add = True)
     
     class Meta: 
         verbose_name_plural = 'Comments'
+        indexes = [
+            # a listing's comment thread, newest first, as paginate_feed reads it
+            models.Index(fields = ["listing", "-time_created", "-id"], name = "comment_thread_idx"),
+        ]
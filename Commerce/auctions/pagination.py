@@ -0,0 +1,48 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# number of listings shown per page of a feed
+PAGE_SIZE = 24
+
+# number of comments shown per page of a listing's comment thread
+COMMENTS_PAGE_SIZE = 20
+
+
+# turns the last listing (or comment) of a page into an opaque cursor that the next page starts after
+def encode_cursor(item):
+    raw = f"{item.time_created.isoformat()}|{item.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+# turns a cursor back into (time_created, id), or None if it is missing or malformed
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        time_created, listing_id = raw.split("|")
+        time_created = parse_datetime(time_created)
+        listing_id = int(listing_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if time_created is None:
+        return None
+    return time_created, listing_id
+
+
+# returns one page of a feed (ordered newest first by time_created then id) and the cursor for the next page.
+# Comment threads are paged the same way.
+# The page is found by seeking past the cursor instead of using OFFSET, so deep pages cost the same as the first one.
+def paginate_feed(listings, cursor=None, page_size=PAGE_SIZE):
+    position = decode_cursor(cursor)
+    if position:
+        time_created, listing_id = position
+        listings = listings.filter(Q(time_created__lt = time_created) | Q(time_created = time_created, id__lt = listing_id))
+    page = list(listings[:page_size + 1]) # one extra row tells us whether there is a next page
+    if len(page) > page_size:
+        page = page[:page_size]
+        return page, encode_cursor(page[-1])
+    return page, None
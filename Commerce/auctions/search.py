@@ -0,0 +1,179 @@
+import bisect
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+
+from .models import Listings
+
+# Full-text search over listing titles and descriptions. On sqlite with FTS5 the auctions_listings_fts table
+# (created in migration 0015 and kept current by triggers) does the matching and ranking; otherwise an inverted
+# index held in this process is used. settings.AUCTIONS_SEARCH_BACKEND can force "fts5" or "inverted".
+
+# how much more a match in the title counts than one in the description
+TITLE_WEIGHT = 10.0
+
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return WORD.findall(text.lower())
+
+
+# Searches with sqlite's FTS5 extension, ranked by bm25
+class FTS5Index:
+    name = "fts5"
+    _available = None
+
+    # checked once per process
+    @classmethod
+    def available(cls):
+        if cls._available is None:
+            cls._available = connection.vendor == "sqlite" and cls.installed()
+        return cls._available
+
+    @staticmethod
+    def installed():
+        with connection.cursor() as cursor:
+            # the triggers are dropped if the listings table is rebuilt by a migration, and then the index goes stale
+            cursor.execute("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'auctions_listings' AND name LIKE %s", ["auctions_listings_fts_%"])
+            return cursor.fetchone()[0] == 3
+
+    def search(self, query, category = None, active = True, limit = 20):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # each word is quoted so user input can't use FTS query syntax; the last one also matches as a prefix
+        match = " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+        sql = [
+            "SELECT l.id FROM auctions_listings_fts f JOIN auctions_listings l ON l.id = f.rowid",
+            "WHERE auctions_listings_fts MATCH %s",
+        ]
+        params = [match]
+        if active is not None:
+            sql.append("AND l.active = %s")
+            params.append(active)
+        if category:
+            sql.append("AND l.category_id = %s")
+            params.append(category)
+        sql.append(f"ORDER BY bm25(auctions_listings_fts, {TITLE_WEIGHT}, 1.0) LIMIT %s")
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(" ".join(sql), params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+# An inverted index (word -> {listing id: weighted term frequency}) kept in memory and ranked by tf-idf.
+# Before each search it reads the listings modified since it last looked (through the index on last_modified),
+# so it also picks up listings saved by other processes or with bulk_create. Category and active status can
+# change without touching the text, so those filters are applied in the database to the ranked candidates.
+class InvertedIndex:
+    name = "inverted"
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.terms = {} # listing id -> the words it is indexed under, so a re-indexed listing can be removed first
+        self.vocabulary = None # sorted indexed words for prefix matching, rebuilt when new words are added
+        self.synced_at = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def available():
+        return True
+
+    def add(self, listing_id, title, description):
+        self.remove(listing_id)
+        weights = Counter()
+        for term in tokenize(title):
+            weights[term] += TITLE_WEIGHT
+        for term in tokenize(description):
+            weights[term] += 1
+        for term, weight in weights.items():
+            if term not in self.postings:
+                self.vocabulary = None
+            self.postings[term][listing_id] = weight
+        self.terms[listing_id] = list(weights)
+
+    def remove(self, listing_id):
+        for term in self.terms.pop(listing_id, ()):
+            self.postings[term].pop(listing_id, None)
+
+    # indexes every listing modified since the last sync; the newest timestamp is re-read next time in case
+    # another listing was saved in the same instant
+    def sync(self):
+        changed = Listings.objects.order_by()
+        if self.synced_at is not None:
+            changed = changed.filter(last_modified__gte = self.synced_at)
+        newest = changed.aggregate(Max("last_modified"))["last_modified__max"]
+        if newest is None:
+            return
+        for listing_id, title, description in changed.values_list("id", "title", "description").iterator(chunk_size = 2000):
+            self.add(listing_id, title, description)
+        self.synced_at = newest
+
+    # the postings of every indexed word starting with prefix, found by bisecting the sorted vocabulary
+    def prefix_postings(self, prefix):
+        if self.vocabulary is None:
+            self.vocabulary = sorted(word for word, posting in self.postings.items() if posting)
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + "\uffff")
+        return [self.postings[word] for word in self.vocabulary[start:end]]
+
+    # the ids of the listings containing every word, best match first; like the FTS5 query,
+    # the last word also matches as a prefix
+    def rank(self, terms):
+        documents = max(len(self.terms), 1)
+        scores = Counter()
+        matching = None
+        for position, term in enumerate(terms):
+            postings = self.prefix_postings(term) if position == len(terms) - 1 else [self.postings.get(term, {})]
+            term_matches = set()
+            for posting in postings:
+                idf = math.log(1 + documents / (1 + len(posting)))
+                for listing_id, weight in posting.items():
+                    scores[listing_id] += weight * idf
+                term_matches.update(posting)
+            matching = term_matches if matching is None else matching & term_matches
+        return [listing_id for listing_id, _ in scores.most_common() if listing_id in matching]
+
+    def search(self, query, category = None, active = True, limit = 20):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self.lock:
+            self.sync()
+            ranked = self.rank(terms)
+        filters = {}
+        if active is not None:
+            filters["active"] = active
+        if category:
+            filters["category"] = category
+        results = []
+        # filter the ranked candidates a slice at a time until there are enough results
+        for start in range(0, len(ranked), limit * 5):
+            candidates = ranked[start:start + limit * 5]
+            allowed = set(Listings.objects.filter(pk__in = candidates, **filters).values_list("id", flat = True))
+            results += [listing_id for listing_id in candidates if listing_id in allowed]
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+
+_inverted_index = InvertedIndex()
+
+
+# the search backend to use, following settings.AUCTIONS_SEARCH_BACKEND ("auto" by default)
+def search_index():
+    backend = getattr(settings, "AUCTIONS_SEARCH_BACKEND", "auto")
+    if backend == "fts5" or (backend == "auto" and FTS5Index.available()):
+        return FTS5Index()
+    return _inverted_index
+
+
+# the ids of the listings matching query (within the category with the given id, if one is given), best match first
+def search_listings(query, category = None, active = True, limit = 20):
+    return search_index().search(query, category = category, active = active, limit = limit)
@@ -0,0 +1,72 @@
+import random
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.utils.text import slugify
+
+from .models import User, Category, Listings, ListingOwners, Bids, Comments, SellerStats
+
+# Synthetic auctions data for benchmarks and load tests, written with bulk_create so large datasets load quickly.
+# The listings' stored bid stats are filled in to match the bids, as place_bid would have left them.
+
+# the categories the catalog starts with (see migration 0017), created if they're missing
+CATEGORIES = ["Toys", "Electronics", "Fashion", "Home", "Arts and Crafts", "Books", "Vehicles"]
+WORDS = ["vintage", "antique", "brass", "lamp", "chair", "table", "book", "guitar", "camera", "bicycle", "watch", "radio",
+         "poster", "quilt", "model", "train", "doll", "jacket", "boots", "vase", "clock", "mirror", "rug", "kettle"]
+
+
+# Creates users, listings (with owners), bids, comments and watchlists and returns the new users and listing ids.
+# bids and comments are per listing and watches per user; closed is the fraction of listings that are closed.
+# password is set on every user (hashed once), otherwise they can't log in with a password.
+def seed_dataset(users = 100, listings = 1000, bids = 5, comments = 3, watches = 10, closed = 0.2, seed = 0, prefix = "synthetic", password = None, batch_size = 1000):
+    rng = random.Random(seed)
+    Category.objects.bulk_create([Category(name = name, slug = slugify(name)) for name in CATEGORIES], ignore_conflicts = True)
+    category_ids = list(Category.objects.filter(name__in = CATEGORIES).order_by("id").values_list("id", flat = True))
+    password_hash = make_password(password)
+    User.objects.bulk_create([User(username = f"{prefix}_user_{i}", password = password_hash) for i in range(users)], batch_size = batch_size)
+    user_ids = list(User.objects.filter(username__startswith = f"{prefix}_user_").values_list("id", flat = True))
+
+    # each listing's bids climb from its starting bid; the last one is the high bid
+    amounts = []
+    new_listings = []
+    for i in range(listings):
+        starting_bid = rng.randint(1, 100)
+        listing_amounts = []
+        for _ in range(rng.randint(0, 2 * bids)):
+            listing_amounts.append((listing_amounts[-1] if listing_amounts else starting_bid - 1) + rng.randint(1, 10))
+        bidders = [rng.choice(user_ids) for _ in listing_amounts]
+        amounts.append(list(zip(listing_amounts, bidders)))
+        new_listings.append(Listings(
+            title = f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {i}",
+            description = " ".join(rng.choices(WORDS, k = 30)),
+            starting_bid = starting_bid,
+            category_id = rng.choice(category_ids),
+            active = rng.random() >= closed,
+            current_price = listing_amounts[-1] if listing_amounts else starting_bid,
+            bid_count = len(listing_amounts),
+            high_bidder_id = bidders[-1] if bidders else None,
+        ))
+    # bulk_create only sets the ids on some databases, so they are read back in creation order
+    last_id = Listings.objects.order_by("-id").values_list("id", flat = True).first() or 0
+    Listings.objects.bulk_create(new_listings, batch_size = batch_size)
+    listing_ids = list(Listings.objects.filter(pk__gt = last_id).order_by("id").values_list("id", flat = True))
+
+    # bulk_create skips Listings.save, which keeps the category counts
+    Category.objects.adjust_counts(Counter(listing.counted_category() for listing in new_listings))
+
+    ListingOwners.objects.bulk_create([ListingOwners(listing_id = listing_id, user_id = rng.choice(user_ids)) for listing_id in listing_ids], batch_size = batch_size)
+    SellerStats.objects.recount(user_ids)
+    Bids.objects.bulk_create([
+        Bids(listing_id = listing_id, amount = amount, bidders_id = bidder, winning = not listing.active and (amount, bidder) == listing_bids[-1])
+        for listing_id, listing, listing_bids in zip(listing_ids, new_listings, amounts) for amount, bidder in listing_bids
+    ], batch_size = batch_size)
+    Comments.objects.bulk_create([
+        Comments(listing_id = listing_id, comment = " ".join(rng.choices(WORDS, k = 12)), user_id = rng.choice(user_ids))
+        for listing_id in listing_ids for _ in range(rng.randint(0, 2 * comments))
+    ], batch_size = batch_size)
+    active_ids = [listing_id for listing_id, listing in zip(listing_ids, new_listings) if listing.active]
+    User.watchlist.through.objects.bulk_create([
+        User.watchlist.through(user_id = user_id, listings_id = listing_id)
+        for user_id in user_ids for listing_id in set(rng.sample(active_ids, min(watches, len(active_ids))))
+    ], batch_size = batch_size, ignore_conflicts = True)
+    return user_ids, listing_ids
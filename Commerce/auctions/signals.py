@@ -0,0 +1,66 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .auth import forget_user
+from .models import User, Category, Listings, ListingOwners, Comments, SellerStats, FeedVersion
+from .watchlist import bump_watch_versions
+
+
+# deleting an active listing (e.g. in the admin) takes it out of its category's count, and out of the feeds
+@receiver(post_delete, sender=Listings)
+def listing_deleted(sender, instance, **kwargs):
+    Category.objects.adjust_counts({instance.counted_category(): -1})
+    FeedVersion.bump()
+
+
+# a category's name is shown on the feeds, and deleting it takes it off its listings
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    FeedVersion.bump()
+
+
+# a listing counts towards its seller's totals from when its owner is saved (new_listing saves the listing first)
+@receiver(post_save, sender=ListingOwners)
+def owner_saved(sender, instance, created, **kwargs):
+    if created:
+        SellerStats.objects.adjust({instance.user_id: {"active_listings" if instance.listing.active else "closed_listings": 1}})
+
+
+# and stops counting when the owner row goes, which deleting the listing does too (before the listing itself is deleted)
+@receiver(pre_delete, sender=ListingOwners)
+def owner_deleted(sender, instance, **kwargs):
+    listing = Listings.objects.filter(pk=instance.listing_id).values("active", "bid_count", "current_price").first()
+    if listing:
+        SellerStats.objects.adjust({instance.user_id: {
+            "active_listings" if listing["active"] else "closed_listings": -1,
+            "bids_received": -listing["bid_count"],
+            "revenue": -listing["current_price"] if not listing["active"] and listing["bid_count"] else 0,
+        }})
+
+
+# A listing's cached page fragments and ETag follow its version. Bids and listing saves already bump it; comments are
+# separate rows, so they touch the listing here.
+@receiver(post_save, sender=Comments)
+def comment_saved(sender, instance, **kwargs):
+    Listings.objects.filter(pk=instance.listing_id).touch()
+
+
+# the cached copy of a signed in user (see auctions/auth.py) goes whenever the user is saved, e.g. on login
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+# watchlists changed through the related managers (e.g. in the admin) rather than auctions/watchlist.py
+@receiver(m2m_changed, sender=User.watchlist.through)
+def watchlist_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        bump_watch_versions([instance.pk])
+    elif pk_set is not None:
+        bump_watch_versions(pk_set)
+    else: # listing.wishlist_users.clear() doesn't say which users it removed
+        bump_watch_versions(User.objects.values_list("pk", flat=True))
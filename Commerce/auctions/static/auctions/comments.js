@@ -0,0 +1,41 @@
+// "Load more comments" on a listing page: fetches the next (older) page of comments from the comments API
+// and appends it to the thread instead of reloading the page.
+document.addEventListener('DOMContentLoaded', () => {
+    const thread = document.querySelector('#comments');
+    const loadMore = document.querySelector('#more-comments');
+    if (!thread || !loadMore) {
+        return;
+    }
+
+    // builds the same markup as listing_comments.html for one comment
+    function commentCard(comment) {
+        const container = document.createElement('div');
+        container.className = 'comment';
+        const text = document.createElement('p');
+        text.textContent = comment.comment;
+        const user = document.createElement('strong');
+        user.textContent = comment.user;
+        container.append(text, 'by ', user, ` on ${new Date(comment.time_created).toUTCString()}`);
+        return container;
+    }
+
+    loadMore.addEventListener('click', event => {
+        event.preventDefault();
+        if (loadMore.classList.contains('disabled')) {
+            return;
+        }
+        loadMore.classList.add('disabled');
+        fetch(`${loadMore.dataset.apiUrl}?after=${encodeURIComponent(loadMore.dataset.cursor)}`)
+        .then(response => response.json())
+        .then(page => {
+            page.comments.forEach(comment => thread.append(commentCard(comment), document.createElement('br')));
+            if (page.next_cursor) {
+                loadMore.dataset.cursor = page.next_cursor;
+                loadMore.href = `?comments_after=${page.next_cursor}`;
+                loadMore.classList.remove('disabled');
+            } else {
+                loadMore.remove();
+            }
+        });
+    });
+});
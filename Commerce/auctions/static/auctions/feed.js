@@ -0,0 +1,78 @@
+// Infinite scroll for the listing feeds: when the "More listings" link comes into view,
+// the next page is fetched from the listings API and appended to the feed.
+document.addEventListener('DOMContentLoaded', () => {
+    const feed = document.querySelector('#feed');
+    const loadMore = document.querySelector('#load-more');
+    if (!feed || !loadMore || !('IntersectionObserver' in window)) {
+        return;
+    }
+    let loading = false;
+
+    // builds the same markup as index.html for one listing
+    function listingCard(listing) {
+        const container = document.createElement('div');
+        container.className = 'container listing';
+        const row = document.createElement('div');
+        row.className = 'row';
+        const details = document.createElement('div');
+        details.className = 'col-6';
+
+        const link = document.createElement('a');
+        link.href = listing.url;
+        const title = document.createElement('h4');
+        title.textContent = listing.title;
+        link.append(title);
+        const description = document.createElement('p');
+        description.textContent = listing.description;
+        const price = document.createElement('b');
+        price.textContent = 'Current Price:';
+        details.append(link, description, price, ` $${listing.current_price}`);
+        if (listing.category) {
+            details.append(document.createElement('br'), `Category: ${listing.category}`);
+        }
+        const owner = document.createElement('b');
+        owner.textContent = listing.owner;
+        details.append(document.createElement('br'), 'Listed by ', owner);
+        if (document.querySelector('[name=csrfmiddlewaretoken]')) { // signed in, see watchlist.js
+            const watch = document.createElement('button');
+            watch.className = 'btn btn-sm btn-outline-primary watch-toggle';
+            watch.dataset.url = listing.watch_url;
+            watch.textContent = listing.watched ? 'Watching' : 'Watch';
+            details.append(document.createElement('br'), watch);
+        }
+
+        const imageColumn = document.createElement('div');
+        imageColumn.className = 'col-3';
+        if (listing.image) {
+            const image = document.createElement('img');
+            image.src = listing.thumbnail;
+            image.loading = 'lazy';
+            image.setAttribute('width', '200%');
+            imageColumn.append(document.createElement('br'), image);
+        }
+        row.append(details, imageColumn);
+        container.append(row);
+        return container;
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        if (loading || !entries.some(entry => entry.isIntersecting)) {
+            return;
+        }
+        loading = true;
+        fetch(`${loadMore.dataset.apiUrl}&after=${encodeURIComponent(loadMore.dataset.cursor)}`)
+        .then(response => response.json())
+        .then(page => {
+            page.listings.forEach(listing => feed.append(listingCard(listing)));
+            if (page.next_cursor) {
+                loadMore.dataset.cursor = page.next_cursor;
+                loadMore.href = `?after=${page.next_cursor}`;
+            } else {
+                observer.disconnect();
+                loadMore.remove();
+            }
+            loading = false;
+        });
+    });
+    observer.observe(loadMore);
+});
@@ -0,0 +1,25 @@
+// Live bid updates on a listing page: new bids arrive over a WebSocket (see auctions/live.py) and update
+// the price and bid count in place, so bidders don't need to reload the page.
+document.addEventListener('DOMContentLoaded', () => {
+    const live = document.querySelector('#live-updates');
+    if (!live || !('WebSocket' in window)) {
+        return;
+    }
+    const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+    const socket = new WebSocket(`${scheme}://${location.host}/ws/listings/${live.dataset.listing}`);
+
+    socket.onmessage = event => {
+        const update = JSON.parse(event.data);
+        if (update.type === 'bid') {
+            document.querySelectorAll('.live-price').forEach(price => price.textContent = update.amount);
+            document.querySelectorAll('.live-bid-count').forEach(count => count.textContent = update.bid_count);
+            const input = document.querySelector('input[name="bid"]');
+            if (input) {
+                input.placeholder = `Bid Amount (Current Bid is ${update.amount})`;
+            }
+            live.textContent = update.bidder === live.dataset.user ? '' : `${update.bidder} just bid $${update.amount}.`;
+        } else if (update.type === 'closed') {
+            live.textContent = 'This auction has just closed. Reload the page to see the result.';
+        }
+    };
+});
@@ -0,0 +1,42 @@
+// Price charts on listing and category pages: fetches the hourly history from the history API (see
+// auctions/history.py) and draws the series named by data-series as a line, leaving gaps for hours without a price.
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('.price-chart').forEach(chart => {
+        fetch(chart.dataset.url)
+        .then(response => response.json())
+        .then(history => {
+            const values = history[chart.dataset.series];
+            const known = values.filter(value => value !== null);
+            if (!known.length) {
+                chart.remove();
+                return;
+            }
+            const width = 1000, height = 100;
+            const low = Math.min(...known), high = Math.max(...known);
+            const x = index => index * width / Math.max(values.length - 1, 1);
+            const y = value => high === low ? height / 2 : height - (value - low) * height / (high - low);
+
+            // one path segment per run of hours that have a price
+            let path = '', drawing = false;
+            values.forEach((value, index) => {
+                if (value === null) {
+                    drawing = false;
+                    return;
+                }
+                path += `${drawing ? 'L' : 'M'}${x(index).toFixed(1)},${y(value).toFixed(1)} `;
+                drawing = true;
+            });
+            chart.setAttribute('viewBox', `0 0 ${width} ${height}`);
+            chart.setAttribute('preserveAspectRatio', 'none');
+            const line = document.createElementNS('http://www.w3.org/2000/svg', 'path');
+            line.setAttribute('d', path);
+            line.setAttribute('fill', 'none');
+            line.setAttribute('stroke', '#007bff');
+            line.setAttribute('stroke-width', '2');
+            line.setAttribute('vector-effect', 'non-scaling-stroke');
+            const title = document.createElementNS('http://www.w3.org/2000/svg', 'title');
+            title.textContent = `$${low} to $${high} since ${new Date(history.hours[0]).toUTCString()}`;
+            chart.append(title, line);
+        });
+    });
+});
@@ -0,0 +1,19 @@
+// Watch buttons on the listing feeds: clicking one adds or removes the listing from the user's watchlist
+// through the watchlist API, without leaving or reloading the page.
+document.addEventListener('click', event => {
+    const button = event.target.closest('.watch-toggle');
+    if (!button) {
+        return;
+    }
+    event.preventDefault();
+    fetch(button.dataset.url, {
+        method: 'POST',
+        headers: {'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value}
+    })
+    .then(response => response.json())
+    .then(result => {
+        if ('watching' in result) {
+            button.textContent = result.watching ? 'Watching' : 'Watch';
+        }
+    });
+});
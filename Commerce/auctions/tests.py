@@ -1,3 +1,1233 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import http.server
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+
+from .bidding import BidRejected, place_bid, set_proxy_bid
+from .assets import serve_asset
+from .auth import user_key
+from .bulk import import_rows, read_rows
+from .forms import NewBidForm
+from .history import category_chart, listing_chart, rollup_bids
+from .cache import cache_stats, listing_cache, reset_cache_stats
+from .concurrency import gather_reads
+from .closing import close_due_listings, close_listings
+from .live import broker, listing_updates
+from .metrics import Histogram, QueryMetricsMiddleware, export_metrics, reset_metrics
+from .search import FTS5Index, InvertedIndex
+from .thumbnails import FetchError, Image, check_address, fetch_url, thumbnail_cache
+from .seeding import seed_dataset
+from .watchlist import bump_watch_versions, toggle_watch, unwatch, watch, watched_ids
+from .models import User, Category, Listings, Bids, Comments, ListingOwners, ProxyBids, SellerStats, ListingPriceHour, CategoryPriceHour
+
+
+# the category with this name; TransactionTestCase flushes the ones the migrations create, so it may need creating
+def category(name):
+    return Category.objects.get_or_create(name=name)[0]
+
+
+# Tests for the bid stats that are stored on each listing
+class ListingBidStatsTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        self.listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=10, category=category("Home"))
+        ListingOwners.objects.create(listing=self.listing, user=self.seller)
+
+    def test_new_listing_is_priced_at_starting_bid(self):
+        self.assertEqual(self.listing.current_price, 10)
+        self.assertEqual(self.listing.bid_count, 0)
+        self.assertIsNone(self.listing.high_bidder)
+        self.assertEqual(self.listing.max_bid, 9)
+
+    def test_bid_updates_listing(self):
+        place_bid(self.listing.id, self.bidder, 10)
+        place_bid(self.listing.id, self.seller, 15)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_price, 15)
+        self.assertEqual(self.listing.bid_count, 2)
+        self.assertEqual(self.listing.high_bidder, self.seller)
+
+
+# Tests for the listing feeds (index, category and watchlist pages)
+class ListingFeedTests(TestCase):
+
+    def setUp(self):
+        cache.clear() # cached watchlists are only dropped on commit, which TestCase never does
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+
+    def create_listings(self, count, owner):
+        for i in range(count):
+            listing = Listings.objects.create(title=f"Item {i}", description="Item", starting_bid=i + 1, category=category("Toys"))
+            ListingOwners.objects.create(listing=listing, user=owner)
+            Bids.objects.create(amount=i + 5, listing=listing, bidders=self.bidder)
+
+    def test_index_query_count_is_constant(self):
+        self.create_listings(2, self.seller)
+        with self.assertNumQueries(2): # feed version, feed
+            self.client.get("/")
+        self.create_listings(20, self.seller)
+        with self.assertNumQueries(2):
+            response = self.client.get("/")
+        self.assertEqual(len(response.context["listings"]), 22)
+
+    def test_category_and_watchlist_query_count_is_constant(self):
+        self.create_listings(10, self.seller)
+        self.bidder.watchlist.add(*Listings.objects.all())
+        with self.assertNumQueries(3): # feed version, category, feed
+            self.client.get("/categories/toys")
+        self.client.force_login(self.bidder)
+        with self.assertNumQueries(2): # user (the session is cached), feed
+            response = self.client.get("/watchlist")
+        self.assertEqual(len(response.context["listings"]), 10)
+
+    def test_feed_pairs_each_listing_with_its_owner(self):
+        self.create_listings(1, self.bidder)
+        self.create_listings(1, self.seller)
+        owners = {listing.owner_username for listing in Listings.objects.feed()}
+        for listing in Listings.objects.feed():
+            self.assertEqual(listing.owner_username, listing.owner.user.username)
+        self.assertEqual(owners, {"seller", "bidder"})
+
+    def test_feed_hides_inactive_listings(self):
+        self.create_listings(3, self.seller)
+        Listings.objects.filter(title="Item 0").update(active=False)
+        titles = [listing.title for listing in Listings.objects.feed()]
+        self.assertEqual(titles, ["Item 2", "Item 1"])
+
+    def test_feed_pages_follow_the_cursor(self):
+        self.create_listings(30, self.seller)
+        response = self.client.get("/")
+        first_page = response.context["listings"]
+        self.assertEqual(len(first_page), 24)
+        with self.assertNumQueries(2):
+            response = self.client.get("/", {"after": response.context["next_cursor"]})
+        second_page = response.context["listings"]
+        self.assertEqual(len(second_page), 6)
+        self.assertIsNone(response.context["next_cursor"])
+        seen = [listing.id for listing in first_page + second_page]
+        self.assertEqual(seen, list(Listings.objects.feed().values_list("id", flat=True)))
+
+    def test_listings_api_returns_next_page(self):
+        self.create_listings(30, self.seller)
+        first = self.client.get("/api/listings", {"category": "toys"}).json()
+        self.assertEqual(len(first["listings"]), 24)
+        second = self.client.get("/api/listings", {"category": "toys", "after": first["next_cursor"]}).json()
+        self.assertEqual(len(second["listings"]), 6)
+        self.assertIsNone(second["next_cursor"])
+        self.assertEqual(second["listings"][0]["owner"], "seller")
+
+    def test_listings_api_watchlist_requires_login(self):
+        response = self.client.get("/api/listings", {"watchlist": 1})
+        self.assertEqual(response.status_code, 403)
+
+
+# Tests for placing bids
+class PlaceBidTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        self.listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=10, category=category("Home"))
+        ListingOwners.objects.create(listing=self.listing, user=self.seller)
+
+    def test_first_bid_can_equal_starting_bid(self):
+        place_bid(self.listing.id, self.bidder, 10)
+        with self.assertRaises(BidRejected):
+            place_bid(self.listing.id, self.seller, 10)
+        self.assertEqual(Bids.objects.count(), 1)
+
+    def test_bid_below_starting_bid_is_rejected(self):
+        with self.assertRaises(BidRejected):
+            place_bid(self.listing.id, self.bidder, 9)
+
+    def test_bid_on_closed_listing_is_rejected(self):
+        Listings.objects.filter(pk=self.listing.id).update(active=False)
+        with self.assertRaisesMessage(BidRejected, "closed"):
+            place_bid(self.listing.id, self.bidder, 50)
+
+    def test_bid_view_shows_error_for_stale_bid(self):
+        place_bid(self.listing.id, self.seller, 20)
+        self.client.force_login(self.bidder)
+        response = self.client.post(f"/bid/{self.listing.id}", {"bid": 20})
+        self.assertContains(response, "Please put in a bid greater than the current bid.")
+        self.assertEqual(Bids.objects.count(), 1)
+
+
+# Many threads bidding on one listing at once must never lose an update or leave two top bids
+class ConcurrentBidTests(TransactionTestCase):
+
+    THREADS = 8
+    ATTEMPTS = 25
+
+    def test_concurrent_bids_are_not_lost(self):
+        seller = User.objects.create_user("seller", "seller@example.com", "password")
+        bidders = [User.objects.create_user(f"bidder{i}", f"bidder{i}@example.com", "password") for i in range(self.THREADS)]
+        listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=1, category=category("Home"))
+        ListingOwners.objects.create(listing=listing, user=seller)
+        placed = []
+
+        def bid_repeatedly(user):
+            attempts = 0
+            while attempts < self.ATTEMPTS:
+                try:
+                    price = Listings.objects.values_list("current_price", flat=True).get(pk=listing.id)
+                    placed.append(place_bid(listing.id, user, price + 1).amount)
+                except BidRejected:
+                    pass
+                except OperationalError: # the shared in-memory sqlite test database fails on lock conflicts instead of waiting
+                    continue
+                attempts += 1
+            connection.close()
+
+        threads = [threading.Thread(target=bid_repeatedly, args=(user,)) for user in bidders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(placed)
+        listing.refresh_from_db()
+        amounts = list(Bids.objects.filter(listing=listing).order_by("amount").values_list("amount", flat=True))
+        self.assertEqual(sorted(placed), amounts)
+        self.assertEqual(len(amounts), len(set(amounts)))
+        self.assertEqual(listing.bid_count, len(amounts))
+        self.assertEqual(listing.current_price, amounts[-1])
+        self.assertEqual(listing.high_bidder, Bids.objects.get(listing=listing, amount=amounts[-1]).bidders)
+
+
+# Tests for proxy bids, which bid for their owner up to a private maximum
+class ProxyBidTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.alice, self.bob, self.carol = [User.objects.create_user(name, f"{name}@example.com", "password") for name in ("alice", "bob", "carol")]
+        self.listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=10, category=category("Home"))
+        ListingOwners.objects.create(listing=self.listing, user=self.seller)
+
+    def bids(self):
+        return list(Bids.objects.filter(listing=self.listing).order_by("id").values_list("bidders__username", "amount"))
+
+    def test_first_proxy_bids_the_starting_bid(self):
+        self.assertEqual(set_proxy_bid(self.listing.id, self.alice, 100), 10)
+        self.assertEqual(self.bids(), [("alice", 10)])
+
+    def test_competing_proxies_write_only_the_deciding_bids(self):
+        set_proxy_bid(self.listing.id, self.alice, 100)
+        self.assertEqual(set_proxy_bid(self.listing.id, self.bob, 50), 51)
+        self.assertEqual(self.bids(), [("alice", 10), ("bob", 50), ("alice", 51)])
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.high_bidder, self.listing.bid_count), (self.alice, 3))
+
+    def test_earlier_proxy_wins_a_tie(self):
+        set_proxy_bid(self.listing.id, self.alice, 100)
+        self.assertEqual(set_proxy_bid(self.listing.id, self.bob, 100), 100)
+        self.assertEqual(self.bids(), [("alice", 10), ("alice", 100)])
+        # raising the maximum makes bob's the later one, but also the higher
+        self.assertEqual(set_proxy_bid(self.listing.id, self.bob, 150), 101)
+        self.assertEqual(self.bids()[-1], ("bob", 101))
+
+    def test_leader_raising_their_maximum_bids_nothing(self):
+        set_proxy_bid(self.listing.id, self.alice, 100)
+        set_proxy_bid(self.listing.id, self.alice, 200)
+        self.assertEqual(self.bids(), [("alice", 10)])
+        self.assertEqual(ProxyBids.objects.get(user=self.alice).max_amount, 200)
+
+    def test_manual_bid_below_a_maximum_is_outbid(self):
+        set_proxy_bid(self.listing.id, self.alice, 100)
+        place_bid(self.listing.id, self.carol, 30)
+        self.assertEqual(self.bids(), [("alice", 10), ("carol", 30), ("alice", 31)])
+        place_bid(self.listing.id, self.carol, 150)
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.high_bidder, self.listing.current_price), (self.carol, 150))
+
+    def test_maximum_below_the_current_bid_is_rejected_and_not_kept(self):
+        place_bid(self.listing.id, self.carol, 30)
+        with self.assertRaises(BidRejected):
+            set_proxy_bid(self.listing.id, self.alice, 30)
+        self.assertFalse(ProxyBids.objects.exists())
+
+    def test_bid_view_sets_a_proxy_bid(self):
+        self.client.force_login(self.alice)
+        self.client.post(f"/bid/{self.listing.id}", {"bid": 100, "automatic": "on"})
+        self.assertEqual(ProxyBids.objects.get().max_amount, 100)
+        self.assertEqual(self.bids(), [("alice", 10)])
+
+
+# Proxy bids set at the same time must resolve as if they had been set one after the other
+class ConcurrentProxyBidTests(TransactionTestCase):
+
+    def test_concurrent_proxies_resolve_to_the_highest_maximum(self):
+        seller = User.objects.create_user("seller", "seller@example.com", "password")
+        listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=1, category=category("Home"))
+        ListingOwners.objects.create(listing=listing, user=seller)
+        maximums = [40, 75, 20, 90, 90, 55, 10, 60] # two equal maximums at the top
+
+        def set_maximum(i):
+            user = User.objects.get(username=f"bidder{i}")
+            while True:
+                try:
+                    set_proxy_bid(listing.id, user, maximums[i])
+                except BidRejected:
+                    pass
+                except OperationalError: # the shared in-memory sqlite test database fails on lock conflicts instead of waiting
+                    continue
+                break
+            connection.close()
+
+        for i in range(len(maximums)):
+            User.objects.create_user(f"bidder{i}", f"bidder{i}@example.com", "password")
+        threads = [threading.Thread(target=set_maximum, args=(i,)) for i in range(len(maximums))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        leader, runner = ProxyBids.objects.order_by("-max_amount", "time_set", "id")[:2]
+        listing.refresh_from_db()
+        amounts = list(Bids.objects.filter(listing=listing).order_by("id").values_list("amount", flat=True))
+        self.assertEqual((listing.high_bidder_id, listing.current_price), (leader.user_id, 90))
+        self.assertEqual(runner.max_amount, 90)
+        self.assertEqual(amounts, sorted(set(amounts)))
+        self.assertEqual(listing.bid_count, len(amounts))
+        self.assertLessEqual(len(amounts), 2 * len(maximums))
+
+
+# Tests for the cached listing page fragments, which are keyed by the version of their listing
+class ListingFragmentCacheTests(TransactionTestCase):
+
+    def setUp(self):
+        listing_cache().clear()
+        reset_cache_stats()
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        self.listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=10, category=category("Home"))
+        ListingOwners.objects.create(listing=self.listing, user=self.seller)
+        self.url = f"/listings/{self.listing.id}"
+
+    def test_repeat_views_are_served_from_cache(self):
+        self.client.get(self.url)
+        reset_metrics()
+        response = self.client.get(self.url)
+        # the listing version and the listing itself; the listing is read in a worker thread, which the request's metrics include
+        self.assertIn('auctions_sql_queries_sum{view="listing"} 2.000000', export_metrics())
+        self.assertEqual(len(response.wsgi_request.metrics.queries), 2)
+        self.assertEqual(cache_stats()["total"]["hits"], 2)
+        self.assertEqual(cache_stats()["total"]["misses"], 2)
+
+    def test_bid_invalidates_listing(self):
+        self.client.get(self.url)
+        place_bid(self.listing.id, self.bidder, 25)
+        self.assertContains(self.client.get(self.url), '$<span class="live-price">25</span>')
+
+    def test_comment_invalidates_listing(self):
+        self.client.get(self.url)
+        self.client.force_login(self.bidder)
+        self.client.post(f"/comment/{self.listing.id}", {"comment": "Does it work?"})
+        self.assertContains(self.client.get(self.url), "Does it work?")
+
+    def test_close_invalidates_listing(self):
+        self.client.get(self.url)
+        self.client.force_login(self.seller)
+        self.client.get(f"/close_listing/{self.listing.id}")
+        self.assertContains(self.client.get(self.url), "Listing is closed.")
+
+    def test_fragments_follow_the_listing_version(self):
+        self.client.get(self.url)
+        # as another server process would, with nothing removed from this process's cache
+        Listings.objects.filter(pk=self.listing.id).update(current_price=40, bid_count=1, version=F("version") + 1)
+        self.assertContains(self.client.get(self.url), '$<span class="live-price">40</span>')
+        self.assertEqual(cache_stats()["total"]["misses"], 4)
+
+    def test_user_specific_parts_are_not_cached(self):
+        place_bid(self.listing.id, self.bidder, 25)
+        self.client.force_login(self.bidder)
+        self.assertContains(self.client.get(self.url), "You have the highest bid.")
+        self.client.force_login(self.seller)
+        response = self.client.get(self.url)
+        self.assertNotContains(response, "You have the highest bid.")
+        self.assertContains(response, "Close this auction")
+
+
+# Tests for the paginated comment threads of the listing pages
+class CommentThreadTests(TestCase):
+
+    def setUp(self):
+        listing_cache().clear()
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=10, category=category("Home"))
+        ListingOwners.objects.create(listing=self.listing, user=self.seller)
+        users = [User.objects.create_user(f"user{i}", f"user{i}@example.com", "password") for i in range(5)]
+        Comments.objects.bulk_create([Comments(comment=f"Comment {i}", listing=self.listing, user=users[i % 5]) for i in range(45)])
+
+    def test_listing_page_shows_newest_page(self):
+        with self.assertNumQueries(3): # the listing version, the listing, and the newest comments with their users
+            response = self.client.get(f"/listings/{self.listing.id}")
+        self.assertContains(response, "Comment 44")
+        self.assertContains(response, "Comment 25")
+        self.assertNotContains(response, "Comment 24<")
+        self.assertContains(response, 'id="more-comments"')
+
+    def test_load_more_walks_every_comment_once(self):
+        comments, cursor = [], ""
+        while True:
+            with self.assertNumQueries(1):
+                page = self.client.get(f"/api/listings/{self.listing.id}/comments", {"after": cursor}).json()
+            comments += [comment["comment"] for comment in page["comments"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(comments, [f"Comment {i}" for i in range(44, -1, -1)])
+
+    def test_older_page_without_scripts(self):
+        cursor = self.client.get(f"/api/listings/{self.listing.id}/comments").json()["next_cursor"]
+        response = self.client.get(f"/listings/{self.listing.id}", {"comments_after": cursor})
+        self.assertContains(response, "Comment 24")
+        self.assertNotContains(response, "Comment 25")
+
+
+# Tests for the ETag / Last-Modified handling of the listing and feed pages
+class ConditionalGetTests(TransactionTestCase):
+
+    def setUp(self):
+        listing_cache().clear()
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        self.listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=10, category=category("Home"))
+        ListingOwners.objects.create(listing=self.listing, user=self.seller)
+        self.url = f"/listings/{self.listing.id}"
+
+    def assertNotModified(self, url):
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def test_unchanged_pages_are_not_modified(self):
+        self.assertNotModified(self.url)
+        self.assertNotModified("/")
+        self.assertNotModified("/categories/home")
+
+    def test_bid_changes_listing_and_feed_etags(self):
+        listing_etag = self.assertNotModified(self.url)
+        feed_etag = self.assertNotModified("/")
+        place_bid(self.listing.id, self.bidder, 20)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=listing_etag).status_code, 200)
+        self.assertEqual(self.client.get("/", HTTP_IF_NONE_MATCH=feed_etag).status_code, 200)
+
+    def test_comment_and_close_change_listing_etag(self):
+        etag = self.assertNotModified(self.url)
+        Comments.objects.create(comment="Nice", listing=self.listing, user=self.bidder)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(self.url)["ETag"]
+        self.client.force_login(self.seller)
+        self.client.get(f"/close_listing/{self.listing.id}")
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def assertChangesFeeds(self, change):
+        etags = {url: self.client.get(url)["ETag"] for url in ("/", "/categories/home")}
+        change()
+        for url, etag in etags.items():
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_deleting_a_listing_changes_feed_etags(self):
+        other = Listings.objects.create(title="Chair", description="A chair", starting_bid=10, category=category("Home"))
+        ListingOwners.objects.create(listing=other, user=self.seller)
+        self.assertChangesFeeds(other.delete)
+        self.assertNotContains(self.client.get("/"), "Chair")
+
+    def test_renaming_a_category_changes_feed_etags(self):
+        home = Category.objects.get(name="Home")
+        home.name = "House"
+        self.assertChangesFeeds(home.save)
+        self.assertContains(self.client.get("/categories/home"), "House")
+
+    def test_etag_depends_on_user(self):
+        anonymous_etag = self.client.get(self.url)["ETag"]
+        self.client.force_login(self.bidder)
+        self.assertNotEqual(self.client.get(self.url)["ETag"], anonymous_etag)
+
+
+# Tests for closing listings
+class CloseListingTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.watchers = [User.objects.create_user(f"watcher{i}", f"watcher{i}@example.com", "password") for i in range(5)]
+        self.listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=10, category=category("Home"))
+        self.other = Listings.objects.create(title="Chair", description="A chair", starting_bid=10, category=category("Home"))
+        ListingOwners.objects.create(listing=self.listing, user=self.seller)
+        for watcher in self.watchers:
+            watcher.watchlist.add(self.listing, self.other)
+
+    def test_close_removes_listing_from_every_watchlist(self):
+        self.client.force_login(self.seller)
+        with self.assertNumQueries(11): # savepoint, lock, close, category count, seller totals, settle, watchers, their watchlist versions (2), watchlist delete, release
+            self.client.get(f"/close_listing/{self.listing.id}")
+        self.listing.refresh_from_db()
+        self.assertFalse(self.listing.active)
+        self.assertFalse(User.watchlist.through.objects.filter(listings=self.listing).exists())
+        self.assertEqual(User.watchlist.through.objects.filter(listings=self.other).count(), 5)
+
+
+# Tests for the seller dashboard and the running totals behind it
+class SellerDashboardTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        self.client.force_login(self.seller)
+
+    def stats(self):
+        stats = SellerStats.objects.get(user=self.seller)
+        return stats.active_listings, stats.closed_listings, stats.bids_received, stats.revenue
+
+    def new_listing(self, title):
+        self.client.post("/new", {"title": title, "description": "For sale", "starting_bid": 10})
+        return Listings.objects.get(title=title)
+
+    def test_totals_follow_listings_bids_and_closing(self):
+        lamp, chair = self.new_listing("Lamp"), self.new_listing("Chair")
+        self.assertEqual(self.stats(), (2, 0, 0, 0))
+        place_bid(lamp.id, self.bidder, 15)
+        set_proxy_bid(lamp.id, self.seller, 30) # outbids the 15 at 16
+        set_proxy_bid(lamp.id, self.bidder, 40) # 30 for the runner-up, then 31
+        self.assertEqual(self.stats(), (2, 0, 4, 0))
+        close_listings([lamp.id, chair.id])
+        close_listings([lamp.id])
+        self.assertEqual(self.stats(), (0, 2, 4, 31))
+        counted = self.stats()
+        SellerStats.objects.recount([self.seller.id])
+        self.assertEqual(self.stats(), counted)
+        lamp.delete()
+        self.assertEqual(self.stats(), (0, 1, 0, 0))
+
+    def test_dashboard_query_count_does_not_grow_with_listings(self):
+        self.new_listing("Lamp")
+        with self.assertNumQueries(2): # totals, page (the session and user are cached)
+            response = self.client.get("/my_listings")
+        self.assertContains(response, "Active listings: 1")
+        for i in range(30):
+            self.new_listing(f"Lamp {i}")
+        with self.assertNumQueries(2):
+            response = self.client.get("/my_listings")
+        self.assertContains(response, "Active listings: 31")
+        self.assertContains(response, "Older listings")
+
+
+# Tests for timed auctions and the auction closer
+class AuctionCloserTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        self.listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=10, category=category("Home"), ends_at=timezone.now() + timedelta(hours=1))
+        ListingOwners.objects.create(listing=self.listing, user=self.seller)
+
+    def test_due_listings_are_closed_and_settled(self):
+        place_bid(self.listing.id, self.bidder, 10)
+        place_bid(self.listing.id, self.seller, 12)
+        self.bidder.watchlist.add(self.listing)
+        self.assertEqual(close_due_listings(), 0)
+        self.assertEqual(close_due_listings(now=timezone.now() + timedelta(hours=2)), 1)
+        self.listing.refresh_from_db()
+        self.assertFalse(self.listing.active)
+        self.assertEqual(list(Bids.objects.filter(winning=True).values_list("amount", flat=True)), [12])
+        self.assertFalse(self.bidder.watchlist.exists())
+
+    def test_closing_twice_changes_nothing(self):
+        later = timezone.now() + timedelta(hours=2)
+        self.assertEqual(close_due_listings(now=later), 1)
+        self.assertEqual(close_due_listings(now=later), 0)
+        self.assertEqual(close_listings([self.listing.id]), 0)
+
+    def test_closer_leaves_untimed_and_running_listings_open(self):
+        untimed = Listings.objects.create(title="Chair", description="A chair", starting_bid=10, category=category("Home"))
+        running = Listings.objects.create(title="Desk", description="A desk", starting_bid=10, category=category("Home"), ends_at=timezone.now() + timedelta(days=3))
+        Listings.objects.filter(pk__in=[self.listing.pk, untimed.pk, running.pk]).update(time_created=timezone.now() - timedelta(days=40))
+        Listings.objects.filter(pk=self.listing.pk).update(ends_at=timezone.now() - timedelta(minutes=1))
+        call_command("auction_closer", once=True, batch_size=1, stdout=StringIO())
+        self.assertEqual(set(Listings.objects.filter(active=True)), {untimed, running})
+
+    def test_duration_is_limited_to_a_year(self):
+        self.client.force_login(self.seller)
+        response = self.client.post("/new", {"title": "Vase", "description": "A vase", "starting_bid": 10, "duration": 99999999})
+        self.assertContains(response, "less than or equal to 365")
+        self.assertFalse(Listings.objects.filter(title="Vase").exists())
+
+    def test_ended_listing_rejects_bids_before_it_is_closed(self):
+        Listings.objects.filter(pk=self.listing.pk).update(ends_at=timezone.now() - timedelta(minutes=1))
+        with self.assertRaisesMessage(BidRejected, "closed"):
+            place_bid(self.listing.id, self.bidder, 10)
+
+
+# Tests for several auction closers running at once
+class ConcurrentCloserTests(TransactionTestCase):
+    CLOSERS = 4
+    LISTINGS = 60
+
+    def test_concurrent_closers_close_each_listing_once(self):
+        seller = User.objects.create_user("seller", "seller@example.com", "password")
+        home = category("Home")
+        ended = timezone.now() - timedelta(minutes=1)
+        for i in range(self.LISTINGS):
+            listing = Listings.objects.create(title=f"Item {i}", description="Item", starting_bid=1, category=home, ends_at=ended)
+            ListingOwners.objects.create(listing=listing, user=seller)
+        failures = []
+
+        def closer():
+            try:
+                # the shared in-memory sqlite test database fails on lock conflicts instead of waiting, so this also
+                # has the closers retry batches
+                call_command("auction_closer", once=True, batch_size=5, stdout=StringIO(), stderr=StringIO())
+            except Exception as error:
+                failures.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=closer) for _ in range(self.CLOSERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        self.assertFalse(Listings.objects.filter(active=True).exists())
+        self.assertEqual(Category.objects.get(pk=home.pk).active_listings, 0)
+        self.assertEqual(SellerStats.objects.get(user=seller).closed_listings, self.LISTINGS)
+
+
+# Tests for listing search, run against both search backends
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.lamp = Listings.objects.create(title="Brass lamp", description="An old lamp for a desk", starting_bid=10, category=category("Home"))
+        self.shade = Listings.objects.create(title="Lampshade", description="Fits any brass lamp", starting_bid=5, category=category("Home"))
+        self.book = Listings.objects.create(title="Lamps of the world", description="A book about lighting", starting_bid=8, category=category("Books"))
+        self.closed = Listings.objects.create(title="Broken lamp", description="Lamp", starting_bid=1, category=category("Home"), active=False)
+        for listing in (self.lamp, self.shade, self.book, self.closed):
+            ListingOwners.objects.create(listing=listing, user=self.seller)
+
+    def backends(self):
+        self.assertTrue(FTS5Index.available())
+        return [FTS5Index(), InvertedIndex()]
+
+    def test_title_matches_rank_first(self):
+        for index in self.backends():
+            with self.subTest(index.name):
+                self.assertEqual(index.search("brass lamp"), [self.lamp.id, self.shade.id])
+
+    def test_last_word_matches_as_prefix(self):
+        for index in self.backends():
+            with self.subTest(index.name):
+                self.assertEqual(set(index.search("lamp")), {self.lamp.id, self.shade.id, self.book.id})
+
+    def test_filters_by_category_and_active(self):
+        for index in self.backends():
+            with self.subTest(index.name):
+                self.assertEqual(index.search("lamp", category=self.book.category_id), [self.book.id])
+                self.assertNotIn(self.closed.id, index.search("broken lamp"))
+                self.assertEqual(index.search("broken lamp", active=False), [self.closed.id])
+
+    def test_index_follows_saved_listings(self):
+        index = InvertedIndex()
+        index.search("lamp")
+        self.lamp.title = "Copper lantern"
+        self.lamp.save()
+        for index in (FTS5Index(), index):
+            with self.subTest(index.name):
+                self.assertEqual(index.search("copper"), [self.lamp.id])
+                self.assertNotIn(self.lamp.id, index.search("brass"))
+
+    def test_query_syntax_is_not_interpreted(self):
+        for index in self.backends():
+            with self.subTest(index.name):
+                self.assertEqual(index.search('lamp" OR "book'), [])
+                self.assertEqual(index.search("***"), [])
+
+    def test_search_page(self):
+        response = self.client.get("/search", {"q": "lamp", "category": "books"})
+        self.assertEqual(list(response.context["listings"]), [self.book])
+
+
+
+# Tests for the live bid updates pushed over WebSockets
+class LiveUpdateTests(TransactionTestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        self.listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=10, category=category("Home"))
+        ListingOwners.objects.create(listing=self.listing, user=self.seller)
+
+    # connects an in-memory WebSocket client to path, runs action in a worker thread (like a view) once it is
+    # subscribed, and returns the events the client was sent
+    def run_client(self, path, action=None, expected=1):
+        async def session():
+            incoming = asyncio.Queue()
+            incoming.put_nowait({"type": "websocket.connect"})
+            sent = []
+            got_all = asyncio.Event()
+
+            async def send(event):
+                sent.append(event)
+                if len([e for e in sent if e["type"] == "websocket.send"]) >= expected:
+                    got_all.set()
+
+            client = asyncio.ensure_future(listing_updates({"type": "websocket", "path": path}, incoming.get, send))
+            while action and not broker.subscriber_count(self.listing.id):
+                await asyncio.sleep(0.01)
+            if action:
+                await asyncio.get_running_loop().run_in_executor(None, action)
+                await asyncio.wait_for(got_all.wait(), 5)
+            incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+            await client
+            return sent
+
+        return asyncio.run(session())
+
+    def test_bids_are_pushed_to_subscribers(self):
+        def bid():
+            place_bid(self.listing.id, self.bidder, 15)
+            connection.close()
+
+        sent = self.run_client(f"/ws/listings/{self.listing.id}", bid)
+        self.assertEqual(sent[0], {"type": "websocket.accept"})
+        self.assertEqual(json.loads(sent[1]["text"]), {"type": "bid", "listing": self.listing.id, "amount": 15, "bidder": "bidder", "bid_count": 1})
+        self.assertEqual(broker.subscriber_count(self.listing.id), 0)
+
+    def test_proxy_bids_push_the_listing_bid_count(self):
+        alice = User.objects.create_user("alice", "alice@example.com", "password")
+        set_proxy_bid(self.listing.id, alice, 50) # bids 10
+        def bid():
+            place_bid(self.listing.id, self.bidder, 15) # and the proxy answers with 16
+            connection.close()
+
+        sent = self.run_client(f"/ws/listings/{self.listing.id}", bid, expected=2)
+        updates = [json.loads(event["text"]) for event in sent[1:]]
+        self.assertEqual([(update["amount"], update["bid_count"]) for update in updates], [(15, 2), (16, 3)])
+        self.assertEqual(Listings.objects.get(pk=self.listing.id).bid_count, 3)
+
+    def test_close_is_pushed_to_subscribers(self):
+        def close():
+            close_listings([self.listing.id])
+            connection.close()
+
+        sent = self.run_client(f"/ws/listings/{self.listing.id}", close)
+        self.assertEqual(json.loads(sent[1]["text"])["type"], "closed")
+
+    def test_unknown_path_is_closed(self):
+        self.assertEqual(self.run_client("/ws/nothing"), [{"type": "websocket.close", "code": 4404}])
+
+
+
+# Tests for the watchlist service and its cached watched ids
+class WatchlistTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.watcher = User.objects.create_user("watcher", "watcher@example.com", "password")
+        self.listings = [Listings.objects.create(title=f"Item {i}", description="Item", starting_bid=1, category=category("Toys")) for i in range(3)]
+        for listing in self.listings:
+            ListingOwners.objects.create(listing=listing, user=self.seller)
+
+    def test_watch_and_unwatch_are_idempotent(self):
+        watch(self.watcher, self.listings[0].id)
+        watch(self.watcher, self.listings[0].id)
+        self.assertEqual(self.watcher.watchlist.count(), 1)
+        unwatch(self.watcher, self.listings[0].id)
+        unwatch(self.watcher, self.listings[0].id)
+        self.assertEqual(self.watcher.watchlist.count(), 0)
+
+    def test_watched_ids_are_cached_and_refreshed_on_change(self):
+        self.assertTrue(toggle_watch(self.watcher, self.listings[0].id))
+        self.assertEqual(watched_ids(self.watcher), {self.listings[0].id})
+        with self.assertNumQueries(1): # just the watchlist version
+            watched_ids(self.watcher)
+        self.watcher.watchlist.add(self.listings[1]) # through the m2m manager
+        self.assertEqual(watched_ids(self.watcher), {self.listings[0].id, self.listings[1].id})
+        close_listings([self.listings[0].id])
+        self.assertEqual(watched_ids(self.watcher), {self.listings[1].id})
+
+    def test_a_change_made_by_another_process_is_seen(self):
+        self.client.force_login(self.watcher)
+        url = f"/listings/{self.listings[0].id}"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(watched_ids(self.watcher), set())
+        # another worker's cache is not cleared here; only the version in the database moves
+        User.watchlist.through.objects.create(user=self.watcher, listings=self.listings[0]) # no m2m_changed signal
+        bump_watch_versions([self.watcher.id])
+        self.assertEqual(watched_ids(self.watcher), {self.listings[0].id})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["watchlist_bool"])
+
+    def test_feed_shows_watch_state(self):
+        watch(self.watcher, self.listings[1].id)
+        self.client.force_login(self.watcher)
+        response = self.client.get("/")
+        self.assertEqual([listing.watched for listing in response.context["listings"]], [False, True, False])
+
+    def test_watchlist_api_toggles(self):
+        url = f"/api/watchlist/{self.listings[0].id}"
+        self.assertEqual(self.client.post(url).status_code, 403)
+        self.client.force_login(self.watcher)
+        self.assertEqual(self.client.post(url).json(), {"watching": True})
+        self.assertEqual(self.client.get(url).json(), {"watching": True})
+        self.assertEqual(self.client.post(url).json(), {"watching": False})
+        self.assertFalse(self.watcher.watchlist.exists())
+
+
+
+# Tests for the per-view request metrics
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        reset_metrics()
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=10, category=category("Home"))
+        ListingOwners.objects.create(listing=listing, user=self.seller)
+
+    def test_views_are_recorded_by_url_name(self):
+        self.client.get("/")
+        self.client.get("/")
+        self.client.get("/categories/home")
+        self.assertEqual(self.client.get("/metrics").status_code, 302) # to the admin login
+        self.client.force_login(User.objects.create_user("staff", "staff@example.com", "password", is_staff=True))
+        metrics = self.client.get("/metrics").content.decode()
+        self.assertIn('auctions_sql_queries_count{view="index"} 2', metrics)
+        self.assertIn('auctions_sql_queries_bucket{view="index",le="2"} 2', metrics)
+        self.assertIn('auctions_template_render_seconds_count{view="specific_category"} 1', metrics)
+        self.assertIn('auctions_view_duration_seconds_count{view="specific_category"} 1', metrics)
+
+    def test_values_over_the_last_bucket_only_count_towards_inf(self):
+        histogram = Histogram("x", "y", (1, 2))
+        histogram.observe("v", 5)
+        histogram.observe("v", 2)
+        self.assertEqual(histogram.export()[2:], [
+            'x_bucket{view="v",le="1"} 0',
+            'x_bucket{view="v",le="2"} 1',
+            'x_bucket{view="v",le="+Inf"} 2',
+            'x_count{view="v"} 2',
+            'x_sum{view="v"} 7.000000',
+        ])
+
+    @override_settings(AUCTIONS_REPEATED_QUERY_LIMIT=5, AUCTIONS_SLOW_REQUEST_SECONDS=0)
+    def test_repeated_queries_and_slow_requests_are_logged(self):
+        def n_plus_one_view(request):
+            for listing in Listings.objects.all():
+                for user_id in range(5):
+                    User.objects.filter(pk=user_id).exists()
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        request.resolver_match = resolve("/")
+        with self.assertLogs("auctions.metrics", "WARNING") as logs:
+            QueryMetricsMiddleware(n_plus_one_view)(request)
+        self.assertIn("likely N+1", logs.output[0])
+        self.assertIn("slow request", logs.output[1])
+        self.assertIn('auctions_repeated_query_requests_total{view="index"} 1', export_metrics())
+
+
+class SeedingTests(TestCase):
+    def test_seeded_listings_match_their_bids(self):
+        user_ids, listing_ids = seed_dataset(users=10, listings=50, bids=4, comments=2, watches=5, seed=1)
+        self.assertEqual((len(user_ids), len(listing_ids)), (10, 50))
+        for listing in Listings.objects.filter(pk__in=listing_ids):
+            bids = list(listing.bids.order_by("amount"))
+            self.assertEqual(listing.bid_count, len(bids))
+            self.assertEqual(listing.current_price, bids[-1].amount if bids else listing.starting_bid)
+            self.assertEqual(listing.high_bidder_id, bids[-1].bidders_id if bids else None)
+            self.assertEqual([bid.winning for bid in bids if bid.winning], [] if listing.active or not bids else [True])
+        self.assertEqual(ListingOwners.objects.filter(listing_id__in=listing_ids).count(), 50)
+        self.assertFalse(User.watchlist.through.objects.filter(listings__active=False).exists())
+
+    def test_same_seed_gives_same_data(self):
+        seed_dataset(users=5, listings=20, seed=3, prefix="first")
+        seed_dataset(users=5, listings=20, seed=3, prefix="second")
+        first, second = [list(Listings.objects.filter(owner__user__username__startswith=prefix).order_by("id")
+                              .values_list("title", "current_price", "bid_count")) for prefix in ("first", "second")]
+        self.assertEqual(first, second)
+
+
+# Tests for the bulk import and export of listings
+class BulkImportTests(TestCase):
+    csv = ("title,description,starting_bid,image,category,duration\n"
+           "Lamp,A desk lamp,10,,Home,\n"
+           "Kite,\"A kite,\nwith a tail\",5,https://example.com/kite.png,toys,3\n"
+           "Broken,No price,,,Home,\n"
+           "Odd,Unknown category,4,,Nowhere,\n")
+
+    def setUp(self):
+        self.user = User.objects.create_user("seller", password="pw")
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        home = Category.objects.get(name="Home").active_listings
+        report = import_rows(read_rows(StringIO(self.csv), "csv"), self.user, chunk_size=1)
+        self.assertEqual((report["rows"], report["imported"], report["rejected"]), (4, 2, 2))
+        self.assertEqual([error["line"] for error in report["errors"]], [5, 6])
+        lamp, kite = Listings.objects.filter(owner__user=self.user).order_by("id")
+        self.assertEqual((kite.description, kite.current_price, kite.category.name), ("A kite,\nwith a tail", 5, "Toys"))
+        self.assertIsNotNone(kite.ends_at)
+        self.assertIsNone(lamp.ends_at)
+        self.assertEqual(Category.objects.get(name="Home").active_listings, home + 1)
+
+    def test_jsonl_rows(self):
+        lines = ['{"title": "Lamp", "description": "A desk lamp", "starting_bid": 10}', "", "not json", "[1]"]
+        report = import_rows(read_rows(lines, "jsonl"), self.user)
+        self.assertEqual((report["imported"], report["rejected"]), (1, 2))
+
+    def test_upload_endpoint(self):
+        self.client.login(username="seller", password="pw")
+        upload = SimpleUploadedFile("listings.csv", self.csv.encode())
+        report = self.client.post("/import", {"file": upload}).json()
+        self.assertEqual(report["imported"], 2)
+        upload = SimpleUploadedFile("listings.txt", b"")
+        self.assertEqual(self.client.post("/import", {"file": upload}).status_code, 400)
+
+    def test_export_streams_current_prices(self):
+        import_rows(read_rows(StringIO(self.csv), "csv"), self.user)
+        Listings.objects.filter(title="Lamp").update(current_price=25, bid_count=2)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.login(username="seller", password="pw")
+        response = self.client.get("/export")
+        self.assertTrue(response.streaming)
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        self.assertTrue(rows[0].startswith("id,title,description,category,starting_bid,current_price"))
+        response = self.client.get("/export?format=jsonl")
+        lamp = json.loads(b"".join(response.streaming_content).decode().splitlines()[0])
+        self.assertEqual((lamp["title"], lamp["current_price"], lamp["category"], lamp["owner"]), ("Lamp", 25, "Home", "seller"))
+
+
+# the fixture images in auctions/test_images, and the URLs the fixture fetcher was asked for
+TEST_IMAGES = os.path.join(os.path.dirname(__file__), "test_images")
+fetched_urls = []
+
+
+# a THUMBNAIL_FETCHER that serves any URL ending in /<name> from the fixture images
+def fetch_fixture(url):
+    fetched_urls.append(url)
+    try:
+        with open(os.path.join(TEST_IMAGES, url.rsplit("/", 1)[-1]), "rb") as file:
+            return file.read(), "image/png"
+    except FileNotFoundError:
+        raise FetchError(f"No fixture for {url}")
+
+
+# Tests for the listing thumbnail proxy and its cache on disk
+class ThumbnailTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(THUMBNAIL_DIR=self.directory, THUMBNAIL_FETCHER="auctions.tests.fetch_fixture")
+        settings.enable()
+        self.addCleanup(settings.disable)
+        fetched_urls.clear()
+        self.listing = self.new_listing("https://images.test/red.png")
+
+    def new_listing(self, image):
+        listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=10, image=image)
+        ListingOwners.objects.create(listing=listing, user=User.objects.get_or_create(username="seller")[0])
+        return listing
+
+    def get(self, listing):
+        response = self.client.get(listing.thumbnail_url)
+        self.addCleanup(response.close) # closes the thumbnail file
+        return response
+
+    def test_image_is_fetched_once_and_cached_for_good(self):
+        for _ in range(2):
+            response = self.get(self.listing)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(fetched_urls, ["https://images.test/red.png"])
+
+    def test_listings_with_the_same_image_share_a_thumbnail(self):
+        other = self.new_listing("https://mirror.test/red.png")
+        self.assertEqual(self.get(self.listing).getvalue(), self.get(other).getvalue())
+        self.assertEqual(len(fetched_urls), 2)
+        objects = [name for _, _, names in os.walk(os.path.join(self.directory, "objects")) for name in names]
+        self.assertEqual(len(objects), 1)
+
+    def test_least_recently_served_thumbnail_is_evicted(self):
+        blue = self.new_listing("https://images.test/blue.png")
+        red_size = len(self.get(self.listing).getvalue())
+        with override_settings(THUMBNAIL_CACHE_BYTES=red_size + 1):
+            self.get(blue) # the red thumbnail is older, so it goes
+            self.assertEqual(self.get(blue).status_code, 200)
+            self.get(self.listing)
+        self.assertEqual(fetched_urls, ["https://images.test/red.png", "https://images.test/blue.png", "https://images.test/red.png"])
+        self.assertIsNone(thumbnail_cache().get("https://images.test/blue.png"))
+
+    def test_stale_or_missing_images(self):
+        stale = self.listing.thumbnail_url
+        Listings.objects.filter(pk=self.listing.pk).update(image="https://images.test/blue.png")
+        self.assertEqual(self.client.get(stale).status_code, 404)
+        broken = self.new_listing("https://images.test/missing.png")
+        self.assertEqual(self.get(broken).status_code, 502)
+
+    def test_feeds_reference_the_thumbnail(self):
+        self.assertContains(self.client.get("/"), f'src="{self.listing.thumbnail_url}"')
+        self.assertEqual(self.client.get("/api/listings").json()["listings"][0]["thumbnail"], self.listing.thumbnail_url)
+
+    def test_thumbnail_is_shrunk(self):
+        with override_settings(THUMBNAIL_SIZE=100):
+            thumbnail = Image.open(io.BytesIO(self.get(self.listing).getvalue()))
+        self.assertEqual(thumbnail.size, (100, 75))
+
+    def test_only_public_addresses_are_fetched(self):
+        for address in ("127.0.0.1", "10.0.0.5", "192.168.1.1", "169.254.169.254", "::1", "fe80::1%eth0", "::ffff:127.0.0.1"):
+            with self.assertRaises(FetchError):
+                check_address(address)
+        check_address("93.184.216.34")
+
+        requests = []
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests.append(self.path)
+                self.send_response(200)
+                self.end_headers()
+            def log_message(self, *args):
+                pass
+        server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+        self.addCleanup(server.server_close)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        with self.assertRaisesMessage(FetchError, "public addresses"):
+            fetch_url(f"http://127.0.0.1:{server.server_port}/red.png")
+        self.assertEqual(requests, [])
+
+
+# Tests for the styling of the forms and the production static file pipeline
+class StaticAssetTests(TestCase):
+
+    def test_forms_are_styled_by_classes(self):
+        self.client.force_login(User.objects.create_user("seller", password="pw"))
+        response = self.client.get("/new")
+        self.assertContains(response, 'class="form-field"')
+        self.assertNotContains(response, "style=")
+
+    def test_bid_placeholder_is_per_form(self):
+        self.assertIn("Current Bid is 20", str(NewBidForm(max_bid=20)))
+        self.assertIn("There are no bids", str(NewBidForm(max_bid=None)))
+        self.assertNotIn("placeholder", NewBidForm.base_fields["bid"].widget.attrs)
+
+    def test_collected_files_are_hashed_compressed_and_cached_for_good(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        storages = {"default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                    "staticfiles": {"BACKEND": "auctions.assets.CompressedManifestStaticFilesStorage"}}
+        with override_settings(STATIC_ROOT=root, STORAGES=storages):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            hashed = staticfiles_storage.stored_name("auctions/styles.css")
+            self.assertRegex(hashed, r"^auctions/styles\.[0-9a-f]{12}\.css$")
+            with open(os.path.join(root, "auctions", "styles.css"), "rb") as file:
+                original = file.read()
+
+            response = serve_asset(RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip, br;q=0"), hashed)
+            self.assertEqual((response["Content-Encoding"], response["Content-Type"]), ("gzip", "text/css"))
+            self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+            self.assertEqual(gzip.decompress(response.getvalue()), original)
+            response.close()
+
+            response = serve_asset(RequestFactory().get("/"), "auctions/styles.css")
+            self.assertFalse(response.has_header("Content-Encoding"))
+            self.assertEqual(response["Cache-Control"], "public, max-age=300")
+            self.assertEqual(response.getvalue(), original)
+            response.close()
+
+
+# Tests for the cached sessions and signed in users
+class AuthCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("bidder", "bidder@example.com", "password")
+
+    def test_warm_page_view_does_no_auth_queries(self):
+        self.client.login(username="bidder", password="password")
+        self.client.get("/watchlist")
+        with self.assertNumQueries(1): # just the feed; the session and user are cached
+            response = self.client.get("/watchlist")
+        self.assertEqual(response.context["user"], self.user)
+
+    def test_saving_a_user_drops_the_cached_copy(self):
+        self.client.force_login(self.user)
+        self.client.get("/watchlist")
+        self.assertIsNotNone(cache.get(user_key(self.user.pk)))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+        self.assertRedirects(self.client.get("/watchlist"), "/login?next=/watchlist", fetch_redirect_response=False)
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_signed_cookie_sessions(self):
+        self.client.login(username="bidder", password="password")
+        self.client.get("/watchlist")
+        with self.assertNumQueries(1):
+            self.client.get("/watchlist")
+        self.client.get("/logout")
+        self.assertRedirects(self.client.get("/watchlist"), "/login?next=/watchlist", fetch_redirect_response=False)
+
+
+# Tests for the hourly price history and its charts
+class PriceHistoryTests(TestCase):
+
+    def setUp(self):
+        self.now = datetime(2026, 1, 10, 12, 30, tzinfo=dt_timezone.utc)
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        self.toys = category("Toys")
+        self.lamp = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=1, category=self.toys)
+        self.kite = Listings.objects.create(title="Kite", description="A kite", starting_bid=1, category=self.toys)
+        seller = User.objects.create_user("seller", "seller@example.com", "password")
+        ListingOwners.objects.create(listing=self.lamp, user=seller)
+        ListingOwners.objects.create(listing=self.kite, user=seller)
+
+    def bid(self, listing, amount, hour, minute):
+        Bids.objects.bulk_create([Bids(listing=listing, amount=amount, bidders=self.bidder, time_placed=self.now.replace(hour=hour, minute=minute))])
+
+    def hour(self, hour):
+        return self.now.replace(hour=hour, minute=0)
+
+    def test_finished_hours_are_rolled_up_once(self):
+        self.bid(self.lamp, 10, 9, 10)
+        self.bid(self.lamp, 15, 9, 40)
+        self.bid(self.lamp, 12, 9, 20) # saved last but placed second
+        self.bid(self.kite, 30, 9, 5)
+        self.bid(self.lamp, 20, 11, 10)
+        self.bid(self.lamp, 25, 12, 10) # the hour in progress
+        self.assertEqual(rollup_bids(now=self.now), 3) # 9:00 to 11:00
+        self.assertEqual(list(ListingPriceHour.objects.filter(listing=self.lamp).order_by("hour").values_list("hour", "bids", "open", "high", "low", "close")),
+                         [(self.hour(9), 3, 10, 15, 10, 15), (self.hour(11), 1, 20, 20, 20, 20)])
+        self.assertEqual(list(CategoryPriceHour.objects.order_by("hour").values_list("hour", "bids", "volume", "high", "low")),
+                         [(self.hour(9), 4, 67, 30, 10), (self.hour(11), 1, 20, 20, 20)])
+
+        self.assertEqual(rollup_bids(now=self.now), 0)
+        self.assertEqual(ListingPriceHour.objects.count(), 3)
+        rollup_bids(now=self.now + timedelta(hours=1))
+        self.assertEqual(ListingPriceHour.objects.filter(listing=self.lamp, hour=self.hour(12)).values_list("close", flat=True).get(), 25)
+
+    def test_charts_fill_hours_without_bids(self):
+        self.bid(self.lamp, 10, 7, 0)
+        self.bid(self.lamp, 15, 9, 40)
+        self.bid(self.lamp, 20, 11, 10)
+        rollup_bids(now=self.now)
+        chart = listing_chart(self.lamp.id, 4, now=self.now)
+        self.assertEqual(chart["hours"], ["2026-01-10T08:00:00Z", "2026-01-10T09:00:00Z", "2026-01-10T10:00:00Z", "2026-01-10T11:00:00Z"])
+        self.assertEqual(chart["price"], [10, 15, 15, 20]) # 8:00 carries the 7:00 price in from before the chart
+        self.assertEqual(chart["high"], [None, 15, None, 20])
+        self.assertEqual(chart["bids"], [0, 1, 0, 1])
+        chart = category_chart(self.toys.id, 3, now=self.now)
+        self.assertEqual((chart["average"], chart["bids"], chart["volume"]), ([15, None, 20], [1, 0, 1], [15, 0, 20]))
+
+    def test_history_endpoints(self):
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        CategoryPriceHour.objects.create(category=self.toys, hour=hour, bids=4, volume=50, high=20, low=5)
+        chart = self.client.get("/api/categories/toys/history?hours=2").json()
+        self.assertEqual((chart["average"], chart["bids"]), ([None, 12.5], [0, 4]))
+        self.assertEqual(self.client.get("/api/categories/nowhere/history").status_code, 404)
+        self.assertEqual(len(self.client.get(f"/api/listings/{self.lamp.id}/history").json()["price"]), 24 * 7)
+        self.assertContains(self.client.get(f"/listings/{self.lamp.id}"), f"/api/listings/{self.lamp.id}/history")
+
+
+# Tests for the category catalog and its stored counts of active listings
+class CategoryTests(TransactionTestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.arts = category("Arts and Crafts")
+        self.toys = category("Toys")
+
+    def count(self, category):
+        category.refresh_from_db()
+        return category.active_listings
+
+    def test_counts_follow_listings(self):
+        listings = [Listings.objects.create(title=f"Item {i}", description="Item", starting_bid=1, category=self.arts) for i in range(3)]
+        Listings.objects.create(title="Closed", description="Item", starting_bid=1, category=self.arts, active=False)
+        self.assertEqual(self.count(self.arts), 3)
+
+        listings[0].category = self.toys
+        listings[0].save()
+        self.assertEqual((self.count(self.arts), self.count(self.toys)), (2, 1))
+
+        close_listings([listings[0].id, listings[1].id])
+        close_listings([listings[1].id]) # already closed
+        self.assertEqual((self.count(self.arts), self.count(self.toys)), (1, 0))
+
+        Listings.objects.get(pk=listings[2].id).delete()
+        self.assertEqual(self.count(self.arts), 0)
+
+    def test_closing_keeps_the_category(self):
+        listing = Listings.objects.create(title="Paints", description="Paints", starting_bid=1, category=self.arts)
+        close_listings([listing.id])
+        listing.refresh_from_db()
+        self.assertEqual(listing.category, self.arts)
+
+    def test_category_pages_by_slug(self):
+        listing = Listings.objects.create(title="Paints", description="Paints", starting_bid=1, category=self.arts)
+        ListingOwners.objects.create(listing=listing, user=self.seller)
+        self.assertEqual(self.arts.slug, "arts-and-crafts")
+        self.assertContains(self.client.get("/categories/arts-and-crafts"), "Paints")
+        self.assertEqual(self.client.get("/categories/gardening").status_code, 404)
+        with self.assertNumQueries(1):
+            response = self.client.get("/categories")
+        self.assertContains(response, '<a href="/categories/arts-and-crafts">Arts and Crafts</a> (1)')
+
+    def test_seeded_counts_match_listings(self):
+        seed_dataset(users=5, listings=40, seed=2)
+        for seeded in Category.objects.all():
+            self.assertEqual(seeded.active_listings, seeded.listings.filter(active=True).count())
+
+
+# Tests for the async read views and their concurrent reads
+class AsyncViewTests(TransactionTestCase):
+
+    def setUp(self):
+        listing_cache().clear()
+        self.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        self.listing = Listings.objects.create(title="Lamp", description="A lamp", starting_bid=10, category=category("Home"))
+        ListingOwners.objects.create(listing=self.listing, user=self.seller)
+        Comments.objects.create(comment="Does it work?", listing=self.listing, user=self.seller)
+
+    def test_gather_reads_keeps_order(self):
+        results = asyncio.run(gather_reads(lambda: Listings.objects.get(pk=self.listing.id).title, lambda: User.objects.count(), lambda: "cached"))
+        self.assertEqual(results, ["Lamp", 1, "cached"])
+
+    def test_read_pages_through_asgi(self):
+        async def get(path, headers=None):
+            return await AsyncClient().get(path, headers=headers)
+        listing = asyncio.run(get(f"/listings/{self.listing.id}"))
+        self.assertContains(listing, "Does it work?")
+        self.assertContains(asyncio.run(get("/categories/home")), "Lamp")
+        self.assertContains(asyncio.run(get("/categories")), "Home</a> (1)")
+        self.assertEqual(asyncio.run(get("/categories/garden")).status_code, 404)
+        self.assertEqual(asyncio.run(get("/watchlist")).status_code, 302)
+        unchanged = asyncio.run(get(f"/listings/{self.listing.id}", {"If-None-Match": listing["ETag"]}))
+        self.assertEqual(unchanged.status_code, 304)
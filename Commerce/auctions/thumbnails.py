@@ -0,0 +1,200 @@
+import hashlib
+import http.client
+import io
+import ipaddress
+import os
+import ssl
+import tempfile
+import urllib.parse
+import urllib.request
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from PIL import Image
+
+# Thumbnails of listing images, fetched once and kept in a content-addressed cache on disk, so feeds don't send every
+# visitor to third-party hosts for full-size images.
+# THUMBNAIL_DIR/objects holds one file per distinct thumbnail, named by the SHA-256 of its bytes (listings with the
+# same picture share a file), and THUMBNAIL_DIR/urls maps the hash of each image URL to a thumbnail and its type.
+# Serving a thumbnail touches its file, and once the thumbnails take more than THUMBNAIL_CACHE_BYTES the least
+# recently served ones are deleted.
+
+# images larger than this aren't fetched
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+
+# raised when an image can't be fetched or isn't an image
+class FetchError(Exception):
+    pass
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+# the thumbnail URL of a listing's image; it changes with the image, so browsers can keep each one for good
+def thumbnail_url(listing_id, image):
+    return reverse("thumbnail", args=[listing_id, url_key(image)[:16]])
+
+
+# Image URLs are given by sellers, so the server must not be made to fetch anything but public hosts: every
+# connection fetch_url makes, including those for redirects, is checked once it is made, against the address it
+# actually reached. A host name that resolves to a private address (or changes between a check and the connection)
+# is caught the same way.
+def check_address(address):
+    if not ipaddress.ip_address(address.split("%")[0]).is_global:
+        raise FetchError(f"Images are only fetched from public addresses, not {address}.")
+
+
+class PublicHTTPConnection(http.client.HTTPConnection):
+
+    def connect(self):
+        super().connect()
+        try:
+            check_address(self.sock.getpeername()[0])
+        except FetchError:
+            self.close()
+            raise
+
+
+# the address is checked by PublicHTTPConnection.connect before the TLS handshake starts
+class PublicHTTPSConnection(http.client.HTTPSConnection, PublicHTTPConnection):
+    pass
+
+
+class PublicHTTPHandler(urllib.request.HTTPHandler):
+
+    def http_open(self, request):
+        return self.do_open(PublicHTTPConnection, request)
+
+
+class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+
+    def https_open(self, request):
+        return self.do_open(PublicHTTPSConnection, request, context = ssl.create_default_context())
+
+
+# redirects are followed to http(s) URLs only (urllib would also follow ftp)
+class PublicRedirectHandler(urllib.request.HTTPRedirectHandler):
+
+    def redirect_request(self, request, fp, code, message, headers, new_url):
+        if urllib.parse.urlsplit(new_url).scheme not in ("http", "https"):
+            raise FetchError(f"Images are only fetched over http and https, not {new_url}.")
+        return super().redirect_request(request, fp, code, message, headers, new_url)
+
+
+# no proxies from the environment, since the address checked must be the image host's
+opener = urllib.request.build_opener(urllib.request.ProxyHandler({}), PublicHTTPHandler, PublicHTTPSHandler, PublicRedirectHandler)
+
+
+# The default THUMBNAIL_FETCHER: downloads an http(s) URL from a public host and returns (bytes, content type).
+# Fetchers are any function with this signature, so tests and deployments can swap in their own.
+def fetch_url(url):
+    if urllib.parse.urlsplit(url).scheme not in ("http", "https"):
+        raise FetchError(f"Only http and https images are fetched, not {url}.")
+    request = urllib.request.Request(url, headers = {"User-Agent": "Commerce thumbnails"})
+    try:
+        with opener.open(request, timeout = 10) as response:
+            content_type = response.headers.get_content_type()
+            data = response.read(MAX_IMAGE_BYTES + 1)
+    except (OSError, ValueError) as error:
+        raise FetchError(f"Couldn't fetch {url}: {error}")
+    if len(data) > MAX_IMAGE_BYTES:
+        raise FetchError(f"{url} is larger than {MAX_IMAGE_BYTES} bytes.")
+    return data, content_type
+
+
+# shrinks an image to fit in a THUMBNAIL_SIZE square, as JPEG or (if it has transparency) PNG
+def shrink(data, content_type):
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.thumbnail((settings.THUMBNAIL_SIZE, settings.THUMBNAIL_SIZE))
+        output = io.BytesIO()
+        if image.mode in ("RGBA", "LA", "P"):
+            image.save(output, "PNG", optimize = True)
+            return output.getvalue(), "image/png"
+        image.convert("RGB").save(output, "JPEG", quality = 85, optimize = True)
+        return output.getvalue(), "image/jpeg"
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        raise FetchError(f"Not a usable image: {error}")
+
+
+# writes data to path through a temporary file, so a reader never sees half a file
+def write_atomically(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    descriptor, temporary = tempfile.mkstemp(dir = os.path.dirname(path))
+    with os.fdopen(descriptor, "wb") as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+
+# The thumbnails on disk under root, at most max_bytes of them
+class ThumbnailCache:
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def url_path(self, url):
+        key = url_key(url)
+        return os.path.join(self.root, "urls", key[:2], key)
+
+    # (open file, content type) of the thumbnail of url, or None if it isn't cached (or has been evicted)
+    def get(self, url):
+        try:
+            with open(self.url_path(url)) as file:
+                digest, content_type = file.read().split()
+            thumbnail = open(self.object_path(digest), "rb")
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(thumbnail.fileno()) # marks it as recently used
+        return thumbnail, content_type
+
+    # stores the thumbnail of url and returns it like get
+    def put(self, url, data, content_type):
+        digest = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self.object_path(digest)):
+            write_atomically(self.object_path(digest), data)
+        write_atomically(self.url_path(url), f"{digest} {content_type}".encode())
+        self.evict(keep = digest)
+        return open(self.object_path(digest), "rb"), content_type
+
+    # deletes the least recently used thumbnails until they fit in max_bytes. The scan only runs when a thumbnail is
+    # added, which happens once per image. URL entries pointing at an evicted thumbnail are refetched when next used.
+    def evict(self, keep = None):
+        objects = []
+        for directory, _, names in os.walk(os.path.join(self.root, "objects")):
+            for name in names:
+                stat = os.stat(os.path.join(directory, name))
+                objects.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in objects)
+        for _, size, digest in sorted(objects):
+            if total <= self.max_bytes:
+                break
+            if digest != keep:
+                try:
+                    os.remove(self.object_path(digest))
+                except FileNotFoundError: # evicted by another process
+                    pass
+                total -= size
+
+
+def thumbnail_cache():
+    return ThumbnailCache(settings.THUMBNAIL_DIR, settings.THUMBNAIL_CACHE_BYTES)
+
+
+# (open file, content type) of the thumbnail of an image URL, fetching and shrinking the image if it isn't cached.
+# Raises FetchError if the image can't be had.
+def get_thumbnail(url):
+    cache = thumbnail_cache()
+    cached = cache.get(url)
+    if cached:
+        return cached
+    data, content_type = import_string(settings.THUMBNAIL_FETCHER)(url)
+    if not content_type.startswith("image/"):
+        raise FetchError(f"{url} is {content_type}, not an image.")
+    return cache.put(url, *shrink(data, content_type))
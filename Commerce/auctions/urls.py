@@ -9,12 +9,24 @@ urlpatterns = [
     path("logout", views.logout_view, name="logout"),
     path("register", views.register, name="register"),
     path("new", views.new_listing, name="new_listing"),
+    path("import", views.import_listings, name="import_listings"),
+    path("export", views.export_listings, name="export_listings"),
     path("listings/<str:listing_id>", views.listing, name="listing"),
     path("watchlist/<str:listing_id>", views.add_to_watchlist, name="add_to_watchlist"),
     path("bid/<str:listing_id>", views.bid, name="bid"),
     path("watchlist", views.view_watchlist, name="view_watchlist"),
+    path("my_listings", views.my_listings, name="my_listings"),
     path("comment/<str:listing_id>", views.comment, name="comment"),
     path("close_listing/<str:listing_id>", views.close_listing, name="close_listing"),
     path("categories", views.categories, name="categories"),
-    path("categories/<str:category_name>", views.specific_category, name="specific_category")
+    path("categories/<slug:category_slug>", views.specific_category, name="specific_category"),
+    path("api/listings", views.listings_api, name="listings_api"),
+    path("api/listings/<int:listing_id>/comments", views.comments_api, name="comments_api"),
+    path("api/listings/<int:listing_id>/history", views.listing_history_api, name="listing_history_api"),
+    path("api/categories/<slug:category_slug>/history", views.category_history_api, name="category_history_api"),
+    path("cache/stats", views.listing_cache_stats, name="listing_cache_stats"),
+    path("search", views.search, name="search"),
+    path("thumbnails/<int:listing_id>/<str:key>", views.thumbnail, name="thumbnail"),
+    path("api/watchlist/<int:listing_id>", views.watchlist_api, name="watchlist_api"),
+    path("metrics", views.metrics, name="metrics")
 ]
@@ -1,91 +1,174 @@
+import codecs
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth.views import redirect_to_login
 from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.template.loader import render_to_string
 from django.urls import reverse
-from django import forms
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
 from django.contrib.auth.decorators import login_required
-from django.db.models import Max
-
-from .models import User, Listings, Comments, Bids, ListingOwners
+from django.contrib.admin.views.decorators import staff_member_required
 
-# Django form for new listings
-class NewListingForm(forms.Form):
-    category_choices = Listings._meta.get_field('category').choices
-    style = "margin:10px; padding:4px; width:20%;"
-    title = forms.CharField(label=False, widget=forms.TextInput(attrs={'style':style, 'placeholder':"Title"}))
-    description = forms.CharField(label=False, widget=forms.Textarea(attrs={'style':"margin:10px; padding:4px; width:90%;", 'placeholder':"Description"}))
-    starting_bid = forms.IntegerField(label=False, widget=forms.NumberInput(attrs={'style':style, 'placeholder':"Starting Bid ($)"}), min_value=0)
-    image = forms.URLField(required=False, label=False, widget=forms.URLInput(attrs={'style':style, 'placeholder':"URL for image of listing"}))
-    category = forms.ChoiceField(required=False, label=False, widget=forms.Select(attrs={'style':style}), choices=category_choices)
+from .models import User, Category, Listings, Comments, Bids, ListingOwners, SellerStats
+from .bidding import BidRejected, place_bid, set_proxy_bid
+from .bulk import export_lines, file_format, import_rows, read_rows
+from .forms import NewListingForm, NewBidForm, NewCommentForm
+from .history import MAX_CHART_HOURS, category_chart, listing_chart
+from .cache import FRAGMENTS, cache_stats, listing_fragment
+from .closing import close_listings
+from .concurrency import gather_reads, get_user
+from .conditional import async_condition, feed_etag, feed_last_modified, listing_etag, listing_last_modified, listing_state
+from .metrics import export_metrics
+from .pagination import COMMENTS_PAGE_SIZE, paginate_feed
+from .search import search_listings
+from .thumbnails import FetchError, get_thumbnail, url_key
+from .watchlist import is_watching, toggle_watch, watched_ids
 
+# This method returns a dictionary of all of the generic data that needs to be used with the listing HTML page
+def listing_page_data(request, listing_id):
+    return build_listing_page_data(*(read() for read in listing_page_reads(request, listing_id)))
 
-# Django form for a new bid
-class NewBidForm(forms.Form):
-    
-    bid = forms.IntegerField()
-
-    # allowing the max bid to be specified for each instance of the form so that the placeholder text can be modified
-    def __init__(self, *args, **kwargs):
-        self.max_bid = kwargs.pop('max_bid', -1)
-        super().__init__(*args, **kwargs)
-        style = "margin:10px; padding:4px; width:30%;"
-        self.fields['bid'].label = False
-        if self.max_bid:
-            self.fields['bid'].widget = forms.NumberInput(attrs={'style':style, 'placeholder':f'Bid Amount (Current Bid is {self.max_bid})'})
-        else:
-            self.fields['bid'].widget = forms.NumberInput(attrs={'style':style, 'placeholder':'There are no bids'})
+# the same for the async listing view, with the independent reads running at the same time
+async def async_listing_page_data(request, listing_id):
+    await get_user(request)
+    return build_listing_page_data(*await gather_reads(*listing_page_reads(request, listing_id)))
 
-# Django form for a new comment
-class NewCommentForm(forms.Form):
-    comment = forms.CharField(label=False, widget=forms.Textarea(attrs={'style':"margin:10px; padding:4px; width:90%;", 'placeholder':"Put your comment here."}))
+# The reads behind a listing page, none of which needs another's result: the listing (with its owner, high bidder
+# and category) and its cached details, the comments, and whether the user watches the listing
+def listing_page_reads(request, listing_id):
+    def listing_and_details():
+        listing = Listings.objects.select_related("high_bidder", "owner__user", "category").get(pk = listing_id)
+        return listing, listing_fragment("detail", listing.id, listing.version, {"listing": listing})
+    def watching():
+        if request.user.is_authenticated:
+            return is_watching(request.user, listing_id) #returns True if the listing is in the user's watchlist, otherwise False
+        return None
+    return listing_and_details, lambda: comments_html(request, listing_id), watching
 
-# This method returns a dictionary of all of the generic data that needs to be used with the listing HTML page
-def listing_page_data(request, listing_id):
-    listing = Listings.objects.get(pk = listing_id)
-    if request.user.is_authenticated:
-        watchlist_bool = True if listing in request.user.watchlist.all() else False #returns True if the listing is in the user's watchlist, otherwise False
-    else:
-        watchlist_bool = None
-    if Bids.objects.filter(listing = listing_id).count() == 0: #If there are no bids
-        max_bid = (listing.starting_bid - 1) # The max bid is the starting bid minus 1 so that the user can bid the starting bid also
-    else:
-        max_bid = Bids.objects.filter(listing__pk = listing_id).aggregate(Max('amount'))['amount__max'] # Otherwise, the max bid is the maximum of all the bids
-        
-    current_price = max_bid
-    if current_price + 1 == listing.starting_bid:
-        current_price += 1
+def build_listing_page_data(listing_and_details, comments, watchlist_bool):
+    listing, detail_html = listing_and_details
+    max_bid = listing.max_bid # The highest bid, or the starting bid minus 1 if there are no bids so that the user can bid the starting bid also
         
     data_dict = {
-        "number_of_bids": Bids.objects.filter(listing = listing_id).count(),
+        "number_of_bids": listing.bid_count,
         "listing":listing,
-        "owner": ListingOwners.objects.get(listing = listing),
+        "owner": listing.owner,
         "watchlist_bool": watchlist_bool,
         "new_comment_form": NewCommentForm(),
-        "comments": Comments.objects.filter(listing = listing),
+        "detail_html": detail_html,
+        "comments_html": comments,
         "max_bid": max_bid,
-        "max_bid_user": Bids.objects.filter(listing = listing_id).get(amount = max_bid).bidders if Bids.objects.filter(listing = listing_id) else None, #Gets the user attributed to the maximum bid ONLY if there are bids on the listing
+        "max_bid_user": listing.high_bidder, # The user attributed to the maximum bid, None if there are no bids on the listing
         "new_bid_form": NewBidForm(max_bid=max_bid),
-        "current_price": current_price # This is the current price of the object, similar to max_bid but if there are no bids then it equals the starting bid
+        "current_price": listing.current_price # This is the current price of the object, similar to max_bid but if there are no bids then it equals the starting bid
         
     }
     return data_dict
         
         
-# The index method creates a list of tuples that have the listing name and then its owner
-def index(request):
-    listings = Listings.objects.all()
-    owners = ListingOwners.objects.all()
-    current_prices = []
-    for listing in listings: # adds each listing's current price to another list
-        current_price = listing_page_data(request, listing.id)['current_price']
-        current_prices.append(current_price)
-    
-    return render(request, "auctions/index.html", {
-        "listings": list(zip(listings, owners, current_prices)),
-        "title": "Active Listings"
+# a listing's comments, newest first, with their authors
+def comment_thread(listing_id):
+    return Comments.objects.filter(listing_id = listing_id).select_related("user").order_by("-time_created", "-id")
+
+# renders one page of a listing's comments. The newest page is cached with the rest of the listing, under the version
+# the listing page's ETag was made from; older pages are fetched from comments_api by the "load more" button, or
+# rendered here from the comments_after cursor without scripts
+def comments_html(request, listing_id):
+    cursor = request.GET.get("comments_after")
+    def context(): # only queried when the comments aren't cached
+        comments, next_cursor = paginate_feed(comment_thread(listing_id), cursor, COMMENTS_PAGE_SIZE)
+        return {"comments": comments, "next_cursor": next_cursor, "comments_api_url": reverse("comments_api", args=[listing_id])}
+    if cursor:
+        return mark_safe(render_to_string(FRAGMENTS["comments"], context()))
+    state = listing_state(request, listing_id)
+    if state is None: # no such listing; the listing read reports it
+        return ""
+    return listing_fragment("comments", listing_id, state[0], context)
+
+# sets listing.watched on each listing of a feed page from the user's cached watchlist
+def mark_watched(request, listings):
+    watched = watched_ids(request.user)
+    for listing in listings:
+        listing.watched = listing.id in watched
+    return listings
+
+# renders one page of a listing feed; the "after" parameter is the cursor of the page to continue from
+# and api_params are passed to listings_api by the page's infinite scroll to fetch the following pages.
+# The page and the user's watched ids are read at the same time.
+async def render_feed(request, listings, title, api_params = None):
+    user = await get_user(request)
+    (page, next_cursor), watched = await gather_reads(lambda: paginate_feed(listings, request.GET.get("after")), lambda: watched_ids(user))
+    return await render_feed_page(request, page, watched, next_cursor, title, api_params)
+
+async def render_feed_page(request, page, watched, next_cursor, title, api_params, chart_url = None):
+    for listing in page:
+        listing.watched = listing.id in watched
+    return await sync_to_async(render)(request, "auctions/index.html", {
+        "listings": page,
+        "title": title,
+        "next_cursor": next_cursor,
+        "feed_api_url": f"{reverse('listings_api')}?{urlencode(api_params or {})}",
+        "chart_url": chart_url
     })
 
+# The read-only pages (index, listing, categories, specific_category and view_watchlist) are async views. Under the
+# ASGI server (commerce/asgi.py) they don't hold a thread while they wait on the database, and the independent reads
+# of a page run at the same time; under WSGI they work as before.
+
+# The index method shows every active listing along with its owner and current price
+@async_condition(etag_func = feed_etag, last_modified_func = feed_last_modified)
+async def index(request):
+    return await render_feed(request, Listings.objects.feed(), "Active Listings")
+
+# returns the next page of a feed as JSON so that the feed pages can scroll infinitely
+def listings_api(request):
+    listings = Listings.objects.feed()
+    if request.GET.get("category"):
+        listings = listings.filter(category__slug = request.GET["category"])
+    if request.GET.get("watchlist"):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "You must be signed in to view your watchlist."}, status = 403)
+        listings = listings.filter(wishlist_users = request.user)
+    page, next_cursor = paginate_feed(listings, request.GET.get("after"))
+    watched = watched_ids(request.user)
+    return JsonResponse({
+        "listings": [{
+            "id": listing.id,
+            "url": reverse("listing", args=[listing.id]),
+            "title": listing.title,
+            "description": listing.description,
+            "current_price": listing.current_price,
+            "category": listing.category_name,
+            "owner": listing.owner_username,
+            "image": listing.image,
+            "thumbnail": listing.thumbnail_url,
+            "watched": listing.id in watched,
+            "watch_url": reverse("watchlist_api", args=[listing.id])
+        } for listing in page],
+        "next_cursor": next_cursor
+    })
+
+# Serves the thumbnail of a listing's image, fetching it the first time it's asked for. The key in the URL is taken
+# from the image URL, so a listing that changes its image gets a new thumbnail URL and browsers can keep each for good.
+def thumbnail(request, listing_id, key):
+    image = Listings.objects.filter(pk = listing_id).values_list("image", flat = True).first()
+    if not image or url_key(image)[:16] != key:
+        raise Http404("No such thumbnail.")
+    try:
+        file, content_type = get_thumbnail(image)
+    except FetchError:
+        return HttpResponse("The image couldn't be fetched.", status = 502)
+    response = FileResponse(file, content_type = content_type)
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
 # Logs the user in
 def login_view(request):
     if request.method == "POST":
@@ -147,6 +230,8 @@ def new_listing(request):
         if form.is_valid(): # If the form is valid, saves the new listing and its corresponding owner.
 
             listing_object = Listings(title=form.cleaned_data["title"], description=form.cleaned_data["description"], starting_bid=form.cleaned_data["starting_bid"], image=form.cleaned_data["image"], category=form.cleaned_data["category"])
+            if form.cleaned_data["duration"]: # timed auctions are closed by the auction_closer command once they end
+                listing_object.ends_at = timezone.now() + timedelta(days=form.cleaned_data["duration"])
             listing_object.save()
 
             owner = ListingOwners(listing = listing_object, user = request.user)
@@ -164,56 +249,119 @@ def new_listing(request):
             "form": NewListingForm()
         })
 
+# Bulk-creates listings for the signed in user from an uploaded CSV or JSON Lines file, with the columns of the new
+# listing form. The upload is read a line at a time (Django spools large files to disk), and the response is a JSON
+# report of the rows imported and rejected.
+@login_required
+def import_listings(request):
+    if request.method == "POST" and request.FILES.get("file"):
+        upload = request.FILES["file"]
+        try:
+            format = file_format(upload.name)
+        except ValueError as error:
+            return JsonResponse({"error": str(error)}, status = 400)
+        report = import_rows(read_rows(codecs.iterdecode(upload, "utf-8"), format), request.user)
+        return JsonResponse(report, status = 200 if report["imported"] or not report["rejected"] else 400)
+    return render(request, "auctions/import_listings.html")
+
+# Streams every listing with its current price as CSV (or JSON Lines with ?format=jsonl) for analytics, for staff
+@staff_member_required
+def export_listings(request):
+    format = "jsonl" if request.GET.get("format") == "jsonl" else "csv"
+    response = StreamingHttpResponse(export_lines(Listings.objects.all(), format),
+                                     content_type = "text/csv" if format == "csv" else "application/x-ndjson")
+    response["Content-Disposition"] = f'attachment; filename="listings.{format}"'
+    return response
+
            
 # This method displays a specific listing
-def listing(request, listing_id):
-    listing = Listings.objects.get(pk=listing_id)
-    owner = ListingOwners.objects.get(listing = listing)
-    page_data = listing_page_data(request, listing_id)
+@async_condition(etag_func = listing_etag, last_modified_func = listing_last_modified)
+async def listing(request, listing_id):
+    page_data = await async_listing_page_data(request, listing_id)
     
     # if there are no bids on the listing, then create the bid form where there is no max bid so that the placeholder says there is no max bid
-    if page_data['max_bid'] + 1 == listing.starting_bid:
+    if not page_data['listing'].bid_count:
         page_data["new_bid_form"] = NewBidForm(max_bid = None)
    
-    return render(request, "auctions/listings.html", page_data)
+    return await sync_to_async(render)(request, "auctions/listings.html", page_data)
+
+# returns an older page of a listing's comments as JSON for the "load more" button
+def comments_api(request, listing_id):
+    comments, next_cursor = paginate_feed(comment_thread(listing_id), request.GET.get("after"), COMMENTS_PAGE_SIZE)
+    return JsonResponse({
+        "comments": [{
+            "id": comment.id,
+            "comment": comment.comment,
+            "user": comment.user.username,
+            "time_created": comment.time_created.isoformat()
+        } for comment in comments],
+        "next_cursor": next_cursor
+    })
+
+# how many hours a price chart covers, from ?hours= (a week by default)
+def chart_length(request):
+    try:
+        hours = int(request.GET.get("hours", 24 * 7))
+    except ValueError:
+        hours = 24 * 7
+    return min(max(hours, 1), MAX_CHART_HOURS)
+
+# the hourly price history of a listing, for the chart on its page (see auctions/history.py)
+def listing_history_api(request, listing_id):
+    response = JsonResponse(listing_chart(listing_id, chart_length(request)))
+    patch_cache_control(response, public = True, max_age = 300) # the history only grows once an hour
+    return response
+
+# the hourly bidding of a category, for the chart on its page
+def category_history_api(request, category_slug):
+    category_id = Category.objects.filter(slug = category_slug).values_list("id", flat = True).first()
+    if category_id is None:
+        raise Http404("No such category.")
+    response = JsonResponse(category_chart(category_id, chart_length(request)))
+    patch_cache_control(response, public = True, max_age = 300)
+    return response
 
 # adds (or removes) a specific listing to the user's watchlist
+@login_required
 def add_to_watchlist(request, listing_id):
-    listing = Listings.objects.get(pk=listing_id)
-    user = User.objects.get(pk = request.user.id)
-    if listing in user.watchlist.all(): #If the listing is already in the watchlist, remove it. Otherwise, add it.
-        user.watchlist.remove(listing)
-    else:
-        user.watchlist.add(listing)
+    toggle_watch(request.user, listing_id)
     return HttpResponseRedirect(reverse("listing", args=[listing_id]))
 
+# adds (or removes) a listing from the user's watchlist without leaving the page, and returns whether it is now watched
+def watchlist_api(request, listing_id):
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "You must be signed in to use your watchlist."}, status = 403)
+    if request.method != "POST":
+        return JsonResponse({"watching": is_watching(request.user, listing_id)})
+    if not Listings.objects.filter(pk = listing_id, active = True).exists():
+        return JsonResponse({"error": "This listing is closed."}, status = 404)
+    return JsonResponse({"watching": toggle_watch(request.user, listing_id)})
+
 # deals with a bid once a user enters it
 def bid(request, listing_id):
     if request.method == 'POST':
     
         page_data = listing_page_data(request, listing_id)
-
-        listing = Listings.objects.get(pk = listing_id)
-        form = NewBidForm(request.POST, max_bid = page_data['max_bid'])
+        listing = page_data["listing"]
         
         # if there are no bids on the listing, then create the bid form where there is no max bid so that the placeholder says there is no max bid
-        if page_data['max_bid'] + 1 == listing.starting_bid:
-            form = NewBidForm(request.POST, max_bid = None)
-            
+        form = NewBidForm(request.POST, max_bid = page_data['max_bid'] if listing.bid_count else None)
         page_data["new_bid_form"] = form
         
         if form.is_valid():
-            bid = form.cleaned_data["bid"]
             
-            #Check to make sure that the bid is greater than the previous max bid. If it is, save the new bid. Otherwise, render the page again with an error message.
-            if bid > page_data['max_bid']: 
-                new_bid = Bids(amount = bid, listing = Listings.objects.get(pk=listing_id), bidders = request.user)
-                new_bid.save()
-                
-                return HttpResponseRedirect(reverse("listing", args=[listing_id]))
-            else:
-                page_data["error_message"] = "Please put in a bid greater than the current bid."
+            #place_bid saves the bid only if it is still greater than the max bid when it is written. Otherwise, render the page again with an error message.
+            #An automatic bid is stored as the user's maximum instead, and set_proxy_bid bids only as much of it as needed.
+            try:
+                if form.cleaned_data["automatic"]:
+                    set_proxy_bid(listing.id, request.user, form.cleaned_data["bid"])
+                else:
+                    place_bid(listing.id, request.user, form.cleaned_data["bid"])
+            except BidRejected as error:
+                page_data["error_message"] = str(error)
                 return render(request, "auctions/listings.html", page_data)
+                
+            return HttpResponseRedirect(reverse("listing", args=[listing_id]))
                   
         else:
             return render(request, "auctions/listings.html", page_data)
@@ -221,16 +369,29 @@ def bid(request, listing_id):
         return HttpResponseRedirect(reverse('listing', args=[listing_id]))
         
 # This method gets and shows the user's watchlist
-@login_required     
-def view_watchlist(request):
-    watchlist = User.objects.get(pk = request.user.id).watchlist.all()
-    listings = []
-    for item in watchlist: # creates a list of tuples that contain the item in the watchlist, its owner, and its current price
-        current_price = listing_page_data(request, item.id)['current_price']
-        listings.append((item, ListingOwners.objects.get(listing = item), current_price))
-    return render(request, "auctions/index.html", {
-        "listings": listings,
-        "title": f"{request.user}'s Watchlist"
+async def view_watchlist(request):
+    user = await get_user(request)
+    if not user.is_authenticated: # login_required only wraps sync views
+        return redirect_to_login(request.get_full_path())
+    page, next_cursor = await sync_to_async(paginate_feed)(Listings.objects.feed().filter(wishlist_users = user), request.GET.get("after"))
+    watched = {listing.id for listing in page} # everything on it is watched, so the watched ids aren't needed
+    return await render_feed_page(request, page, watched, next_cursor, f"{user}'s Watchlist", {"watchlist": 1})
+
+# The signed in seller's dashboard: their running totals (see SellerStats) and their own listings, newest first, a page
+# at a time. The totals and the page are read at the same time, so it costs the same however many listings they have.
+async def my_listings(request):
+    user = await get_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    listings = Listings.objects.filter(owner__user = user).select_related("category").order_by("-time_created", "-id")
+    stats, (page, next_cursor) = await gather_reads(
+        lambda: SellerStats.objects.filter(user = user).first() or SellerStats(user = user),
+        lambda: paginate_feed(listings, request.GET.get("after")),
+    )
+    return await sync_to_async(render)(request, "auctions/my_listings.html", {
+        "stats": stats,
+        "listings": page,
+        "next_cursor": next_cursor,
     })
 
 # This method deals with the comment that a user has entered  
@@ -258,37 +419,49 @@ def comment(request, listing_id):
     else:
         return HttpResponseRedirect(reverse('listing', args=[listing_id]))
         
-#closes the listing by making it not active, deleting its category, and removing it from any watchlist
+#closes the listing by making it not active and removing it from any watchlist
 def close_listing(request, listing_id):
-    updated_listing = Listings.objects.get(pk=listing_id)
-    updated_listing.active = False
-    updated_listing.category = "Choose Category"
-    updated_listing.save()
-    
-    users = User.objects.all()
-    for user in users:
-        if updated_listing in user.watchlist.all():
-            user.watchlist.remove(updated_listing)  
+    close_listings([listing_id])
     return HttpResponseRedirect(reverse('listing', args=[listing_id]))
 
-# gets all of the categories and renders a HTML page that displays them
-def categories(request):
-    choices = Listings._meta.get_field('category').choices
-    return render(request, "auctions/categories.html", {
-        "choices": choices
+# gets all of the categories, with their stored counts of active listings, and renders a HTML page that displays them
+async def categories(request):
+    return await sync_to_async(render)(request, "auctions/categories.html", {
+        "categories": await sync_to_async(list)(Category.objects.all())
     })
 
-#displays all of the listings of a specific category
-def specific_category(request, category_name):
-    listings = Listings.objects.filter(category = category_name.capitalize())
-    owners = []
-    current_prices = []
-    for listing in list(listings): # creates a list of each owner of the listings of the specific category and a list of the current price of each listing of the category
-        owners.append(ListingOwners.objects.get(listing = listing))
-        current_price = listing_page_data(request, listing.id)['current_price']
-        current_prices.append(current_price)
-          
+#displays all of the listings of a specific category; the category, the page and the watched ids are read at the same time
+@async_condition(etag_func = feed_etag, last_modified_func = feed_last_modified)
+async def specific_category(request, category_slug):
+    user = await get_user(request)
+    category, (page, next_cursor), watched = await gather_reads(
+        lambda: Category.objects.filter(slug = category_slug).first(),
+        lambda: paginate_feed(Listings.objects.feed().filter(category__slug = category_slug), request.GET.get("after")),
+        lambda: watched_ids(user),
+    )
+    if category is None:
+        raise Http404("No such category.")
+    return await render_feed_page(request, page, watched, next_cursor, f"{category.name} Listings", {"category": category.slug},
+                                  reverse("category_history_api", args=[category.slug]))
+
+# shows how often the cached listing fragments were reused, for staff
+@staff_member_required
+def listing_cache_stats(request):
+    return JsonResponse(cache_stats())
+
+# searches the listings' titles and descriptions, optionally within one category, best matches first
+def search(request):
+    query = request.GET.get("q", "")
+    category = Category.objects.filter(slug = request.GET["category"]).first() if request.GET.get("category") else None
+    ids = search_listings(query, category = category and category.id, limit = 50)
+    listings = {listing.id: listing for listing in Listings.objects.feed().filter(pk__in = ids)}
     return render(request, "auctions/index.html", {
-        "listings": list(zip(listings, owners, current_prices)),
-        "title": f"{category_name.capitalize()} Listings"
+        "listings": mark_watched(request, [listings[listing_id] for listing_id in ids if listing_id in listings]),
+        "title": f"Search results for \"{query}\"" + (f" in {category}" if category else ""),
+        "query": query
     })
+
+# serves the per-view request metrics for Prometheus to scrape, for staff
+@staff_member_required
+def metrics(request):
+    return HttpResponse(export_metrics(), content_type = "text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Subquery
+
+from .models import User, WatchlistVersion
+
+# Watchlists are read through a cached set of the listing ids each user watches, so a listing page or a whole feed
+# page can show watch state without querying the watchlist, and changed with single-row writes on the through table.
+# The set is cached under the user's WatchlistVersion, which every change bumps in the database, so a set cached
+# before a change is never looked up again (it just expires) by any process, whatever the cache backend.
+
+Watch = User.watchlist.through
+
+# how long an unused set of watched ids is kept
+WATCHED_IDS_TIMEOUT = 5 * 60
+
+
+def watched_ids_key(user_id, version):
+    return f"watchlist:{user_id}:{version}"
+
+
+# the version as a subquery, so the pages' ETag queries (see auctions/conditional.py) can read it along the way
+def watch_version_subquery(user_id):
+    return Subquery(WatchlistVersion.objects.filter(user_id = user_id).values("version")[:1])
+
+
+# the version of user's watchlist: the one read for this request's ETag, if there is one, or else read now
+def watch_version(user):
+    version = getattr(user, "_watch_version", None)
+    if version is None:
+        version = WatchlistVersion.objects.filter(user_id = user.pk).values_list("version", flat = True).first()
+    return version or 0
+
+
+# the ids of the listings user watches (an empty set for anonymous users)
+def watched_ids(user):
+    if not user.is_authenticated:
+        return frozenset()
+    key = watched_ids_key(user.pk, watch_version(user))
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(Watch.objects.filter(user_id = user.pk).values_list("listings_id", flat = True))
+        cache.set(key, ids, WATCHED_IDS_TIMEOUT)
+    return ids
+
+
+def is_watching(user, listing_id):
+    return int(listing_id) in watched_ids(user)
+
+
+# marks the watchlists of the given users as changed, in the current transaction
+def bump_watch_versions(user_ids):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    WatchlistVersion.objects.bulk_create([WatchlistVersion(user_id = user_id) for user_id in user_ids], ignore_conflicts = True)
+    WatchlistVersion.objects.filter(user_id__in = user_ids).update(version = F("version") + 1)
+
+
+# adding and removing are idempotent: watching twice or unwatching something not watched changes nothing
+def watch(user, listing_id):
+    Watch.objects.get_or_create(user_id = user.pk, listings_id = listing_id)
+    changed(user)
+
+
+def unwatch(user, listing_id):
+    Watch.objects.filter(user_id = user.pk, listings_id = listing_id).delete()
+    changed(user)
+
+
+def changed(user):
+    bump_watch_versions([user.pk])
+    user._watch_version = None # so the rest of the request reads the new version
+
+
+# watches the listing if user isn't watching it yet and stops watching it otherwise; returns whether user now watches it
+def toggle_watch(user, listing_id):
+    with transaction.atomic():
+        if Watch.objects.filter(user_id = user.pk, listings_id = listing_id).exists():
+            unwatch(user, listing_id)
+            return False
+        watch(user, listing_id)
+        return True
@@ -2,6 +2,8 @@
 ASGI config for commerce project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+WebSocket connections go to the live listing updates in auctions/live.py and
+everything else to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
@@ -13,4 +15,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'commerce.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from auctions.live import listing_updates  # noqa: E402 (needs Django set up first)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await listing_updates(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
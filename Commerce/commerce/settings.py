@@ -12,20 +12,31 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 
 import os
 
+import django
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
-# Quick-start development settings - unsuitable for production
+# Deployment profile
 # See https://docs.djangoproject.com/en/3.0/howto/deployment/checklist/
+# DJANGO_ENV=production turns off DEBUG (which keeps every query in memory), keeps database connections open and
+# caches compiled templates. Every setting below that reads the environment can also be set on its own.
+
+PRODUCTION = os.environ.get('DJANGO_ENV', 'development') == 'production'
+
+
+def env_flag(name, default):
+    return os.environ.get(name, '1' if default else '0').lower() in ('1', 'true', 'yes', 'on')
+
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = '6ps8j!crjgrxt34cqbqn7x&b3y%(fny8k8nh21+qa)%ws3fh!q'
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '6ps8j!crjgrxt34cqbqn7x&b3y%(fny8k8nh21+qa)%ws3fh!q')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = env_flag('DJANGO_DEBUG', not PRODUCTION)
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
 
 LOGIN_URL = "login"
 
@@ -33,7 +44,7 @@ LOGIN_URL = "login"
 # Application definition
 
 INSTALLED_APPS = [
-    'auctions',
+    'auctions.apps.AuctionsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -44,6 +55,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'auctions.metrics.QueryMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,11 +66,18 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'commerce.urls'
 
+# templates are compiled once per process with the cached loader, unless DEBUG is on and they may be edited
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if env_flag('TEMPLATE_CACHE', not DEBUG):
+    TEMPLATE_LOADERS = [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'auctions.metrics.TimedDjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -66,6 +85,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': TEMPLATE_LOADERS,
         },
     },
 ]
@@ -75,15 +95,129 @@ WSGI_APPLICATION = 'commerce.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
+# SQLite by default, or Postgres when POSTGRES_DB is set. Connections are kept open for DB_CONN_MAX_AGE seconds
+# (60 in production) instead of being opened for every request.
+
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60 if PRODUCTION else 0))
+
+if os.environ.get('POSTGRES_DB'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['POSTGRES_DB'],
+            'USER': os.environ.get('POSTGRES_USER', ''),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', ''),
+            'PORT': os.environ.get('POSTGRES_PORT', ''),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True, # a kept connection that has dropped is replaced instead of failing the request
+            # behind pgbouncer in transaction pooling mode, server-side cursors don't survive between transactions
+            'DISABLE_SERVER_SIDE_CURSORS': env_flag('PGBOUNCER', False),
+        }
+    }
+    # Django 5.1+ can pool connections itself (psycopg 3 with psycopg-pool); older versions keep one persistent
+    # connection per worker thread, and pgbouncer does the pooling across processes
+    if os.environ.get('POSTGRES_POOL_SIZE') and django.VERSION >= (5, 1):
+        DATABASES['default']['CONN_MAX_AGE'] = 0 # the pool owns the connections
+        DATABASES['default']['OPTIONS'] = {'pool': {'min_size': 1, 'max_size': int(os.environ['POSTGRES_POOL_SIZE'])}}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                # sqlite's busy timeout: how long a connection waits for another's write lock before "database is locked"
+                'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+            },
+        }
+    }
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# Applied to every new sqlite connection (see auctions/database.py). In WAL mode readers don't block the writer or
+# each other, and with synchronous=NORMAL a commit doesn't wait for fsync (a crash can lose the latest commits, but
+# never corrupts the database). SQLITE_WAL=0 keeps sqlite's default rollback journal.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -20000, # KiB
+    'temp_store': 'memory',
+    'mmap_size': 128 * 1024 * 1024,
+} if env_flag('SQLITE_WAL', True) else {}
+
+AUTH_USER_MODEL = 'auctions.User'
+
+# Caches
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# Rendered listing fragments go in the "listings" cache. It is kept in process memory unless a redis server
+# (LISTING_CACHE_REDIS_URL, needs Django 4.0+ and redis-py) or a directory (LISTING_CACHE_DIR) is configured,
+# either of which lets several server processes share the cache.
+
+if os.environ.get('LISTING_CACHE_REDIS_URL'):
+    LISTING_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['LISTING_CACHE_REDIS_URL'],
+    }
+elif os.environ.get('LISTING_CACHE_DIR'):
+    LISTING_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['LISTING_CACHE_DIR'],
     }
+else:
+    LISTING_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'listings',
+    }
+# fragments are invalidated when the listing changes, so the timeout only bounds how long an unused one is kept
+LISTING_CACHE['TIMEOUT'] = int(os.environ.get('LISTING_CACHE_TIMEOUT', 60 * 60))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'listings': LISTING_CACHE,
 }
 
-AUTH_USER_MODEL = 'auctions.User'
+
+# Request metrics (see auctions/metrics.py)
+# Requests slower than AUCTIONS_SLOW_REQUEST_SECONDS are logged to "auctions.metrics" with their slowest queries.
+
+AUCTIONS_SLOW_REQUEST_SECONDS = float(os.environ['AUCTIONS_SLOW_REQUEST_SECONDS']) if os.environ.get('AUCTIONS_SLOW_REQUEST_SECONDS') else None
+
+
+# Listing thumbnails (see auctions/thumbnails.py)
+# Listing images are fetched once by THUMBNAIL_FETCHER, shrunk to fit THUMBNAIL_SIZE pixels with Pillow
+# and kept under THUMBNAIL_DIR, the least recently served going first once they take more than THUMBNAIL_CACHE_BYTES.
+
+THUMBNAIL_DIR = os.environ.get('THUMBNAIL_DIR', os.path.join(BASE_DIR, 'thumbnails'))
+THUMBNAIL_CACHE_BYTES = int(os.environ.get('THUMBNAIL_CACHE_BYTES', 256 * 1024 * 1024))
+THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE', 400))
+THUMBNAIL_FETCHER = os.environ.get('THUMBNAIL_FETCHER', 'auctions.thumbnails.fetch_url')
+
+
+# Sessions and signed in users (see auctions/auth.py)
+# SESSION_MODE picks where sessions are kept: "cached_db" (the default) reads them from the cache and only falls back
+# to the database on a miss, "signed_cookies" keeps them in the browser (nothing is stored server side, so signing out
+# elsewhere can't end a copied cookie), "cache" keeps them only in the cache and "db" only in the database.
+# The user of each session is cached for USER_CACHE_TIMEOUT seconds (0 turns it off). The cache is process-local
+# unless CACHES['default'] is shared, so keep the timeout short.
+
+SESSION_MODE = os.environ.get('SESSION_MODE', 'cached_db')
+
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_MODE]
+
+USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', 60))
+
+AUTHENTICATION_BACKENDS = [
+    'auctions.auth.CachedModelBackend',
+    # sessions started before the cached backend was added still name this one
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -122,3 +256,23 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+# In production, collectstatic writes the files to STATIC_ROOT under content-hashed names, with gzip (and, if the
+# brotli package is installed, brotli) copies made at build time (see auctions/assets.py). Set SERVE_STATIC to have
+# Django serve them with far-future cache headers when no web server in front does.
+
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+
+STATIC_MANIFEST = env_flag('STATIC_MANIFEST', PRODUCTION)
+
+SERVE_STATIC = env_flag('SERVE_STATIC', False)
+
+if STATIC_MANIFEST:
+    STATIC_STORAGE_BACKEND = 'auctions.assets.CompressedManifestStaticFilesStorage'
+    if django.VERSION >= (4, 2):
+        STORAGES = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': STATIC_STORAGE_BACKEND},
+        }
+    else:
+        STATICFILES_STORAGE = STATIC_STORAGE_BACKEND